@@ -0,0 +1,14 @@
+// Clientside callbacks for paralympics_dash.py, Dash loads any .js file in the assets folder
+// See https://dash.plotly.com/clientside-callbacks
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    paralympics: {
+        // Returns the line chart for the selected feature from the data in the line-chart-store
+        line_chart: function (feature, store) {
+            if (!store || !store.data[feature]) {
+                return window.dash_clientside.no_update;
+            }
+            const layout = Object.assign({}, store.layout, {title: {text: store.title[feature]}});
+            return {data: store.data[feature], layout: layout};
+        }
+    }
+});
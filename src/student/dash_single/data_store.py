@@ -0,0 +1,112 @@
+""" In-process store for the data files used by the dashboard figures.
+
+The figure functions are called from the Dash callbacks, so without a store every dropdown change or checklist
+toggle would parse paralympics.csv again. The store reads the file once, hands out read-only views of the
+DataFrame and reloads it when the file on disk changes.
+"""
+import hashlib
+import io
+import threading
+from importlib import resources
+
+import pandas as pd
+
+
+def file_version(path):
+    """ Returns a cheap version stamp for a file: its modification time (ns) and size in bytes.
+
+    Parameters
+    path: path to the file
+
+    Returns
+    tuple: (mtime_ns, size)
+    """
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class DataStore:
+    """ Loads a data file once and reloads it only when the file changes.
+
+    The file is checked with os.stat() on each access. The content hash is only calculated when the modification
+    time or size has changed, so touching the file without changing the data does not trigger a reload.
+
+    Parameters
+    package: the package containing the data file e.g. "student.data"
+    resource: the name of the file e.g. "paralympics.csv"
+    loader: function that takes the path and returns a DataFrame, defaults to pd.read_csv
+    """
+
+    def __init__(self, package, resource, loader=pd.read_csv):
+        self.path = resources.files(package).joinpath(resource)
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._df = None
+        self._stat = None
+        self._hash = None
+        self._derived = {}
+        self.loads = 0
+
+    def _check(self):
+        """ Loads the file if it has not been read yet, or reloads it if the content has changed. """
+        stat = file_version(self.path)
+        if self._df is not None and stat == self._stat:
+            return
+        with self._lock:
+            # Another thread may have reloaded the file while this one was waiting for the lock
+            if self._df is not None and stat == self._stat:
+                return
+            content = self.path.read_bytes()
+            digest = hashlib.sha256(content).hexdigest()
+            if self._df is None or digest != self._hash:
+                self._df = self._loader(io.BytesIO(content))
+                self._hash = digest
+                self._derived = {}
+                self.loads += 1
+            self._stat = stat
+
+    @property
+    def version(self):
+        """ Returns the hash of the data that is currently loaded, used to key anything derived from the data. """
+        self._check()
+        return self._hash
+
+    def get(self, columns=None):
+        """ Returns a read-only view of the data.
+
+        The view is a shallow copy, so adding columns, sorting or filtering it does not change the stored data.
+        Callers must not modify values in place.
+
+        Parameters
+        columns: optional list of column names to include
+
+        Returns
+        df: pandas DataFrame
+        """
+        self._check()
+        df = self._df
+        if columns is not None:
+            return df[list(columns)]
+        return df.copy(deep=False)
+
+    def derived(self, func):
+        """ Returns the result of func(data), it is only calculated once for each version of the data.
+
+        Use this for tables that several figures are created from, e.g. a summary calculated from the whole file.
+        The result is shared so callers must not change it.
+
+        Parameters
+        func: function that takes a read-only view of the data and returns the derived value
+
+        Returns
+        the value returned by func
+        """
+        self._check()
+        with self._lock:
+            if func not in self._derived:
+                self._derived[func] = func(self._df.copy(deep=False))
+            return self._derived[func]
+
+
+# Shared store for the events data used by line_chart() and bar_gender()
+events_store = DataStore("student.data", "paralympics.csv")
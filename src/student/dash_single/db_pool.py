@@ -0,0 +1,142 @@
+""" Pool of read-only SQLite connections for the dashboard figures.
+
+The Dash server handles each request in its own thread. Rather than each figure function opening (and sometimes
+not closing) its own connection, a thread borrows a connection from the pool for the duration of a `with` block.
+Nested `with` blocks in the same thread get the same connection.
+
+The connections are opened read-only, so they can be shared safely between requests. If paralympics.db is changed
+on disk, the idle connections are closed and new ones are opened on the next request.
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from importlib import resources
+from pathlib import Path
+
+from student.dash_single.data_store import file_version
+
+
+def has_table(connection, name):
+    """ Returns True if the database has a table with the given name e.g. one of the summary tables """
+    sql = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+    return connection.execute(sql, (name,)).fetchone() is not None
+
+
+class ConnectionPool:
+    """ Bounded, thread-safe pool of read-only connections to a SQLite database.
+
+    Parameters
+    path: path to the SQLite database file
+    max_size: maximum number of open connections
+    timeout: seconds to wait for a free connection before raising TimeoutError
+    """
+
+    def __init__(self, path, max_size=8, timeout=10):
+        self.path = Path(str(path))
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = []
+        self._open = 0
+        self._version = None
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self.created = 0
+        self.reused = 0
+        self.waits = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+
+    def version(self):
+        """ Returns the modification time and size of the database file """
+        return file_version(self.path)
+
+    def _connect(self):
+        """ Opens a read-only connection, the URI mode=ro means SQLite rejects any write """
+        uri = self.path.resolve().as_uri() + "?mode=ro"
+        connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        connection.execute("PRAGMA query_only = ON")
+        return connection
+
+    def _acquire(self):
+        version = self.version()
+        with self._condition:
+            if version != self._version:
+                # The database file has changed so the idle connections may be reading the old file
+                self._close_idle()
+                self._version = version
+            waited = False
+            while not self._idle and self._open >= self.max_size:
+                waited = True
+                if not self._condition.wait(self.timeout):
+                    raise TimeoutError(f"No database connection was free after {self.timeout} seconds")
+            if waited:
+                self.waits += 1
+            if self._idle:
+                connection = self._idle.pop()
+                self.reused += 1
+            else:
+                connection = self._connect()
+                self._open += 1
+                self.created += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            return connection, self._version
+
+    def _release(self, connection, version):
+        with self._condition:
+            self.in_use -= 1
+            if version == self._version:
+                self._idle.append(connection)
+            else:
+                connection.close()
+                self._open -= 1
+            self._condition.notify()
+
+    def _close_idle(self):
+        while self._idle:
+            self._idle.pop().close()
+            self._open -= 1
+
+    @contextmanager
+    def connection(self):
+        """ Context manager that lends a connection to the current thread.
+
+        Usage:
+            with db_pool.connection() as connection:
+                df = pd.read_sql(sql, connection)
+        """
+        held = getattr(self._local, "connection", None)
+        if held is not None:
+            yield held
+            return
+        connection, version = self._acquire()
+        self._local.connection = connection
+        try:
+            yield connection
+        finally:
+            self._local.connection = None
+            self._release(connection, version)
+
+    def close(self):
+        """ Closes the idle connections, connections that are in use are closed when they are returned """
+        with self._condition:
+            self._close_idle()
+            self._version = None
+
+    def stats(self):
+        """ Returns the pool counters as a dict """
+        with self._condition:
+            return {
+                "max_size": self.max_size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "created": self.created,
+                "reused": self.reused,
+                "waits": self.waits,
+            }
+
+
+# Shared pool for paralympics.db used by the figure functions
+db_pool = ConnectionPool(resources.files("student.data").joinpath("paralympics.db"))
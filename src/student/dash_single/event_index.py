@@ -0,0 +1,123 @@
+""" In-memory index of the event details shown in the map card.
+
+The card is updated on every hoverData event from the map. Instead of querying the database on each hover, the
+details for every event are read once and stored in a dict keyed by a stable event key. The cards are also created
+once per app, so a hover only costs a dict lookup. The index is rebuilt when paralympics.db changes.
+
+The event key is the year and host separated by an underscore e.g. "2020_Tokyo", which is also the name of the
+logo file in assets/logos. The map figure stores the key for each marker in `customdata`.
+"""
+import threading
+
+import dash_bootstrap_components as dbc
+from dash import html
+
+from student.dash_single.db_pool import db_pool
+
+
+def event_key(year, host):
+    """ Returns the key for an event e.g. event_key(2020, "Tokyo") returns "2020_Tokyo" """
+    return f"{year}_{host}"
+
+
+def create_card(fields, app):
+    """ Creates the card for an event
+
+     Parameters
+     fields: dict with the name, logo_path, highlights, participants, events and countries for the event
+     app: the Dash app, used to get the url for the logo
+
+     Returns
+     card: dash bootstrap components Card
+     """
+    card = dbc.Card(
+        dbc.CardBody([
+            dbc.CardImg(src=app.get_asset_url(fields['logo_path']), style={'max-width': '140px', 'margin': '0 auto', 'display': 'block'}),
+            html.H4(fields['name'], className="card-title", style={'text-align': 'center'}),
+            html.P(fields['highlights'], className="card-text", style={'text-align': 'center'}),
+            html.P(f"Participants: {fields['participants']}", className="card-text", style={'text-align': 'center'}),
+            html.P(f"Events: {fields['events']}", className="card-text", style={'text-align': 'center'}),
+            html.P(f"Countries: {fields['countries']}", className="card-text", style={'text-align': 'center'}),
+        ]
+        ),
+        style={"width": "18rem", 'margin': '0 auto'},
+    )
+    return card
+
+
+class EventCardIndex:
+    """ Maps each event key to the card fields, and to the card created for each app.
+
+    Parameters
+    pool: the ConnectionPool for the database
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._version = None
+        self._fields = {}
+        self._cards = {}
+        self.builds = 0
+
+    def _check(self):
+        """ Builds the index if it is empty or the database has changed since it was built """
+        version = self._pool.version()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            self._fields = self._read_fields()
+            self._cards = {}
+            self._version = version
+            self.builds += 1
+
+    def _read_fields(self):
+        sql = '''
+        SELECT event.year, host.host, event.highlights, event.participants, event.events, event.countries
+        FROM event
+        JOIN host_event ON event.event_id = host_event.event_id
+        JOIN host ON host_event.host_id = host.host_id
+        '''
+        with self._pool.connection() as connection:
+            rows = connection.execute(sql).fetchall()
+        fields = {}
+        for year, host, highlights, participants, events, countries in rows:
+            key = event_key(year, host)
+            fields[key] = {
+                'name': f"{host} {year}",
+                'logo_path': f'logos/{key}.jpg',
+                'highlights': highlights,
+                'participants': str(participants),
+                'events': str(events),
+                'countries': str(countries),
+            }
+        return fields
+
+    def keys(self):
+        """ Returns the keys of all the events in the index """
+        self._check()
+        return list(self._fields)
+
+    def fields(self, key):
+        """ Returns the dict of card fields for the event, raises KeyError if the key is not in the index """
+        self._check()
+        return self._fields[key]
+
+    def card(self, key, app):
+        """ Returns the card for the event, the cards for all events are created the first time an app asks for one
+
+        Raises KeyError if the key is not in the index
+        """
+        self._check()
+        cards = self._cards.get(id(app))
+        if cards is None:
+            with self._lock:
+                cards = {k: create_card(fields, app) for k, fields in self._fields.items()}
+                self._cards[id(app)] = cards
+        return cards[key]
+
+
+# Shared index for paralympics.db used by para_card()
+event_index = EventCardIndex(db_pool)
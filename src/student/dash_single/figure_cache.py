@@ -0,0 +1,115 @@
+""" Memoized cache for the figures and components created in figures.py.
+
+The callbacks only ever ask for a small number of different figures (four line chart features, two bar chart
+types, one map, one histogram and a card for each event), so each figure is built once and the result is reused.
+
+Figures are stored as serialized JSON so a cache hit skips both pandas and Plotly. The Dash Graph component
+accepts the figure as a dict, so the cached figure is returned as a dict rather than a Plotly Figure object.
+
+Each entry is keyed by the function name, its arguments and the version of the data it was created from, so
+changing the data file means the old entries are no longer used and are evicted as new figures are added.
+"""
+import functools
+import json
+import threading
+from collections import OrderedDict
+
+
+class FigureCache:
+    """ Thread-safe least recently used (LRU) cache for figures.
+
+    Parameters
+    max_entries: maximum number of figures to keep
+    max_bytes: maximum total size of the serialized figures
+    """
+
+    def __init__(self, max_entries=128, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """ Returns (True, value) if the key is in the cache, otherwise (False, None). """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key][0]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, size=0):
+        """ Adds a value to the cache and evicts the least recently used entries until it is within budget.
+
+        Parameters
+        key: hashable key for the value
+        value: the value to store
+        size: size of the value in bytes, 0 for values that are not serialized
+        """
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while len(self._entries) > self.max_entries or (self.size > self.max_bytes and len(self._entries) > 1):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """ Removes all entries, the hit and miss counters are kept. """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """ Returns the cache counters as a dict, e.g. to log them or show them on a status page. """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def memoize(self, version=None, serialize=True):
+        """ Decorator that caches the result of a figure function.
+
+        Parameters
+        version: function that returns the current version of the data used by the figure
+        serialize: True to store a Plotly figure as JSON, False to store the returned object as it is (e.g. a card)
+
+        Returns
+        decorator: the original function is available as the __wrapped__ attribute of the decorated function
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key = (func.__qualname__, args, tuple(sorted(kwargs.items())), version() if version else None)
+                found, value = self.get(key)
+                if not found:
+                    value = func(*args, **kwargs)
+                    if serialize:
+                        value = value.to_json()
+                        self.put(key, value, len(value))
+                    else:
+                        self.put(key, value)
+                # Return a new dict each time so that a caller changing the figure does not change the cached copy
+                return json.loads(value) if serialize else value
+
+            return wrapper
+
+        return decorator
+
+
+# Shared cache for all the figure functions
+figure_cache = FigureCache()
@@ -1,11 +1,12 @@
-from importlib import resources
 import dash
 import pandas as pd
 import plotly.express as px
-import sqlite3
-from dash import html
-import dash_bootstrap_components as dbc
+from student.dash_single.data_store import events_store
+from student.dash_single.db_pool import db_pool, has_table
+from student.dash_single.event_index import event_index, event_key
+from student.dash_single.figure_cache import figure_cache
 
+@figure_cache.memoize(version=lambda: events_store.version)
 def line_chart(feature):
     """ Creates a line chart with data from paralympics.csv
 
@@ -27,75 +28,114 @@ def line_chart(feature):
         # Make sure it is lowercase to match the dataframe column names
         feature = feature.lower()
 
-    # Read the data from .csv into a DataFrame
+    # Get the data from paralympics.csv, the store only reads the file again if it has changed
     cols = ["type", "year", "host", feature]
+    line_chart_data = events_store.get(cols)
+
+    # Create a Plotly Express line chart with the following parameters
+    #    line_chart_data is the DataFrame
+    #    x="year" is the column to use as the x-axis
+    #    y=feature is the column to use as the y-axis
+    #    color="type" indicates if winter or summer
+    fig = px.line(line_chart_data, title=f"How has the number of {feature} changed over time?", x="year", y=feature, labels={"year": "Year", feature: ""}, color="type", template="simple_white")
+    return fig
+    
 
-    # Uses importlib.resources rather than pathlib.Path
-    with resources.open_text("student.data", "paralympics.csv") as file:
-        line_chart_data = pd.read_csv(file, usecols=cols)
+def line_chart_store():
+    """ Creates the data for the dcc.Store that lets the browser switch the line chart feature
 
-        # Create a Plotly Express line chart with the following parameters
-        #    line_chart_data is the DataFrame
-        #    x="year" is the column to use as the x-axis
-        #    y=feature is the column to use as the y-axis
-        #    color="type" indicates if winter or summer
-        fig = px.line(line_chart_data, title=f"How has the number of {feature} changed over time?", x="year", y=feature, labels={"year": "Year", feature: ""}, color="type", template="simple_white")
-        return fig
-    
+    The four line charts only differ in their data and title, so the layout is sent once.
+
+     Returns
+     store: dict with the shared "layout", and the "data" (traces) and "title" for each feature
+     """
+    store = {"layout": None, "data": {}, "title": {}}
+    for feature in ["events", "sports", "countries", "participants"]:
+        fig = line_chart(feature)
+        layout = fig["layout"]
+        store["title"][feature] = layout.pop("title")["text"]
+        store["data"][feature] = fig["data"]
+        store["layout"] = layout
+    return store
+
+
+def gender_ratios(df_events):
+    """
+    Calculates the ratio of male and female participants for all the summer and winter paralympics in one pass.
+
+    Parameters
+    df_events: DataFrame with the type, year, host, participants_m, participants_f and participants columns
+
+    Returns
+    ratios: dict with a DataFrame for each event type (in lowercase), sorted by year
+    """
+    cols = ['type', 'year', 'host', 'participants_m', 'participants_f', 'participants']
+    df_events = df_events[cols]
+    # Drop Rome as there is no male/female data
+    # Drop rows where male/female data is missing
+    df_events = df_events.dropna(subset=['participants_m', 'participants_f'])
+    df_events.reset_index(drop=True, inplace=True)
+
+    # Add new columns that each contain the result of calculating the % of male and female participants
+    df_events['Male'] = df_events['participants_m'] / df_events['participants']
+    df_events['Female'] = df_events['participants_f'] / df_events['participants']
+
+    # Sort the values by Type and Year
+    df_events.sort_values(['type', 'year'], ascending=(True, True), inplace=True)
+    # Create a new column that combines Location and Year to use as the x-axis
+    df_events['xlabel'] = df_events['host'] + ' ' + df_events['year'].astype(str)
+
+    # Split the table by type so each chart only needs a dict lookup
+    ratios = {event_type: df for event_type, df in df_events.groupby(df_events['type'].str.lower())}
+    # Empty table with the same columns for a type that is not in the data
+    ratios[None] = df_events.iloc[0:0]
+    return ratios
 
+
+@figure_cache.memoize(version=lambda: events_store.version)
 def bar_gender(event_type):
     """
     Creates a stacked bar chart showing change in the ration of male and female competitors in the summer and winter paralympics.
 
+    The ratios are calculated once for both types by gender_ratios() and shared by the summer and winter charts.
+
     Parameters
     event_type: str Winter or Summer
 
     Returns
     fig: Plotly Express bar chart
     """
-
-    cols = ['type', 'year', 'host', 'participants_m', 'participants_f', 'participants']
-    with resources.path("student.data", "paralympics.csv") as path:
-        df_events = pd.read_csv(path, usecols=cols)
-        # Drop Rome as there is no male/female data
-        # Drop rows where male/female data is missing
-        df_events = df_events.dropna(subset=['participants_m', 'participants_f'])
-        df_events.reset_index(drop=True, inplace=True)
-
-        # Add new columns that each contain the result of calculating the % of male and female participants
-        df_events['Male'] = df_events['participants_m'] / df_events['participants']
-        df_events['Female'] = df_events['participants_f'] / df_events['participants']
-
-        # Sort the values by Type and Year
-        df_events.sort_values(['type', 'year'], ascending=(True, True), inplace=True)
-        # Create a new column that combines Location and Year to use as the x-axis
-        df_events['xlabel'] = df_events['host'] + ' ' + df_events['year'].astype(str)
-
-        # Create the stacked bar plot of the % for male and female
-        df_events = df_events.loc[df_events['type'].str.lower() == event_type.lower()]
-        fig = px.bar(df_events,
-                     x='xlabel',
-                     y=['Male', 'Female'],
-                     title=f'Ratio of female:male participants changed in {event_type} paralympics?',
-                     labels={'xlabel': '', 'value': '', 'variable': ''},
-                     template="simple_white",
-                     color_discrete_map={'Male': 'blue', 'Female': 'green'}
-                     )
-        fig.update_xaxes(ticklen=0)
-        fig.update_yaxes(tickformat=".0%")
-        return fig
-
+    ratios = events_store.derived(gender_ratios)
+    df_events = ratios.get(event_type.lower(), ratios[None])
+
+    # Create the stacked bar plot of the % for male and female
+    fig = px.bar(df_events,
+                 x='xlabel',
+                 y=['Male', 'Female'],
+                 title=f'Ratio of female:male participants changed in {event_type} paralympics?',
+                 labels={'xlabel': '', 'value': '', 'variable': ''},
+                 template="simple_white",
+                 color_discrete_map={'Male': 'blue', 'Female': 'green'}
+                 )
+    fig.update_xaxes(ticklen=0)
+    fig.update_yaxes(tickformat=".0%")
+    return fig
+
+
+@figure_cache.memoize(version=db_pool.version)
 def scatter_geo():
-    with resources.path("student.data", "paralympics.db") as path:
-        # create database connection
-        connection = sqlite3.connect(path)
-
-        # define the sql query
-        sql = '''
-        SELECT event.year, host.host, host.latitude, host.longitude FROM event
-        JOIN host_event ON event.event_id = host_event.event_id
-        JOIN host on host_event.host_id = host.host_id
-        '''
+    # Borrow a read-only database connection from the pool, it is returned at the end of the with block
+    with db_pool.connection() as connection:
+
+        # define the sql query, use the summary table if the database has one rather than joining the tables
+        if has_table(connection, 'summary_event_location'):
+            sql = 'SELECT year, host, latitude, longitude FROM summary_event_location'
+        else:
+            sql = '''
+            SELECT event.year, host.host, host.latitude, host.longitude FROM event
+            JOIN host_event ON event.event_id = host_event.event_id
+            JOIN host on host_event.host_id = host.host_id
+            '''
         
         # Use pandas read_sql to run a sql query and access the results as a DataFrame
         df_locs = pd.read_sql(sql=sql, con=connection, index_col=None)
@@ -106,6 +146,9 @@ def scatter_geo():
         
         # Adds a new column that concatenates the city and year e.g. Barcelona 2012
         df_locs['name'] = df_locs['host'] + ' ' + df_locs['year'].astype(str)
+
+        # Adds the event key e.g. 2012_Barcelona, this is passed to the callback in the hoverData customdata
+        df_locs['key'] = [event_key(year, host) for year, host in zip(df_locs['year'], df_locs['host'])]
         
         {'points': [
     {
@@ -116,6 +159,7 @@ def scatter_geo():
         'lat': 40.7608,
         'location': None,
         'hovertext': 'Salt Lake City 2002',
+        'customdata': ['2002_Salt Lake City'],
         'bbox': {
             'x0': 358.1616351292792,
             'x1': 364.1616351292792,
@@ -130,65 +174,41 @@ def scatter_geo():
                              lat=df_locs.latitude,
                              lon=df_locs.longitude,
                              hover_name=df_locs.name,
+                             custom_data=['key'],
                              title="Where have the paralympics been held?",
                              )
         return fig
 
-def para_card(name, app):
-        
-        year = name[-4:]
-        host = name[:-5].strip()
-    
-        # Read the data into a DataFrame from the SQLite database
-        with resources.path("student.data", "paralympics.db") as path:
-            conn = sqlite3.connect(path)
-            with conn:
-                conn.execute("PRAGMA foreign_keys = ON")
-                query = """
-                SELECT * 
-                FROM event 
-                JOIN host_event ON event.event_id = host_event.event_id 
-                JOIN host ON host_event.host_id = host.host_id 
-                WHERE event.year = ? AND host.host = ?;
-                """
-                event_df = pd.read_sql_query(query, conn, params=[year, host])
-
-
-        # Variables for the card contents
-        logo_path = f'logos/{year}_{host}.jpg'
-        highlights = event_df.loc[event_df['host'] == host, 'highlights'].values[0]
-        participants = str(event_df.loc[event_df['host'] == host, 'participants'].values[0])
-        events = str(event_df.loc[event_df['host'] == host, 'events'].values[0])
-        countries = str(event_df.loc[event_df['host'] == host, 'countries'].values[0])
-
-        # Create the card
-        card = dbc.Card(
-            dbc.CardBody([
-            dbc.CardImg(src=app.get_asset_url(logo_path), style={'max-width': '140px', 'margin': '0 auto', 'display': 'block'}),
-            html.H4(f"{name}", className="card-title", style={'text-align': 'center'}),
-            html.P(highlights, className="card-text", style={'text-align': 'center'}),
-            html.P(f"Participants: {participants}", className="card-text", style={'text-align': 'center'}),
-            html.P(f"Events: {events}", className="card-text", style={'text-align': 'center'}),
-            html.P(f"Countries: {countries}", className="card-text", style={'text-align': 'center'}),
-            ]
-            ),
-            style={"width": "18rem", 'margin': '0 auto'},
-        )
-        return card
+def para_card(key, app):
+    """ Returns the card with details of an event
+
+     The cards are created once from the event index, so this does not query the database.
+
+     Parameters
+     key: the event key from the map customdata e.g. "2020_Tokyo"
+     app: the Dash app, used to get the url for the logo
+
+     Returns
+     card: dash bootstrap components Card
+     """
+    return event_index.card(key, app)
 
 # Histogram of the number of times countries have hosted the Paralympics
+@figure_cache.memoize(version=db_pool.version)
 def country_hist():
-    with resources.path("student.data", "paralympics.db") as path:
-        # create database connection
-        connection = sqlite3.connect(path)
-
-        # define the sql query
-        sql = '''
-        SELECT country.name as host, COUNT(country.name) as count FROM country
-        JOIN host ON host.country_code = country.code
-        JOIN host_event ON host.host_id = host_event.host_id
-        GROUP BY country.name
-        '''
+    # Borrow a read-only database connection from the pool, it is returned at the end of the with block
+    with db_pool.connection() as connection:
+
+        # define the sql query, use the summary table if the database has one rather than joining the tables
+        if has_table(connection, 'summary_host_count'):
+            sql = 'SELECT country as host, count FROM summary_host_count ORDER BY country'
+        else:
+            sql = '''
+            SELECT country.name as host, COUNT(country.name) as count FROM country
+            JOIN host ON host.country_code = country.code
+            JOIN host_event ON host.host_id = host_event.host_id
+            GROUP BY country.name
+            '''
         
         # Use pandas read_sql to run a sql query and access the results as a DataFrame
         df_host = pd.read_sql(sql=sql, con=connection, index_col=None)
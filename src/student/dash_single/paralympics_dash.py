@@ -1,81 +1,102 @@
 # Imports for Dash and Dash.html
+import os
+import threading
+
 from dash import Dash, html, dcc
 import dash_bootstrap_components as dbc
 from student.dash_single.figures import line_chart
+from student.dash_single.figures import line_chart_store
 from student.dash_single.figures import bar_gender
 from student.dash_single.figures import scatter_geo
 from student.dash_single.figures import para_card
 from student.dash_single.figures import country_hist
-from dash import Input, Output
+from student.dash_single.event_index import event_index
+from dash import Input, Output, State, ClientsideFunction
 
 # Variable that defines the meta tag for the viewport
 meta_tags = [
     {"name": "viewport", "content": "width=device-width, initial-scale=1"},
 ]
 
+# When True the line chart data for all the features is sent to the browser once, in a dcc.Store, and the dropdown
+# changes the chart using a clientside callback (see assets/line_chart.js). When False each change is a callback to
+# the server, which creates the chart using line_chart().
+CLIENTSIDE_LINE_CHART = True
+
 # Variable that contains the external_stylesheet to use, in this case Bootstrap styling from dash bootstrap components (dbc)
 external_stylesheets = [dbc.themes.PULSE]
 
-line_fig = line_chart("sports")
-fig_bar = bar_gender("summer")
-map = scatter_geo()
-histogram = country_hist()
-
 # Create an instance of the Dash app
 app = Dash(__name__, external_stylesheets=external_stylesheets, meta_tags=meta_tags)
-card = para_card("Tokyo 2020", app)
-
-# Add an HTML layout to the Dash app
-app.layout = dbc.Container([
-    # Layout goes here
-    dbc.Row([
-        html.H1("Paralympics Data Analytics"),
-        html.P("Lorem ipsum dolor sit amet, consectetur adipiscing elit. Praesent congue luctus elit nec gravida.")
-    ]),
-    dbc.Select(
-        options=[
-            {"label": "Events", "value": "events"},  # The value is in the format of the column heading in the data
-            {"label": "Sports", "value": "sports"},
-            {"label": "Countries", "value": "countries"},
-            {"label": "Participants", "value": "participants"},
-        ],
-        value="events",  # The default selection
-        id="dropdown-input",  # id uniquely identifies the element, will be needed later for callbacks
-    ),
-    html.Div(
-        [
-            dbc.Label("Select the Paralympic Games type"),
-            dbc.Checklist(
-                options=[
-                    {"label": "Summer", "value": "summer"},
-                    {"label": "Winter", "value": "winter"},
-                ],
-                value=["summer"],  # Values is a list as you can select 1 AND 2
-                id="checklist-input",
-            ),
-        ]
-    ),
-    dbc.Row([
-        dbc.Col(
-            dcc.Graph(id='line-chart', figure=line_fig),
-            width=5
+
+
+# The layout is a function so the figures are not created when the module is imported, which keeps startup fast.
+# Dash calls the function for each page load; the figures are created on the first request and then come from the
+# figure cache. The line chart, bar charts and card start empty and are filled by the callbacks.
+# See https://dash.plotly.com/live-updates#updates-on-page-load
+def serve_layout(placeholders=False):
+    """ Creates the layout for the app
+
+     Parameters
+     placeholders: True to leave the figures empty, used for the layout that Dash checks the callbacks against
+     """
+    return dbc.Container([
+        # Layout goes here
+        dbc.Row([
+            html.H1("Paralympics Data Analytics"),
+            html.P("Lorem ipsum dolor sit amet, consectetur adipiscing elit. Praesent congue luctus elit nec gravida.")
+        ]),
+        dbc.Select(
+            options=[
+                {"label": "Events", "value": "events"},  # The value is in the format of the column heading in the data
+                {"label": "Sports", "value": "sports"},
+                {"label": "Countries", "value": "countries"},
+                {"label": "Participants", "value": "participants"},
+            ],
+            value="events",  # The default selection
+            id="dropdown-input",  # id uniquely identifies the element, will be needed later for callbacks
+        ),
+        dcc.Store(id='line-chart-store', data=line_chart_store() if CLIENTSIDE_LINE_CHART and not placeholders else None),
+        html.Div(
+            [
+                dbc.Label("Select the Paralympic Games type"),
+                dbc.Checklist(
+                    options=[
+                        {"label": "Summer", "value": "summer"},
+                        {"label": "Winter", "value": "winter"},
+                    ],
+                    value=["summer"],  # Values is a list as you can select 1 AND 2
+                    id="checklist-input",
+                ),
+            ]
         ),
-        dbc.Col(
-            dcc.Graph(id='histogram', figure=histogram),
-            width=8
-        )
-    ]),
-    dbc.Row([
-           dbc.Col(
-            dcc.Graph(id='map', figure=map),
-            width=8
-        ), 
-        dbc.Col(children=[], id='card', width=4)
-    ]),
-    dbc.Row([
-            dbc.Col(children=[], id='bar-div', width=6)
-    ]),
-])
+        dbc.Row([
+            dbc.Col(
+                dcc.Graph(id='line-chart'),
+                width=5
+            ),
+            dbc.Col(
+                dcc.Graph(id='histogram', figure={} if placeholders else country_hist()),
+                width=8
+            )
+        ]),
+        dbc.Row([
+               dbc.Col(
+                dcc.Graph(id='map', figure={} if placeholders else scatter_geo()),
+                width=8
+            ), 
+            dbc.Col(children=[], id='card', width=4)
+        ]),
+        dbc.Row([
+                dbc.Col(children=[], id='bar-div', width=6)
+        ]),
+    ])
+
+
+# Setting the validation layout first stops Dash from calling serve_layout() (and creating the figures) on import
+app.validation_layout = serve_layout(placeholders=True)
+app.layout = serve_layout
+
 
 @app.callback(
     Output(component_id='bar-div', component_property='children'),
@@ -95,30 +116,69 @@ def update_bar_chart(selected_values):
         figures.append(element)
     return figures
 
+def update_line_chart(dropdown_value):
+    """ Updates the line chart based on the dropdown value.
+     This is separate from the card callback so hovering over the map does not recreate the line chart.
+     """
+    return line_chart(dropdown_value)
+
+
+if CLIENTSIDE_LINE_CHART:
+    # The function is paralympics.line_chart in assets/line_chart.js, it takes the figure from the line-chart-store
+    app.clientside_callback(
+        ClientsideFunction(namespace='paralympics', function_name='line_chart'),
+        Output('line-chart', 'figure'),
+        Input('dropdown-input', 'value'),
+        State('line-chart-store', 'data'),
+    )
+else:
+    app.callback(
+        Output('line-chart', 'figure'),  # The component being updated is the line-chart with id="line-chart"
+        Input('dropdown-input', 'value'),  # The input is the dropdown with id="dropdown-input"
+    )(update_line_chart)
+
+
 @app.callback(
-    Output('line-chart', 'figure'),  # The component being updated is the line-chart with id="line-chart"
     Output('card', 'children'),
-    Input('dropdown-input', 'value'),  # The input is the dropdown with id="dropdown-input"
     Input('map', 'hoverData')
 )
-def update_charts(dropdown_value, hover_data):
-    # Update line chart based on dropdown value
-    if dropdown_value == "events":
-        line_fig = line_chart("events")
-    elif dropdown_value == "sports":
-        line_fig = line_chart("sports")
-    elif dropdown_value == "countries":
-        line_fig = line_chart("countries")
-    elif dropdown_value == "participants":
-        line_fig = line_chart("participants")
-    # Update card based on hover data
-    if hover_data and 'points' in hover_data and hover_data['points']:
-        text = hover_data['points'][0].get('hovertext', 'Tokyo 2020')
-        card = para_card(text, app)
-    else:
-        card = None
-    return line_fig, card
-    
+def update_card(hover_data):
+    """ Updates the card based on the map marker that the mouse is over. """
+    points = (hover_data or {}).get('points') or []
+    # The map stores the event key e.g. '2020_Tokyo' in the customdata for each marker
+    customdata = points[0].get('customdata') if points else None
+    if not customdata:
+        return None
+    try:
+        return para_card(customdata[0], app)
+    except KeyError:
+        # The browser can still show a marker for an event that is not in the index after the data is reloaded
+        return None
+
+
+def warm_up():
+    """ Creates all the figures and cards so that they are in the cache before the first request """
+    serve_layout()
+    for event_type in ["summer", "winter"]:
+        bar_gender(event_type)
+    # The index is empty if the database has no events, then there is no card to create
+    keys = event_index.keys()
+    if keys:
+        para_card(keys[0], app)
+
+
+def start_warm_up():
+    """ Runs warm_up() in a background thread so the server can accept requests while the figures are created """
+    thread = threading.Thread(target=warm_up, name="figure-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+# Set the environment variable PARALYMPICS_WARM_UP=1 to create the figures in the background when the app is imported
+if os.environ.get("PARALYMPICS_WARM_UP") == "1":
+    start_warm_up()
+
 # Run the app
 if __name__ == '__main__':
+    start_warm_up()
     app.run(debug=True, port=5050)
\ No newline at end of file
@@ -26,11 +26,18 @@ def create_app(test_config=None):
     except OSError:
         pass
     
+    # Cache the responses of the routes decorated with cache.cached(), see response_cache.py
+    from student.flask_paralympics.response_cache import cache
+
+    cache.init_app(app)
+
     with app.app_context():
         # Register the blueprint
         from student.flask_paralympics.routes import main
+        from student.flask_paralympics.assets import assets
 
         app.register_blueprint(main)
+        app.register_blueprint(assets)
 
     return app
 
@@ -0,0 +1,62 @@
+"""
+Serves the plotly.js library once, at a URL with its version, so a page with a chart only needs the figure JSON.
+
+fig.to_html(include_plotlyjs=True) puts the whole plotly.js bundle (about 4.8MB) in every page with a chart. With
+include_plotlyjs=False the page only has the figure JSON and a call to Plotly.newPlot(), and loads plotly.js from
+    /assets/plotly-<version>.min.js
+The version is that of the plotly.js in the installed plotly package, so the URL changes when plotly is upgraded and
+the browser can keep the file for a year without checking it (Cache-Control: immutable). The file is read from the
+plotly package and gzipped once, and sent gzipped to clients that accept it.
+
+In a template, load plotly.js in the head before the chart with the macros in templates/plotly.html:
+    {% from 'plotly.html' import plotly_js, plotly_chart %}
+    {% block head %}{{ super() }}{{ plotly_js() }}{% endblock %}
+    {% block content %}{{ plotly_chart(fig_html) }}{% endblock %}
+
+Register the blueprint in create_app():
+    from student.flask_paralympics.assets import assets
+    app.register_blueprint(assets)
+"""
+import gzip
+import hashlib
+from functools import cache
+
+from flask import Blueprint, current_app, redirect, request, url_for
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+assets = Blueprint('assets', __name__, url_prefix='/assets')
+
+# One year, the most that browsers use
+MAX_AGE = 365 * 24 * 60 * 60
+
+
+@cache
+def plotly_js_bytes():
+    """Returns (bytes, gzipped bytes, ETag) of plotly.js, created the first time it is requested."""
+    data = get_plotlyjs().encode()
+    return data, gzip.compress(data, compresslevel=9, mtime=0), hashlib.sha1(data).hexdigest()
+
+
+@assets.app_template_global()
+def plotly_js_url():
+    """Returns the URL of plotly.js for the installed version, available in the templates as plotly_js_url()."""
+    return url_for('assets.plotly_js', version=get_plotlyjs_version())
+
+
+@assets.get('/plotly-<version>.min.js')
+def plotly_js(version):
+    # A page cached before plotly was upgraded is sent to the current version
+    if version != get_plotlyjs_version():
+        return redirect(plotly_js_url())
+    data, gzipped, etag = plotly_js_bytes()
+    use_gzip = 'gzip' in request.accept_encodings
+    response = current_app.response_class(gzipped if use_gzip else data, mimetype='text/javascript')
+    if use_gzip:
+        response.content_encoding = 'gzip'
+    response.vary.add('Accept-Encoding')
+    # The gzipped bytes are a different representation so have their own ETag
+    response.set_etag(f'{etag}-gzip' if use_gzip else etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = MAX_AGE
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
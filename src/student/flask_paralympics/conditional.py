@@ -0,0 +1,84 @@
+"""
+Contains the conditional() decorator, which answers conditional GET requests for a view without running it when the
+data the view reads has not changed. Used by the JSON API (placeholder/api.py).
+
+Each response has an ETag, the hash of its body, and a Last-Modified time from DataVersion
+(placeholder/data_version.py), which must be in app.extensions['data_version']. The ETag is saved with the version of
+the tables the response uses. A request with If-None-Match (or If-Modified-Since) for a response whose tables have not
+changed gets a 304 Not Modified without calling the view. Otherwise the view is called and, if the ETag of its
+response still matches, a 304 is returned in place of the body.
+
+Usage:
+    @api.get('/countries')
+    @conditional('country')
+    def countries():
+        ...
+"""
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+# The number of ETags kept, one for each path and query string, the least recently used are removed first
+MAX_ETAGS = 1024
+
+# Guards the saved ETags in app.extensions['conditional_etags'], which are shared by the request threads
+_etags_lock = threading.Lock()
+
+
+def not_modified(etag, last_modified):
+    """Returns True if the request's If-None-Match or If-Modified-Since header shows the client has the response.
+    If-Modified-Since is only used when there is no If-None-Match, as in RFC 9110."""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def validators(response, etag, last_modified):
+    """Adds the headers a client needs to make a conditional request for the response."""
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # The client may keep the response but must check it is still current before using it
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(*tables):
+    """Decorates a view so it answers conditional GET requests, see the module docstring.
+
+    Parameters
+    ----------
+    tables: the names of the tables the view reads, a change to any of them changes the response
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version, last_modified = current_app.extensions['data_version'].get(tables)
+            etags = current_app.extensions.setdefault('conditional_etags', OrderedDict())
+            key = request.full_path
+            with _etags_lock:
+                saved = etags.get(key)
+                if saved is not None:
+                    etags.move_to_end(key)
+            if saved is not None and saved[0] == version and not_modified(saved[1], last_modified):
+                return validators(current_app.response_class(status=304), saved[1], last_modified)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            response.add_etag()
+            etag = response.get_etag()[0]
+            with _etags_lock:
+                etags[key] = (version, etag)
+                etags.move_to_end(key)
+                while len(etags) > MAX_ETAGS:
+                    etags.popitem(last=False)
+            validators(response, etag, last_modified)
+            if not_modified(etag, last_modified):
+                response = validators(current_app.response_class(status=304), etag, last_modified)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,320 @@
+"""
+Contains a server side cache for the responses of Flask routes, so a page or API response is only created again
+when the data it shows has changed.
+
+A route is cached with the cached() decorator of the `cache` object, with the tables it reads as tags:
+    @api.get('/medals')
+    @cache.cached(ttl=600, tags=['medal_result'])
+    def medals():
+        ...
+
+A cached response is used until its ttl (seconds) has passed, or until one of its tags has changed. The tags are the
+table names used by DataVersion (student/placeholder/data_version.py), which records when each table was last changed
+by a commit of the SQLAlchemy session, or by another process such as `flask init-db` or an ingest. A response is
+fresh if it was started after the last change to its tags, so a response from before a change is never used after
+it. Without a DataVersion only the ttl is used. Use invalidate() for changes DataVersion cannot see.
+
+Only GET and HEAD requests with a 200 response, and no Set-Cookie header, are cached. The key is the endpoint and the
+path with its query string.
+
+The backend is set in the app config:
+    RESPONSE_CACHE_BACKEND: 'memory' (default), an LRU cache in each process, 'filesystem', shared by the processes
+                            on the server, or None to turn the cache off
+    RESPONSE_CACHE_MAX_ENTRIES: the most responses kept, the least recently used are removed first (default 512).
+                                The filesystem backend can go an eighth over before removing them
+    RESPONSE_CACHE_DIR: directory for the filesystem backend (default response_cache in the instance folder)
+    RESPONSE_CACHE_DEFAULT_TTL: ttl for a route that does not give one, 0 for no limit (default 300)
+    RESPONSE_CACHE_STATS_URL: if set, e.g. '/_cache/stats', the hit and miss counts are served as JSON at this URL
+
+Each cached response has an X-Cache header of HIT or MISS, and cache.stats() returns the counts for tuning.
+"""
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+
+from flask import current_app, jsonify, request
+
+# body: bytes, status: int, headers: list of (name, value), started: UTC datetime the view was called,
+# expires: time.time() after which the entry is not used, or None, tags: the tables the response was created from
+CacheEntry = namedtuple('CacheEntry', ['body', 'status', 'headers', 'started', 'expires', 'tags'])
+
+
+class MemoryBackend:
+    """Keeps up to max_entries responses in a dict in this process, the least recently used is removed first."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        """Saves the entry. Returns the number of entries removed to make space."""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            removed = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                removed += 1
+            return removed
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def entry_to_json(entry):
+    """Returns the entry as JSON text, with the body as base64."""
+    return json.dumps({'body': base64.b64encode(entry.body).decode('ascii'), 'status': entry.status,
+                       'headers': entry.headers, 'started': entry.started.isoformat(), 'expires': entry.expires,
+                       'tags': list(entry.tags)})
+
+
+def entry_from_json(text):
+    """Returns the CacheEntry of JSON text from entry_to_json()."""
+    data = json.loads(text)
+    return CacheEntry(base64.b64decode(data['body'], validate=True), data['status'],
+                      [(name, value) for name, value in data['headers']], datetime.fromisoformat(data['started']),
+                      data['expires'], tuple(data['tags']))
+
+
+class FileSystemBackend:
+    """Keeps about max_entries responses as JSON files in a directory, so they are shared by the processes of a
+    server and kept when it restarts. The files that were least recently used are removed first.
+
+    The entries are JSON rather than pickle, as loading a pickle from a directory other processes can write to could
+    run code. Each process counts the files it adds, and only lists the directory to remove the oldest once its count
+    is more than an eighth over max_entries, so a cache miss does not read every file. The listing corrects the count
+    for the files other processes have added or removed.
+    """
+
+    def __init__(self, directory, max_entries=512):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._count = len(list(self.directory.glob('*.json')))
+
+    def _path(self, key):
+        return self.directory / f'{hashlib.sha256(key.encode()).hexdigest()}.json'
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            entry = entry_from_json(path.read_text(encoding='utf-8'))
+            # The modified time is used as the last use time when entries are removed
+            os.utime(path)
+            return entry
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def set(self, key, entry):
+        """Saves the entry, replacing the file so a reader never sees a partly written entry. Returns the number of
+        entries removed to make space."""
+        path = self._path(key)
+        added = not path.exists()
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(entry_to_json(entry))
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        with self._lock:
+            self._count += added
+            if self._count <= self.max_entries + self.max_entries // 8:
+                return 0
+            return self._remove_oldest()
+
+    def _remove_oldest(self):
+        """Removes the least recently used files down to max_entries. Called with the lock held."""
+        paths = list(self.directory.glob('*.json'))
+        removed = 0
+        if len(paths) > self.max_entries:
+            by_use = sorted(paths, key=lambda path: path.stat().st_mtime if path.exists() else 0)
+            for path in by_use[:len(paths) - self.max_entries]:
+                path.unlink(missing_ok=True)
+                removed += 1
+        self._count = len(paths) - removed
+        return removed
+
+    def delete(self, key):
+        path = self._path(key)
+        if path.exists():
+            path.unlink(missing_ok=True)
+            with self._lock:
+                self._count = max(self._count - 1, 0)
+
+    def clear(self):
+        with self._lock:
+            for path in self.directory.glob('*.json'):
+                path.unlink(missing_ok=True)
+            self._count = 0
+
+    def __len__(self):
+        """Returns the number of entries counted by this process, corrected each time the oldest are removed."""
+        return self._count
+
+
+class ResponseCache:
+    """Caches the responses of the routes decorated with cached(), see the module docstring.
+
+    The cache is created once at import, like the db object, and set up for an app with init_app(). A decorated
+    route is not cached in an app that has not called init_app() or has RESPONSE_CACHE_BACKEND = None.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_BACKEND', 'memory')
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', 512)
+        app.config.setdefault('RESPONSE_CACHE_DIR', os.path.join(app.instance_path, 'response_cache'))
+        app.config.setdefault('RESPONSE_CACHE_DEFAULT_TTL', 300)
+        app.config.setdefault('RESPONSE_CACHE_STATS_URL', None)
+
+        backend = app.config['RESPONSE_CACHE_BACKEND']
+        if backend is None:
+            return
+        if backend == 'memory':
+            backend = MemoryBackend(app.config['RESPONSE_CACHE_MAX_ENTRIES'])
+        elif backend == 'filesystem':
+            backend = FileSystemBackend(app.config['RESPONSE_CACHE_DIR'], app.config['RESPONSE_CACHE_MAX_ENTRIES'])
+        else:
+            raise ValueError(f"RESPONSE_CACHE_BACKEND must be 'memory', 'filesystem' or None, not {backend!r}")
+        app.extensions['response_cache'] = {'backend': backend, 'stats': Counter(), 'endpoints': {},
+                                            'lock': threading.Lock()}
+
+        if app.config['RESPONSE_CACHE_STATS_URL']:
+            app.add_url_rule(app.config['RESPONSE_CACHE_STATS_URL'], 'response_cache_stats',
+                             lambda: jsonify(self.stats()))
+
+    @staticmethod
+    def _state():
+        return current_app.extensions.get('response_cache')
+
+    @staticmethod
+    def _count(state, endpoint, outcome):
+        with state['lock']:
+            state['stats'][outcome] += 1
+            state['endpoints'].setdefault(endpoint, Counter())[outcome] += 1
+
+    @staticmethod
+    def _changed(tags):
+        """Returns the time of the last change to the tables, or None if the app has no DataVersion."""
+        data_version = current_app.extensions.get('data_version')
+        if data_version is None or not tags:
+            return None
+        return data_version.get(tags)[1]
+
+    def cached(self, ttl=None, tags=()):
+        """Decorates a view so its response is cached.
+
+        Parameters
+        ----------
+        ttl: seconds the response is used for, the default is RESPONSE_CACHE_DEFAULT_TTL, 0 for no limit
+        tags: the names of the tables the view reads, the response is not used once any of them has changed
+        """
+        tags = tuple(tags)
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                state = self._state()
+                if state is None or request.method not in ('GET', 'HEAD'):
+                    return view(*args, **kwargs)
+                backend = state['backend']
+                key = f'{request.endpoint}:{request.full_path}'
+                endpoint = request.endpoint
+                changed = self._changed(tags)
+
+                entry = backend.get(key)
+                if entry is not None:
+                    if entry.expires is not None and time.time() > entry.expires:
+                        self._count(state, endpoint, 'expired')
+                    elif changed is not None and entry.started <= changed:
+                        self._count(state, endpoint, 'invalidated')
+                    else:
+                        self._count(state, endpoint, 'hits')
+                        response = current_app.response_class(entry.body, status=entry.status, headers=entry.headers)
+                        response.headers['X-Cache'] = 'HIT'
+                        return response.make_conditional(request)
+                self._count(state, endpoint, 'misses')
+
+                # The time before the view is called, so a change made while it runs makes the response stale
+                started = datetime.now(timezone.utc)
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200 and 'Set-Cookie' not in response.headers \
+                        and not response.is_streamed:
+                    seconds = current_app.config['RESPONSE_CACHE_DEFAULT_TTL'] if ttl is None else ttl
+                    expires = time.time() + seconds if seconds else None
+                    headers = [(name, value) for name, value in response.headers if name != 'X-Cache']
+                    removed = backend.set(key, CacheEntry(response.get_data(), response.status_code, headers,
+                                                          started, expires, tags))
+                    self._count(state, endpoint, 'stores')
+                    if removed:
+                        with state['lock']:
+                            state['stats']['evictions'] += removed
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        """Makes the cached responses with any of the tags stale, or every response if no tags are given."""
+        data_version = current_app.extensions.get('data_version')
+        if data_version is not None:
+            data_version.bump(tags or None)
+        elif self._state() is not None:
+            self._state()['backend'].clear()
+
+    def clear(self):
+        """Removes every cached response."""
+        if self._state() is not None:
+            self._state()['backend'].clear()
+
+    def stats(self):
+        """Returns the hit, miss, invalidated, expired, store and eviction counts for this process, in total and for
+        each endpoint, with the hit ratio and the number of entries."""
+        state = self._state()
+        if state is None:
+            return {'enabled': False}
+        with state['lock']:
+            totals = dict(state['stats'])
+            endpoints = {name: dict(counts) for name, counts in state['endpoints'].items()}
+        requests = totals.get('hits', 0) + totals.get('misses', 0)
+        return {
+            'enabled': True,
+            'backend': type(state['backend']).__name__,
+            'entries': len(state['backend']),
+            'hit_ratio': totals.get('hits', 0) / requests if requests else None,
+            'totals': totals,
+            'endpoints': endpoints,
+        }
+
+
+cache = ResponseCache()
@@ -5,216 +5,305 @@ Uses the SQLAlchemy object, db.
 """
 from importlib import resources
 
-import pandas as pd
-from sqlalchemy import func
+from sqlalchemy import func, insert
 from sqlalchemy.exc import SQLAlchemyError
 
 from tutor.flask_para_t import db
 from tutor.flask_para_t.models import Country, Disability, DisabilityEvent, Event, Host, HostEvent, MedalResult, \
     Participants
+from student.placeholder.load_report import LoadReport, report_plan
+from student.placeholder.prepare import MedalEventLookup, prepare_countries, prepare_disabilities, prepare_events, \
+    prepare_host_events, prepare_hosts, prepare_medal_results
+from student.placeholder.scheduler import LoadStep, run_load_plan
+from student.placeholder.snapshot import read_sheets
+from student.placeholder.summary_tables import refresh_summary_tables
 
 
-def add_country_data(df):
-    """Add the country data to the paralympics database."""
-    # Insert all values into the country table
+def get_ids(query):
+    """Returns a dict of key to id from a query that selects the key column(s) then the id column.
+
+    Where the key matches more than one row, the first row is used.
+    """
+    ids = {}
+    for *key, row_id in db.session.execute(query).all():
+        ids.setdefault(key[0] if len(key) == 1 else tuple(key), row_id)
+    return ids
+
+
+def insert_countries(rows, session, report=None):
+    """Inserts the rows from prepare_countries() into the country table."""
+    report = report or LoadReport()
+    columns = ['code', 'name', 'region', 'sub_region', 'member_type', 'notes']
+    with report.phase('country', 'insert'):
+        session.execute(insert(Country), [dict(zip(columns, row)) for row in rows])
+    report.count('country', read=len(rows), inserted=len(rows))
+
+
+def insert_events(rows, session, report=None):
+    """Inserts the rows from prepare_events() into the event and participants tables."""
+    report = report or LoadReport()
+    with report.phase('event', 'insert'):
+        for (event_type, year, start, end, countries, events, sports, highlights, url,
+             participants_m, participants_f, participants) in rows:
+            event = Event(type=event_type, year=year, start=start, end=end, countries=countries, events=events,
+                          sports=sports, highlights=highlights, url=url)
+            # Use the relationship definition to add the participants data
+            event.participants = Participants(participants_m=participants_m,
+                                              participants_f=participants_f,
+                                              participants=participants)
+            session.add(event)  # adds the events and participants data to the session
+        session.flush()
+    report.count('event', read=len(rows), inserted=len(rows))
+    report.count('participants', read=len(rows), inserted=len(rows))
+
+
+def insert_hosts(rows, session, report=None):
+    """Inserts the (host, country) pairs from prepare_hosts() into the host table.
+
+    A host whose country is not in the country table is not added, it is counted as skipped in the report.
+    """
+    report = report or LoadReport()
+    # Get the country code for each country name from the country table
+    with report.phase('host', 'key_resolution'):
+        country_codes = get_ids(db.select(Country.name, Country.code))
+        hosts = [{'country_code': country_codes[country], 'host': host}
+                 for host, country in rows if country in country_codes]
+    if hosts:
+        with report.phase('host', 'insert'):
+            session.execute(insert(Host), hosts)
+    report.count('host', read=len(rows), inserted=len(hosts), skipped=len(rows) - len(hosts))
+
+
+def insert_host_events(rows, session, report=None):
+    """Inserts the rows from prepare_host_events() into the host_event table.
+
+    A row whose event or host is not in the database is not added, it is counted as skipped in the report.
+    """
+    report = report or LoadReport()
+    # Find the event id for each event, this matches based on the year and type of event, and the host_id for
+    # each host name
+    with report.phase('host_event', 'key_resolution'):
+        event_ids = get_ids(db.select(Event.year, Event.type, Event.event_id))
+        host_ids = get_ids(db.select(Host.host, Host.host_id))
+        host_events = [{'host_id': host_ids[host], 'event_id': event_ids[(year, event_type)]}
+                       for year, event_type, host in rows if (year, event_type) in event_ids and host in host_ids]
+    if host_events:
+        with report.phase('host_event', 'insert'):
+            session.execute(insert(HostEvent), host_events)
+    report.count('host_event', read=len(rows), inserted=len(host_events), skipped=len(rows) - len(host_events))
+
+
+def insert_disabilities(rows, session, report=None):
+    """Inserts the rows from prepare_disabilities() into the disability and disability_event tables.
+
+    A row whose event is not in the database is not added to disability_event, it is counted as skipped in the
+    report.
+    """
+    report = report or LoadReport()
+    # Insert the unique categories, in the order they are first found
+    categories = dict.fromkeys(category for year, event_type, category in rows)
+    with report.phase('disability', 'insert'):
+        session.execute(insert(Disability), [{'category': d} for d in categories])
+    report.count('disability', read=len(categories), inserted=len(categories))
+
+    # Find the event id for each event and the disability id for each category
+    with report.phase('disability_event', 'key_resolution'):
+        event_ids = get_ids(db.select(Event.year, Event.type, Event.event_id))
+        disability_ids = get_ids(db.select(Disability.category, Disability.disability_id))
+        disability_events = [{'event_id': event_ids[(year, event_type)], 'disability_id': disability_ids[d]}
+                             for year, event_type, d in rows if (year, event_type) in event_ids]
+    if disability_events:
+        with report.phase('disability_event', 'insert'):
+            session.execute(insert(DisabilityEvent), disability_events)
+    report.count('disability_event', read=len(rows), inserted=len(disability_events),
+                 skipped=len(rows) - len(disability_events))
+
+
+def medal_event_lookup():
+    """Returns a MedalEventLookup for the events in the database."""
+    event_hosts = db.session.execute(db.select(Event.year, Host.host, Event.event_id)
+                                     .join(Event.host_events).join(HostEvent.host)).all()
+    return MedalEventLookup(event_hosts)
+
+
+def insert_medal_results(rows, session, lookup=None, report=None):
+    """Inserts the rows from prepare_medal_results() into the medal_result table.
+
+    The event id for each result is found from the year and location, as the medal standings do not have the type,
+    see MedalEventLookup. A result for an event that is not in the database is not added, it is counted as skipped in
+    the report.
+    """
+    report = report or LoadReport()
+    with report.phase('medal_result', 'key_resolution'):
+        if lookup is None:
+            lookup = medal_event_lookup()
+        medal_results = []
+        for year, location, npc, rank, gold, silver, bronze, total in rows:
+            event_id = lookup.event_id(year, location)
+            if event_id is not None:
+                medal_results.append({'event_id': event_id, 'country_code': npc, 'rank': rank, 'gold': gold,
+                                      'silver': silver, 'bronze': bronze, 'total': total})
+    if medal_results:
+        with report.phase('medal_result', 'insert'):
+            session.execute(insert(MedalResult), medal_results)
+    report.count('medal_result', read=len(rows), inserted=len(medal_results),
+                 skipped=len(rows) - len(medal_results))
+
+
+def add_country_data(df, report=None):
+    """Add the country data to the paralympics database. Returns the LoadReport."""
+    report = report or LoadReport()
     try:
-        for index, row in df.iterrows():
-            # The row is pandas series, we want the series as a list of values
-            row_values = row.tolist()
-            new_country = Country(code=row_values[0],
-                                  name=row_values[1],
-                                  region=row_values[2],
-                                  sub_region=row_values[3],
-                                  member_type=row_values[4],
-                                  notes=row_values[5])
-            db.session.add(new_country)
-        db.session.commit()
+        with report.phase('country', 'transform'):
+            rows = prepare_countries(df)
+        insert_countries(rows, db.session, report)
+        with report.phase('country', 'commit'):
+            db.session.commit()
     except SQLAlchemyError as e:
         print(f'An error occurred adding country data to the paralympics database. Error: {e}')
+        report.error('country', e)
         db.session.rollback()  # Rollback the changes on error
+    return report
 
 
-def add_event_data(df):
-    """Add event and participant data to the paralympics database."""
+def add_event_data(df, report=None):
+    """Add event and participant data to the paralympics database. Returns the LoadReport."""
+    report = report or LoadReport()
     try:
-        # Convert the dates to strings
-        df['start'] = df['start'].dt.strftime('%d/%m/%Y')
-        df['end'] = df['end'].dt.strftime('%d/%m/%Y')
-
-        # Insert the values into the event table
-        for index, row in df.iterrows():
-            event = Event(type=row['type'],
-                          year=row['year'],
-                          start=str(row['start']),
-                          end=str(row['end']),
-                          countries=row['countries'],
-                          events=row['events'],
-                          sports=row['sports'],
-                          highlights=row['highlights'],
-                          url=row['url'])
-
-            # Use the relationship definition to add the participants data
-            event.participants = Participants(participants_m=row['participants_m'],
-                                              participants_f=row['participants_f'],
-                                              participants=row['participants'])
-            db.session.add(event)  # adds the events and participants data to the session
-        db.session.commit()
+        with report.phase('event', 'transform'):
+            rows = prepare_events(df)
+        insert_events(rows, db.session, report)
+        with report.phase('event', 'commit'):
+            db.session.commit()
     except SQLAlchemyError as e:
         print(f'An error occurred adding event data to the paralympics database. Error: {e}')
+        report.error('event', e)
         db.session.rollback()
+    return report
 
 
-def add_host_data(df_events):
-    """Add host data database."""
-
+def add_host_data(df_events, report=None):
+    """Add host data database. Returns the LoadReport."""
+    report = report or LoadReport()
     try:
-        # Extract unique host name and country pairs
-        # Initialize an empty DataFrame with the columns needed
-        host_country_df = pd.DataFrame(columns=['host', 'country'])
-        # Iterate over each row in the events DataFrame and split each column into multiple values where there is ','
-        for index, row in df_events.iterrows():
-            hosts = row['host'].split(',')
-            countries = row['country'].split(',')
-            # Create pairs of each host with each country and append to the DataFrame
-            for host, country in zip(hosts, countries):
-                new_row = pd.DataFrame({'host': [host.strip()], 'country': [country.strip()]})
-                host_country_df = pd.concat([host_country_df, new_row], ignore_index=True)
-        # Remove duplicate hosts from the dataframe
-        host_country_df = host_country_df.drop_duplicates(subset=['host', 'country'])
-
-        # Iterate over the dataframe, add the host and country to the host table
-        for index, row in host_country_df.iterrows():
-            # Get the country code from the country table
-            country_name = row['country']
-            country = Country.query.filter_by(name=country_name).first()
-            if country:
-                new_host = Host(country_code=country.code, host=row['host'])
-                db.session.add(new_host)
-        # Commit the changes
-        db.session.commit()
-
+        with report.phase('host', 'transform'):
+            rows = prepare_hosts(df_events)
+        insert_hosts(rows, db.session, report)
+        with report.phase('host', 'commit'):
+            db.session.commit()
     except SQLAlchemyError as e:
         print(f'An error occurred adding host data to the paralympics database. Error: {e}')
-        db.session.rollback()
-
+        report.error('host', e)
+        db.session.rollback()  # Rollback the changes on error
+    return report
 
-def add_host_event_data(df):
-    """Add HostEvent data to the paralympics database."""
 
+def add_host_event_data(df, report=None):
+    """Add HostEvent data to the paralympics database. Returns the LoadReport."""
+    report = report or LoadReport()
     try:
-        # Iterate each event, find the pairs of hosts, then get the event_id and host_id and insert into the host_event table
-        for index, row in df.iterrows():
-            hosts = row['host'].split(',')
-            # Find the event id for the event. This matches based on the year and type of event.
-            query = db.select(Event).where(Event.year == row['year'], Event.type == row['type'])
-            event = db.session.execute(query).scalar_one_or_none()
-            if event:
-                event_id = event.event_id
-                # Find the host_id for each host
-                for host_name in hosts:
-                    query = db.select(Host).where(Host.host == host_name.strip())
-                    host = db.session.execute(query).scalar_one_or_none()
-                    if host:
-                        host_id = host.host_id
-                        # Insert the host_event pair
-                        new_host_event = HostEvent(host_id=host_id, event_id=event_id)
-                        db.session.add(new_host_event)
-        db.session.commit()
-
+        with report.phase('host_event', 'transform'):
+            rows = prepare_host_events(df)
+        insert_host_events(rows, db.session, report)
+        with report.phase('host_event', 'commit'):
+            db.session.commit()
     except SQLAlchemyError as e:
         print(f'An error occurred adding host_event data to the paralympics database. Error: {e}')
+        report.error('host_event', e)
         db.session.rollback()
+    return report
 
 
-def add_disabilities_data(df):
-    """Add Disability and DisabilityEvent data."""
-
+def add_disabilities_data(df, report=None):
+    """Add Disability and DisabilityEvent data. Returns the LoadReport."""
+    report = report or LoadReport()
     try:
-        # Split the comma-separated values into lists
-        split_disabilities = df['disabilities'].str.split(', ')
-        # Flatten the list of lists into a single list
-        all_disabilities = [item for sublist in split_disabilities for item in sublist]
-        # Convert the list to a set to get unique values
-        unique_disabilities = set(all_disabilities)
-        # Insert the unique values into the table
-        for d in unique_disabilities:
-            new_disability = Disability(category=d)
-            db.session.add(new_disability)
-        db.session.commit()
-
-        # Iterate each result row in the event table
-        for index, row in df.iterrows():
-            # find the event
-            query = db.select(Event).where(Event.year == row['year'], Event.type == row['type'])
-            event = db.session.execute(query).scalar_one_or_none()
-            if event:
-                # Split the values for the disabilities
-                disabilities = row['disabilities'].split(', ')
-                # Add each disability
-                for d in disabilities:
-                    # Find the disability
-                    query = db.select(Disability).where(Disability.category == d)
-                    disability = db.session.execute(query).scalar_one_or_none()
-                    if disability:
-                        de = DisabilityEvent(event_id=event.event_id, disability_id=disability.disability_id)
-                        event.disability_events.append(de)
-                        disability.disability_events.append(de)
-                db.session.commit()
-
+        with report.phase('disability', 'transform'):
+            rows = prepare_disabilities(df)
+        insert_disabilities(rows, db.session, report)
+        with report.phase('disability', 'commit'):
+            db.session.commit()
     except SQLAlchemyError as e:
         print(f'An error occurred adding disability data to the paralympics database. Error: {e}')
+        report.error('disability', e)
         db.session.rollback()
+    return report
 
 
-def add_medal_result_data(df):
-    """Add MedalResult data to the paralympics database."""
+def add_medal_result_data(df, report=None):
+    """Add MedalResult data to the paralympics database. Returns the LoadReport."""
+    report = report or LoadReport()
     try:
-        # Iterate each result row, get the event_id and code and insert into the MedalResult table
-        for index, row in df.iterrows():
-            # Find the event id for the event. This matches based on the year and host name.
-            query = db.select(Event).join(Event.host_events).join(HostEvent.host).where(Event.year == row['Year'],
-                                                                                        Host.host == row['Location'])
-            event = db.session.execute(query).scalar_one_or_none()
-            if event:
-                # Insert the medal results
-                event.medal_results.append(MedalResult(
-                    country_code=row['NPC'],
-                    rank=row['Rank'],
-                    gold=row['Gold'],
-                    silver=row['Silver'],
-                    bronze=row['Bronze'],
-                    total=row['Total']
-                ))
-                db.session.commit()
-
+        with report.phase('medal_result', 'transform'):
+            rows = prepare_medal_results(df)
+        insert_medal_results(rows, db.session, report=report)
+        with report.phase('medal_result', 'commit'):
+            db.session.commit()
     except SQLAlchemyError as e:
         print(f'An error occurred adding MedalResult data. Error: {e}')
+        report.error('medal_result', e)
         db.session.rollback()
+    return report
+
+
+# The model for each table, with the sheet and functions used by the scheduler. Each table depends on the tables its
+# foreign keys refer to, and medal_result uses the hosts to find the event.
+LOAD_PLAN = {
+    'country': (Country, LoadStep('npc_codes', prepare_countries, insert_countries, [])),
+    'event': (Event, LoadStep('events', prepare_events, insert_events, [])),
+    'host': (Host, LoadStep('events', prepare_hosts, insert_hosts, ['country'])),
+    'host_event': (HostEvent, LoadStep('events', prepare_host_events, insert_host_events, ['host', 'event'])),
+    'disability': (Disability, LoadStep('events', prepare_disabilities, insert_disabilities, ['event'])),
+    'medal_result': (MedalResult, LoadStep('medal_standings', prepare_medal_results, insert_medal_results,
+                                           ['country', 'event', 'host_event'])),
+}
+
+
+def add_all_data(sheets=None, report=None, executor=None):
+    """Adds all the data to the tables that are empty. Returns a LoadReport with the rows and time for each table,
+    see load_report.py.
 
+    The tables are added in the order needed for the foreign keys by the scheduler, see scheduler.py.
+    All the tables are added in one transaction.
 
-def add_all_data():
-    """Adds all the data.
+    Parameters
+    ----------
+    sheets: dict with the events, medal_standings and npc_codes dataframes, the default is to read them from
+            paralympics.xlsx
+    report: LoadReport to add to, the default is a new report
+    executor: optional concurrent.futures executor passed to run_load_plan() to prepare the tables in, the default is
+              to prepare them in this thread. The caller creates and shuts down the executor.
     """
-    # Specifies the path to the data file
-    data_path = resources.files("tutor.data").joinpath("paralympics.xlsx")
-
-    # Read data and create pandas dataframes
-    events_df = pd.read_excel(data_path, sheet_name='events')
-    medals_df = pd.read_excel(data_path, sheet_name='medal_standings')
-    npc_df = pd.read_excel(data_path, sheet_name='npc_codes')
-
-    # List of tables and corresponding data addition functions and dataframes
-    tables_and_functions = [
-        (Country, add_country_data, npc_df),
-        (Event, add_event_data, events_df),
-        (Host, add_host_data, events_df),
-        (HostEvent, add_host_event_data, events_df),
-        (Disability, add_disabilities_data, events_df),
-        (MedalResult, add_medal_result_data, medals_df)
-    ]
-
-    # Add data to the tables if they are empty
-    for table, add_data_function, data in tables_and_functions:
+    report = report or LoadReport()
+    if sheets is None:
+        # Specifies the path to the data file
+        data_path = resources.files("tutor.data").joinpath("paralympics.xlsx")
+
+        # Read data and create pandas dataframes, from the snapshot of the sheets if the workbook has not changed
+        with report.phase(None, 'read'):
+            sheets = read_sheets(data_path, ['events', 'medal_standings', 'npc_codes'])
+
+    # Add data to the tables if they are empty. A table that already has data is not a dependency of the others.
+    plan = {}
+    for name, (table, step) in LOAD_PLAN.items():
         count_query = db.select(func.count()).select_from(table)
         if db.session.execute(count_query).scalar() == 0:
-            add_data_function(data)
+            plan[name] = step
+    plan = {name: step._replace(depends_on=[d for d in step.depends_on if d in plan]) for name, step in plan.items()}
+    try:
+        run_load_plan(report_plan(plan, report), sheets, db.session, executor)
+        with report.phase(None, 'commit'):
+            db.session.commit()
+    except SQLAlchemyError as e:
+        print(f'An error occurred adding data to the paralympics database. Error: {e}')
+        report.error(None, e)
+        db.session.rollback()
+
+    # Recreate the summary tables from the data, this uses the sqlite3 connection that SQLAlchemy wraps
+    with report.phase(None, 'summary'):
+        connection = db.engine.raw_connection()
+        try:
+            refresh_summary_tables(connection.cursor(), connection)
+        finally:
+            connection.close()
+    return report.finish()
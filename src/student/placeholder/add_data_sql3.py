@@ -4,215 +4,374 @@ Contains functions to add data to the paralympics database.
 Uses sqlite3
 """
 import sqlite3
+from contextlib import contextmanager
 from importlib import resources
 
-import pandas as pd
+from student.placeholder.load_report import LoadReport, report_plan
+from student.placeholder.prepare import MedalEventLookup, prepare_countries, prepare_disabilities, prepare_events, \
+    prepare_host_events, prepare_hosts, prepare_medal_results
+from student.placeholder.scheduler import LoadStep, run_load_plan
+from student.placeholder.snapshot import read_sheets
+from student.placeholder.summary_tables import refresh_summary_tables
 
 
-def add_country_data(df, cursor, connection):
-    """Add the country data to the paralympics database."""
+@contextmanager
+def load_pragmas(connection, cache_size=-64000):
+    """Applies settings that make a large load faster, and restores the previous settings afterwards.
+
+    The journal is switched to WAL, syncing to disk is turned off and the page cache is increased (a negative
+    cache_size is in KiB). Turning off sync means the database could be corrupted if the computer crashes during the
+    load, which is acceptable when building the database from the source data as the build can be run again.
+
+    Usage:
+        with load_pragmas(connection):
+            add_all_data(cursor, connection)
+
+    The changes made in the with block are committed at the end, or rolled back if there is an exception.
+    """
+    # The journal mode cannot be changed during a transaction
+    connection.commit()
+    journal_mode = connection.execute('PRAGMA journal_mode').fetchone()[0]
+    synchronous = connection.execute('PRAGMA synchronous').fetchone()[0]
+    previous_cache_size = connection.execute('PRAGMA cache_size').fetchone()[0]
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('PRAGMA synchronous = OFF')
+    connection.execute(f'PRAGMA cache_size = {int(cache_size)}')
+    try:
+        yield connection
+        connection.commit()
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        connection.execute(f'PRAGMA journal_mode = {journal_mode}')
+        connection.execute(f'PRAGMA synchronous = {int(synchronous)}')
+        connection.execute(f'PRAGMA cache_size = {int(previous_cache_size)}')
+
+
+def get_ids(cursor, sql):
+    """Returns a dict of key to id from a query that selects the key column(s) then the id.
+
+    Where the key matches more than one row, the first row is used, as fetchone() would.
+    """
+    ids = {}
+    for *key, row_id in cursor.execute(sql).fetchall():
+        ids.setdefault(key[0] if len(key) == 1 else tuple(key), row_id)
+    return ids
+
+
+def insert_countries(rows, cursor, report=None):
+    """Inserts the rows from prepare_countries() into the country table."""
+    report = report or LoadReport()
+    with report.phase('country', 'insert'):
+        cursor.executemany('INSERT INTO country VALUES (?,?,?,?,?,?)', rows)
+    report.count('country', read=len(rows), inserted=len(rows))
+
+
+def insert_events(rows, cursor, report=None):
+    """Inserts the rows from prepare_events() into the event and participants tables."""
+    report = report or LoadReport()
+    # The event_id is given rather than generated by the database so that the participants rows can be added
+    # with executemany, which does not return the id of each row it adds
+    with report.phase('event', 'key_resolution'):
+        first_id = cursor.execute('SELECT COALESCE(MAX(event_id), 0) + 1 FROM event').fetchone()[0]
+        rows = [(event_id, *row) for event_id, row in enumerate(rows, start=first_id)]
+    with report.phase('event', 'insert'):
+        cursor.executemany(
+            'INSERT INTO event (event_id, type, year, start, end, countries, events, sports, highlights, url) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [row[:10] for row in rows])
+    with report.phase('participants', 'insert'):
+        # insert the participants data
+        sql_ins_part = 'INSERT INTO participants (event_id, participants_m, participants_f, participants) VALUES (?, ?, ?, ?)'
+        cursor.executemany(sql_ins_part, [(row[0], *row[10:]) for row in rows])
+    report.count('event', read=len(rows), inserted=len(rows))
+    report.count('participants', read=len(rows), inserted=len(rows))
+
+
+def insert_hosts(rows, cursor, report=None):
+    """Inserts the (host, country) pairs from prepare_hosts() into the host table."""
+    report = report or LoadReport()
+    # Get the country code for each host from the country table
+    with report.phase('host', 'key_resolution'):
+        country_codes = get_ids(cursor, 'SELECT name, code FROM country ORDER BY rowid')
+        values = [(country_codes[country], host) for host, country in rows]
+    with report.phase('host', 'insert'):
+        cursor.executemany('INSERT INTO host (country_code, host) VALUES (?, ?)', values)
+    report.count('host', read=len(rows), inserted=len(values))
+
+
+def insert_host_events(rows, cursor, report=None):
+    """Inserts the rows from prepare_host_events() into the host_event table."""
+    report = report or LoadReport()
+    # Find the event id for each event, this matches based on the year and type of event, and the host_id for
+    # each host
+    with report.phase('host_event', 'key_resolution'):
+        event_ids = get_ids(cursor, 'SELECT year, type, event_id FROM event ORDER BY event_id')
+        host_ids = get_ids(cursor, 'SELECT host, host_id FROM host ORDER BY host_id')
+        values = [(host_ids[host], event_ids[(year, event_type)]) for year, event_type, host in rows]
+    with report.phase('host_event', 'insert'):
+        cursor.executemany('INSERT INTO host_event (host_id, event_id) VALUES (?, ?)', values)
+    report.count('host_event', read=len(rows), inserted=len(values))
+
+
+def insert_disabilities(rows, cursor, report=None):
+    """Inserts the rows from prepare_disabilities() into the disability and disability_event tables."""
+    report = report or LoadReport()
+    # Insert the unique categories, in the order they are first found
+    categories = dict.fromkeys(category for year, event_type, category in rows)
+    with report.phase('disability', 'insert'):
+        cursor.executemany('INSERT INTO disability (category) VALUES (?)', [(d,) for d in categories])
+    report.count('disability', read=len(categories), inserted=len(categories))
+
+    # Find the event_id for each event and the disability_id for each category
+    with report.phase('disability_event', 'key_resolution'):
+        event_ids = get_ids(cursor, 'SELECT year, type, event_id FROM event ORDER BY event_id')
+        disability_ids = get_ids(cursor, 'SELECT category, disability_id FROM disability ORDER BY disability_id')
+        values = [(event_ids[(year, event_type)], disability_ids[d]) for year, event_type, d in rows]
+    with report.phase('disability_event', 'insert'):
+        cursor.executemany('INSERT INTO disability_event (event_id, disability_id) VALUES (?, ?)', values)
+    report.count('disability_event', read=len(rows), inserted=len(values))
+
+
+def medal_event_lookup(cursor):
+    """Returns a MedalEventLookup for the events in the database."""
+    event_hosts = cursor.execute('SELECT event.year, host.host, event.event_id FROM event '
+                                 'JOIN host_event ON event.event_id = host_event.event_id '
+                                 'JOIN host ON host_event.host_id = host.host_id').fetchall()
+    return MedalEventLookup(event_hosts)
+
+
+def insert_medal_results(rows, cursor, lookup=None, report=None):
+    """Inserts the rows from prepare_medal_results() into the medal_result table.
+
+    The event id for each result is found from the year and location, as the medal standings do not have the type.
+    A result for an event that is not in the database is not added, it is counted as skipped in the report.
+    """
+    report = report or LoadReport()
+    with report.phase('medal_result', 'key_resolution'):
+        if lookup is None:
+            lookup = medal_event_lookup(cursor)
+        values = []
+        for year, location, *result in rows:
+            event_id = lookup.event_id(year, location)
+            if event_id is not None:
+                values.append((event_id, *result))
+    sql = 'INSERT INTO medal_result (event_id, country_code, rank, gold, silver, bronze, total) VALUES (?, ?, ?, ?, ?, ?, ?)'
+    with report.phase('medal_result', 'insert'):
+        cursor.executemany(sql, values)
+    report.count('medal_result', read=len(rows), inserted=len(values), skipped=len(rows) - len(values))
+
+
+def add_country_data(df, cursor, connection, commit=True, report=None):
+    """Add the country data to the paralympics database. Returns the LoadReport."""
+    report = report or LoadReport()
     # Insert all values into the country table
     try:
-        for index, row in df.iterrows():
-            # The row is pandas series, we want the series as a list of values
-            row_values = row.tolist()
-            cursor.execute('INSERT INTO country VALUES (?,?,?,?,?,?)', row_values)
+        with report.phase('country', 'transform'):
+            rows = prepare_countries(df)
+        insert_countries(rows, cursor, report)
 
-        connection.commit()
+        if commit:
+            with report.phase('country', 'commit'):
+                connection.commit()
 
     except sqlite3.Error as e:
         print(f'An error occurred adding country data to the paralympics database. Error: {e}')
+        report.error('country', e)
         if connection:
             connection.rollback()  # Rollback the changes on error
+    return report
 
 
-def add_event_data(df, cursor, connection):
-    """Add event and participant data to the paralympics database."""
+def add_event_data(df, cursor, connection, commit=True, report=None):
+    """Add event and participant data to the paralympics database. Returns the LoadReport."""
+    report = report or LoadReport()
     try:
-        # Convert the dates to strings
-        df['start'] = df['start'].dt.strftime('%d/%m/%Y')
-        df['end'] = df['end'].dt.strftime('%d/%m/%Y')
-
-        # Insert the values into the event table
-        for index, row in df.iterrows():
-            values = (
-                row['type'],
-                row['year'],
-                str(row['start']),
-                str(row['end']),
-                row['countries'],
-                row['events'],
-                row['sports'],
-                row['highlights'],
-                row['url'])
-            cursor.execute(
-                f'INSERT INTO event (type, year, start, end, countries, events, sports, highlights, url) VALUES (?, ? , ?, ?, ?, ?, ?, ?, ?)',
-                values)
-            # insert the participants data
-            event_id = cursor.lastrowid
-            participant_values = (
-                event_id,
-                row['participants_m'],
-                row['participants_f'],
-                row['participants'],
-            )
-            sql_ins_part = 'INSERT INTO participants (event_id, participants_m, participants_f, participants) VALUES (?, ?, ?, ?)'
-            cursor.execute(sql_ins_part, participant_values)
+        with report.phase('event', 'transform'):
+            rows = prepare_events(df)
+        insert_events(rows, cursor, report)
 
-        connection.commit()
+        if commit:
+            with report.phase('event', 'commit'):
+                connection.commit()
 
     except sqlite3.Error as e:
         print(f'An error occurred adding event data to the paralympics database. Error: {e}')
+        report.error('event', e)
         if connection:
             connection.rollback()
+    return report
 
 
-def add_host_data(df_events, cursor, connection):
-    """Add data to the normalised paralympics database."""
+def add_host_data(df_events, cursor, connection, commit=True, report=None):
+    """Add data to the normalised paralympics database. Returns the LoadReport."""
+    report = report or LoadReport()
 
     try:
-        # Extract unique host and country pairs
-        # Initialize an empty DataFrame with the columns needed
-        host_country_df = pd.DataFrame(columns=['host', 'country'])
-        # Iterate over each row in the events DataFrame and split each column into multiple values where there is ','
-        for index, row in df_events.iterrows():
-            hosts = row['host'].split(',')
-            countries = row['country'].split(',')
-            # Create pairs of each host with each country and append to the DataFrame
-            for host, country in zip(hosts, countries):
-                new_row = pd.DataFrame({'host': [host.strip()], 'country': [country.strip()]})
-                host_country_df = pd.concat([host_country_df, new_row], ignore_index=True)
-        # Remove duplicate hosts from the dataframe
-        host_country_df = host_country_df.drop_duplicates(subset=['host', 'country'])
-
-        # Iterate over the dataframe, add the host and country to the host table
-        for index, row in host_country_df.iterrows():
-            # Get the country code from the country table
-            country_name = row['country']
-            select_sql = f'SELECT code from country where name="{country_name}"'
-            result = cursor.execute(select_sql).fetchone()
-            country_code = result[0]
-            # Insert into the host table
-            host = row['host']
-            cursor.execute('INSERT INTO host (country_code, host) VALUES (?, ?)', (country_code, host))
+        with report.phase('host', 'transform'):
+            rows = prepare_hosts(df_events)
+        insert_hosts(rows, cursor, report)
 
         # Commit the changes
-        connection.commit()
+        if commit:
+            with report.phase('host', 'commit'):
+                connection.commit()
 
     except sqlite3.Error as e:
         print(f'An error occurred adding host data to the paralympics database. Error: {e}')
+        report.error('host', e)
         if connection:
             connection.rollback()  # Rollback the changes on error
+    return report
 
 
-def add_host_event_data(df, cursor, connection):
-    """Add HostEvent data to the paralympics database."""
+def add_host_event_data(df, cursor, connection, commit=True, report=None):
+    """Add HostEvent data to the paralympics database. Returns the LoadReport."""
+    report = report or LoadReport()
 
     try:
-        # Iterate each event, find the pairs of hosts, then get the event_id and host_id and insert into the host_event table
-        for index, row in df.iterrows():
-            hosts = row['host'].split(',')
-            # Find the event id for the event. This matches based on the year and type of event.
-            event_id = cursor.execute(
-                'SELECT event_id FROM event WHERE year = ? AND type = ?',
-                (row['year'], row['type'])
-            ).fetchone()[0]
-            # Find the host_id for each host
-            for host in hosts:
-                host_id = cursor.execute(f'SELECT host_id FROM host WHERE host = "{host.strip()}"').fetchall()[0][0]
-                # Insert the host_event pair
-                cursor.execute('INSERT INTO host_event (host_id, event_id) VALUES (?, ?)', (host_id, event_id))
+        with report.phase('host_event', 'transform'):
+            rows = prepare_host_events(df)
+        insert_host_events(rows, cursor, report)
 
-        connection.commit()
+        if commit:
+            with report.phase('host_event', 'commit'):
+                connection.commit()
 
     except sqlite3.Error as e:
         print(f'An error occurred adding host_event data to the paralympics database. Error: {e}')
+        report.error('host_event', e)
         if connection:
             connection.rollback()
+    return report
 
 
-def add_disabilities_data(df, cursor, connection):
-    """Add Disability and DisabilityEvent data."""
+def add_disabilities_data(df, cursor, connection, commit=True, report=None):
+    """Add Disability and DisabilityEvent data. Returns the LoadReport."""
+    report = report or LoadReport()
 
     try:
-        # Split the comma-separated values into lists
-        split_disabilities = df['disabilities'].str.split(', ')
-        # Flatten the list of lists into a single list
-        all_disabilities = [item for sublist in split_disabilities for item in sublist]
-        # Convert the list to a set to get unique values
-        unique_disabilities = set(all_disabilities)
-        # Insert the unique values into the table
-        for d in unique_disabilities:
-            cursor.execute('INSERT INTO disability (category) VALUES (?)', (d,))
-        connection.commit()
+        with report.phase('disability', 'transform'):
+            rows = prepare_disabilities(df)
+        insert_disabilities(rows, cursor, report)
 
-        # Iterate each result row in the event table
-        for index, row in df.iterrows():
-            # find the event_id
-            event_id = cursor.execute('SELECT event_id FROM event WHERE year = ? AND type = ?',
-                                      (row['year'], row['type'])).fetchone()[0]
-            # split the values for the disabilities
-            disabilities = row['disabilities'].split(', ')
-            # add each diability
-            for d in disabilities:
-                # find the disability_id.
-                disability_id = cursor.execute(
-                    'SELECT disability_id FROM disability WHERE category LIKE ?', (d,)
-                ).fetchone()[0]
-                # Insert into the DisabilityEvent table
-                cursor.execute('INSERT INTO disability_event (event_id, disability_id) VALUES (?, ?)',
-                               (event_id, disability_id))
-
-        connection.commit()
+        if commit:
+            with report.phase('disability', 'commit'):
+                connection.commit()
 
     except sqlite3.Error as e:
         print(f'An error occurred adding disability data to the paralympics database. Error: {e}')
+        report.error('disability', e)
         if connection:
             connection.rollback()
+    return report
 
 
-def add_medal_result_data(df, cursor, connection):
-    """Add MedalResult data to the paralympics database."""
+def add_medal_result_data(df, cursor, connection, commit=True, report=None):
+    """Add MedalResult data to the paralympics database. Returns the LoadReport."""
+    return add_medal_result_chunks([df], cursor, connection, commit, report)
 
-    try:
-        # Iterate each result row, get the event_id and code and insert into the MedalResult table
-        for index, row in df.iterrows():
-            # Find the event id for the event. This matches based on the year and type of event.
-            qry = f'SELECT event_id FROM Event WHERE year = {row['Year']}'
-            event_id = cursor.execute(qry).fetchone()[0]
-            # Insert the medal results
-            values = (event_id, row['NPC'], row['Rank'], row['Gold'], row['Silver'], row['Bronze'], row['Total'])
-            sql = 'INSERT INTO medal_result (event_id, country_code, rank, gold, silver, bronze, total) VALUES (?, ?, ?, ?, ?, ?, ?)'
-            cursor.execute(sql, values)
 
-        connection.commit()
+def add_medal_result_chunks(chunks, cursor, connection, commit=True, report=None):
+    """Add MedalResult data to the paralympics database from an iterable of dataframes. Returns the LoadReport.
+
+    Each chunk is added with one executemany, so only one chunk needs to be in memory at a time. Reading each chunk
+    is timed as the read phase of the report.
+
+    Usage, for a CSV file with the same columns as the medal_standings sheet:
+        add_medal_result_chunks(iter_chunks('medal_standings.csv', chunksize=10000), cursor, connection)
+    """
+    report = report or LoadReport()
+
+    try:
+        # The events are read once and the lookup is reused for each chunk
+        with report.phase('medal_result', 'key_resolution'):
+            lookup = medal_event_lookup(cursor)
+        chunks = iter(chunks)
+        while True:
+            with report.phase('medal_result', 'read'):
+                df = next(chunks, None)
+            if df is None:
+                break
+            with report.phase('medal_result', 'transform'):
+                rows = prepare_medal_results(df)
+            insert_medal_results(rows, cursor, lookup, report)
+
+        if commit:
+            with report.phase('medal_result', 'commit'):
+                connection.commit()
 
     except sqlite3.Error as e:
         print(f'An error occurred adding MedalResult data. Error: {e}')
+        report.error('medal_result', e)
         if connection:
             connection.rollback()
+    return report
+
+
+# The tables in the order they are added by add_tables(), with the sheet and functions used by the scheduler. Each
+# table depends on the tables its foreign keys refer to, and medal_result uses the hosts to find the event.
+LOAD_PLAN = {
+    'country': LoadStep('npc_codes', prepare_countries, insert_countries, []),
+    'host': LoadStep('events', prepare_hosts, insert_hosts, ['country']),
+    'event': LoadStep('events', prepare_events, insert_events, []),
+    'host_event': LoadStep('events', prepare_host_events, insert_host_events, ['host', 'event']),
+    'disability': LoadStep('events', prepare_disabilities, insert_disabilities, ['event']),
+    'medal_result': LoadStep('medal_standings', prepare_medal_results, insert_medal_results,
+                             ['country', 'event', 'host_event']),
+}
 
 
-def add_all_data(cur, conn):
-    """Adds all the data.
+def add_all_data(cur, conn, bulk=False, sheets=None, report=None, executor=None):
+    """Adds all the data. Returns a LoadReport with the rows and time for each table, see load_report.py.
 
     Parameters
     ----------
     conn: sqlite connection object
     cur: sqlite cursor object
+    bulk: if True, all the tables are added by the scheduler in one transaction with the settings from load_pragmas(),
+          see scheduler.py. Otherwise, each table is committed when it has been added.
+    sheets: dict with the events, medal_standings and npc_codes dataframes, the default is to read them from
+            paralympics.xlsx
+    report: LoadReport to add to, the default is a new report
+    executor: with bulk, optional concurrent.futures executor passed to run_load_plan() to prepare the tables in, the
+              default is to prepare them in this thread. The caller creates and shuts down the executor.
     """
-    # Specifies the path to the data file
-    data_path = resources.files("tutor.data").joinpath("paralympics.xlsx")
-
-    # Read data and create pandas dataframes
-    events_df = pd.read_excel(data_path, sheet_name='events')
-    medals_df = pd.read_excel(data_path, sheet_name='medal_standings')
-    npc_df = pd.read_excel(data_path, sheet_name='npc_codes')
-
-    # add data to the tables
-    add_country_data(npc_df, cur, conn)
-    add_host_data(events_df, cur, conn)
-    add_event_data(events_df, cur, conn)
-    add_host_event_data(events_df, cur, conn)
-    add_disabilities_data(events_df, cur, conn)
-    add_medal_result_data(medals_df, cur, conn)
+    report = report or LoadReport()
+    if sheets is None:
+        # Specifies the path to the data file
+        data_path = resources.files("tutor.data").joinpath("paralympics.xlsx")
+
+        # Read data and create pandas dataframes, from the snapshot of the sheets if the workbook has not changed
+        with report.phase(None, 'read'):
+            sheets = read_sheets(data_path, ['events', 'medal_standings', 'npc_codes'])
+
+    if bulk:
+        try:
+            with load_pragmas(conn):
+                run_load_plan(report_plan(LOAD_PLAN, report), sheets, cur, executor)
+                with report.phase(None, 'commit'):
+                    conn.commit()
+        except sqlite3.Error as e:
+            print(f'An error occurred adding data to the paralympics database. Error: {e}')
+            report.error(None, e)
+            if conn:
+                conn.rollback()
+    else:
+        add_tables(sheets['events'], sheets['medal_standings'], sheets['npc_codes'], cur, conn, report=report)
+
+    # Recreate the summary tables from the data that has just been added
+    with report.phase(None, 'summary'):
+        refresh_summary_tables(cur, conn)
+    return report.finish()
+
+
+def add_tables(events_df, medals_df, npc_df, cur, conn, commit=True, report=None):
+    """Adds the data from the dataframes to the tables, in the order needed for the foreign keys."""
+    add_country_data(npc_df, cur, conn, commit, report)
+    add_host_data(events_df, cur, conn, commit, report)
+    add_event_data(events_df, cur, conn, commit, report)
+    add_host_event_data(events_df, cur, conn, commit, report)
+    add_disabilities_data(events_df, cur, conn, commit, report)
+    add_medal_result_data(medals_df, cur, conn, commit, report)
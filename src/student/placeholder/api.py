@@ -0,0 +1,138 @@
+"""
+Move this file to the flask_paralympics package after activity 7.3, with models.py and data_version.py.
+
+A read only JSON API for the paralympics data:
+    /api/events                         events, with the participants and host names
+    /api/events/<event_id>              one event
+    /api/hosts                          all hosts, with the country name
+    /api/countries                      all countries
+    /api/medals?event_id=&country_code= medal results, optionally for one event and/or country
+
+/api/events and /api/medals return a page of rows, {"items": [...], "next_cursor": "..."}, ordered by event_id (and
+result_id for the medals). Pass next_cursor back as ?cursor= to get the next page, next_cursor is null on the last
+page. ?limit= sets the number of rows in a page, see pagination.py.
+
+Each response has an ETag and a Last-Modified time from DataVersion, and a request with If-None-Match (or
+If-Modified-Since) for a response whose tables have not changed gets a 304 Not Modified without querying the database
+or creating the JSON, see conditional.py.
+
+The JSON is also kept in the server side response cache (response_cache.py) until the tables change, so a request
+without the headers from another client does not query the database either.
+
+Register the blueprint in create_app() after db.init_app(app) and cache.init_app(app):
+    from student.flask_paralympics.data_version import DataVersion
+    from student.flask_paralympics.api import api
+    DataVersion(app, db)
+    app.register_blueprint(api)
+"""
+from flask import Blueprint, abort, jsonify, make_response, request
+
+from student.flask_paralympics.conditional import conditional
+from student.flask_paralympics.response_cache import cache
+from student.placeholder.pagination import keyset_page, page_size
+from tutor.flask_para_t import db
+from tutor.flask_para_t.models import Country, Event, Host, HostEvent, MedalResult, Participants
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+
+def event_dict(event, participants, hosts):
+    return {
+        'event_id': event.event_id,
+        'type': event.type,
+        'year': event.year,
+        'start': event.start,
+        'end': event.end,
+        'countries': event.countries,
+        'events': event.events,
+        'sports': event.sports,
+        'highlights': event.highlights,
+        'url': event.url,
+        'participants_m': participants.participants_m if participants else None,
+        'participants_f': participants.participants_f if participants else None,
+        'participants': participants.participants if participants else None,
+        'hosts': hosts,
+    }
+
+
+def event_hosts(event_ids):
+    """Returns a dict of event_id to the list of host names, for the events with the ids."""
+    query = (db.select(HostEvent.event_id, Host.host).join(HostEvent.host)
+             .where(HostEvent.event_id.in_(event_ids)).order_by(HostEvent.event_id, Host.host_id))
+    hosts = {}
+    for row_event_id, host in db.session.execute(query):
+        hosts.setdefault(row_event_id, []).append(host)
+    return hosts
+
+
+def page(query, key_columns):
+    """Returns the Page of the query for the cursor and limit in the request, or stops with a 400 response if the
+    cursor is not valid."""
+    try:
+        return keyset_page(db.session, query, key_columns, request.args.get('cursor'),
+                           page_size(request.args.get('limit', type=int)))
+    except ValueError as e:
+        abort(make_response(jsonify(error=str(e)), 400))
+
+
+@api.get('/events')
+@conditional('event', 'participants', 'host_event', 'host')
+@cache.cached(tags=['event', 'participants', 'host_event', 'host'])
+def events():
+    query = db.select(Event, Participants).outerjoin(Participants, Participants.event_id == Event.event_id)
+    result = page(query, [Event.event_id])
+    hosts = event_hosts([event.event_id for event, participants in result.items])
+    return jsonify(items=[event_dict(event, participants, hosts.get(event.event_id, []))
+                          for event, participants in result.items],
+                   next_cursor=result.next_cursor)
+
+
+@api.get('/events/<int:event_id>')
+@conditional('event', 'participants', 'host_event', 'host')
+@cache.cached(tags=['event', 'participants', 'host_event', 'host'])
+def event(event_id):
+    row = db.session.execute(db.select(Event, Participants)
+                             .outerjoin(Participants, Participants.event_id == Event.event_id)
+                             .where(Event.event_id == event_id)).first()
+    if row is None:
+        return jsonify(error=f'Event {event_id} not found'), 404
+    return jsonify(event_dict(*row, event_hosts([event_id]).get(event_id, [])))
+
+
+@api.get('/hosts')
+@conditional('host', 'country')
+@cache.cached(tags=['host', 'country'])
+def hosts():
+    rows = db.session.execute(db.select(Host.host_id, Host.host, Host.country_code, Country.name)
+                              .outerjoin(Host.country).order_by(Host.host_id)).all()
+    return jsonify([{'host_id': host_id, 'host': host, 'country_code': code, 'country': name}
+                    for host_id, host, code, name in rows])
+
+
+@api.get('/countries')
+@conditional('country')
+@cache.cached(tags=['country'])
+def countries():
+    rows = db.session.execute(db.select(Country).order_by(Country.code)).scalars()
+    return jsonify([{'code': country.code, 'name': country.name, 'region': country.region,
+                     'sub_region': country.sub_region, 'member_type': country.member_type, 'notes': country.notes}
+                    for country in rows])
+
+
+@api.get('/medals')
+@conditional('medal_result')
+@cache.cached(tags=['medal_result'])
+def medals():
+    query = db.select(MedalResult)
+    event_id = request.args.get('event_id', type=int)
+    if event_id is not None:
+        query = query.where(MedalResult.event_id == event_id)
+    country_code = request.args.get('country_code')
+    if country_code is not None:
+        query = query.where(MedalResult.country_code == country_code)
+    result = page(query, [MedalResult.event_id, MedalResult.result_id])
+    return jsonify(items=[{'result_id': medal.result_id, 'event_id': medal.event_id, 'country_code': medal.country_code,
+                           'rank': medal.rank, 'gold': medal.gold, 'silver': medal.silver, 'bronze': medal.bronze,
+                           'total': medal.total}
+                          for medal, in result.items],
+                   next_cursor=result.next_cursor)
@@ -0,0 +1,89 @@
+"""
+Move this file to the flask_paralympics package after activity 7.3, with models.py and figures_sqlalchemy.py.
+
+Contains the data for the charts, read from the database with SQLAlchemy and kept until the data changes.
+
+db.select(Event, Participants) reads every column of both tables, including the long highlights and url text, and
+creates the Event and Participants objects, just to plot the year, type and one feature. chart_frame() selects only
+the columns a chart can use into a DataFrame with compact types: year as int16, type as a category of the types in the
+data and the counts as nullable Int32 (some events have no count).
+
+The DataFrame is read once for each version of the event and participants tables, from DataVersion (data_version.py),
+and shared by every chart route. Without a DataVersion it is read on each call.
+
+Usage:
+    df = chart_frame(db, ['year', 'type', 'sports'])
+"""
+import threading
+
+import pandas as pd
+from flask import current_app
+from sqlalchemy import column, table
+
+# The tables the chart data is read from, a change to either of them reads it again
+CHART_TABLES = ['event', 'participants']
+
+# The columns the charts use. Only these are needed, so they are described here rather than imported from the models.
+event = table('event', column('event_id'), column('year'), column('type'), column('events'), column('sports'),
+              column('countries'))
+participants = table('participants', column('event_id'), column('participants'), column('participants_m'),
+                     column('participants_f'))
+
+# The categories of type are the values found, so a type other than summer or winter is kept rather than made NaN
+CHART_DTYPES = {
+    'year': 'int16',
+    'type': 'category',
+    'events': 'Int32',
+    'sports': 'Int32',
+    'countries': 'Int32',
+    'participants': 'Int32',
+    'participants_m': 'Int32',
+    'participants_f': 'Int32',
+}
+
+_lock = threading.Lock()
+
+
+def read_chart_frame(db):
+    """Returns a DataFrame of the chart columns for each event with participants, ordered by year and type."""
+    stmt = (db.select(event.c.year, event.c.type, event.c.events, event.c.sports, event.c.countries,
+                      participants.c.participants, participants.c.participants_m, participants.c.participants_f)
+            .join(participants, participants.c.event_id == event.c.event_id)
+            .order_by(event.c.year, event.c.type))
+    rows = db.session.execute(stmt).all()
+    # Each column is created with its type, which is faster than creating the DataFrame and then changing the types
+    values = list(zip(*rows)) or [()] * len(CHART_DTYPES)
+    return pd.DataFrame({name: pd.array(data, dtype=dtype)
+                         for (name, dtype), data in zip(CHART_DTYPES.items(), values)})
+
+
+def chart_frame(db, columns=None):
+    """Returns the chart data for the version of the data in the database.
+
+    The DataFrame is shared by the chart routes, so it is a shallow copy that can have columns added, be sorted or
+    filtered, but values must not be changed in place.
+
+    Parameters
+    db: the Flask-SQLAlchemy db object
+    columns: optional list of the columns to include, from CHART_DTYPES
+
+    Returns
+    df: pandas DataFrame
+    """
+    data_version = current_app.extensions.get('data_version')
+    if data_version is None:
+        df = read_chart_frame(db)
+    else:
+        version = data_version.get(CHART_TABLES)[0]
+        cached = current_app.extensions.get('chart_data')
+        if cached is None or cached[0] != version:
+            with _lock:
+                # Another request may have read the data while this one was waiting for the lock
+                cached = current_app.extensions.get('chart_data')
+                if cached is None or cached[0] != version:
+                    cached = (version, read_chart_frame(db))
+                    current_app.extensions['chart_data'] = cached
+        df = cached[1]
+    if columns is not None:
+        return df[list(columns)]
+    return df.copy(deep=False)
@@ -0,0 +1,32 @@
+"""
+Move this file to the flask_paralympics package after activity 7.3, with models.py, figures_sqlalchemy.py and
+chart_data.py, and chart.html to the templates folder.
+
+A page for each feature of the line chart, /chart/events, /chart/sports, /chart/countries and /chart/participants.
+
+The page only has the figure JSON and loads plotly.js from the versioned URL in assets.py, which the browser keeps, so
+plotly.js is not sent with every chart. Each page is kept in the response cache (response_cache.py) until the event or
+participants table changes.
+
+Register the blueprint in create_app() after db.init_app(app) and cache.init_app(app):
+    from student.flask_paralympics.charts import charts
+    app.register_blueprint(charts)
+"""
+from flask import Blueprint, abort, render_template
+
+from student.flask_paralympics.response_cache import cache
+from student.placeholder.figures_sqlalchemy import line_chart
+from tutor.flask_para_t import db
+
+charts = Blueprint('charts', __name__)
+
+FEATURES = ["events", "sports", "countries", "participants"]
+
+
+@charts.get('/chart/<feature>')
+@cache.cached(tags=['event', 'participants'])
+def chart(feature):
+    if feature not in FEATURES:
+        abort(404)
+    fig_html = line_chart(feature, db, include_plotlyjs=False)
+    return render_template('chart.html', fig_html=fig_html)
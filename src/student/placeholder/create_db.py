@@ -4,16 +4,25 @@ Contains functions to create the paralympics database without data.
 """
 import sqlite3
 
-from student.placeholder import add_data
+from student.placeholder import add_data_sql3 as add_data
+from student.placeholder.summary_tables import SUMMARY_TABLES
 
 
-def create_db(cursor, connection):
+def create_db(cursor, connection, bulk=True, sheets=None, with_data=True, report=None, executor=None):
     """Create the paralympics database structure and add the data.
 
+    Returns the LoadReport from add_data.add_all_data(), or None if no data was added.
+
     Parameters
     ----------
     connection: sqlite connection object
     cursor: sqlite cursor object
+    bulk: passed to add_data.add_all_data(), if True the data is added in one transaction
+    sheets: passed to add_data.add_all_data(), dict of sheet name to dataframe to add instead of paralympics.xlsx
+    with_data: if False, the tables are created but no data is added
+    report: passed to add_data.add_all_data(), the LoadReport to add the row counts and timings to
+    executor: passed to add_data.add_all_data(), with bulk an executor to prepare the tables in e.g. on a multi-core
+              server where a benchmark shows a gain
     """
 
     # Define the tables and relationships using SQL statements
@@ -125,6 +134,21 @@ def create_db(cursor, connection):
                             FOREIGN KEY (quiz_id) REFERENCES quiz(quiz_id) ON DELETE CASCADE ON UPDATE CASCADE
                         )'''
 
+    # Secondary indexes for the columns used to find rows when the data is added and by the queries in the apps
+    # e.g. finding the event_id for a year and type, or joining host_event to event. Primary keys are already indexed.
+    index_sql = [
+        'CREATE INDEX IF NOT EXISTS idx_event_year_type ON event (year, type)',
+        'CREATE INDEX IF NOT EXISTS idx_host_host ON host (host)',
+        'CREATE INDEX IF NOT EXISTS idx_host_country_code ON host (country_code)',
+        'CREATE INDEX IF NOT EXISTS idx_country_name ON country (name)',
+        'CREATE INDEX IF NOT EXISTS idx_host_event_event_id ON host_event (event_id)',
+        'CREATE INDEX IF NOT EXISTS idx_participants_event_id ON participants (event_id)',
+        'CREATE INDEX IF NOT EXISTS idx_disability_category ON disability (category)',
+        'CREATE INDEX IF NOT EXISTS idx_medal_result_event_country ON medal_result (event_id, country_code)',
+        # The order of the pages of medal results, see pagination.py
+        'CREATE INDEX IF NOT EXISTS idx_medal_result_event_result ON medal_result (event_id, result_id)',
+    ]
+
     try:
         # Drop each table if they already exist
         cursor.execute('DROP TABLE IF EXISTS host_event;')
@@ -140,6 +164,11 @@ def create_db(cursor, connection):
         cursor.execute('DROP TABLE IF EXISTS student_response;')
         cursor.execute('DROP TABLE IF EXISTS question;')
         cursor.execute('DROP TABLE IF EXISTS quiz;')
+        # The summary tables are created again from the data by add_data.add_all_data()
+        for table in SUMMARY_TABLES:
+            cursor.execute(f'DROP TABLE IF EXISTS {table};')
+        # The saved sheet hashes are for the old data, so the next ingest.ingest_all_data() compares every sheet
+        cursor.execute('DROP TABLE IF EXISTS ingest_state;')
 
         # Create the tables
         cursor.execute(country_sql)
@@ -156,11 +185,17 @@ def create_db(cursor, connection):
         cursor.execute(student_response_sql)
         cursor.execute(medal_result_sql)
 
+        # Create the indexes, these are dropped with their tables
+        for sql in index_sql:
+            cursor.execute(sql)
+
         # Commit the changes
         connection.commit()
 
         # Call the function to add the data
-        add_data.add_all_data(cursor, connection)
+        if with_data:
+            return add_data.add_all_data(cursor, connection, bulk=bulk, sheets=sheets, report=report,
+                                         executor=executor)
 
     except sqlite3.Error as e:
         print(f'An error occurred creating the database. Error: {e}')
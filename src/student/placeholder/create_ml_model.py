@@ -6,13 +6,14 @@ This is a simple example of how to create a model using the medal standings data
 from pathlib import Path
 
 import joblib
-import pandas as pd
 from sklearn.compose import ColumnTransformer
 from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder
 
+from student.placeholder.snapshot import read_sheets
+
 
 def train_and_save_model():
     """
@@ -21,7 +22,7 @@ def train_and_save_model():
     # Read the data into a DataFrame
     para_excel = Path(__file__).parent.parent.joinpath("data", "paralympics.xlsx")
     cols = ["Year", "Rank", "Team", "Gold", "Silver", "Bronze", "Total"]
-    data = pd.read_excel(para_excel, sheet_name="medal_standings", usecols=cols)
+    data = read_sheets(para_excel, ["medal_standings"])["medal_standings"][cols]
 
     # Drop rows with NaNs since the accuracy of the model is not the focus here
     data.dropna(inplace=True)
@@ -0,0 +1,116 @@
+"""
+Contains DataVersion, a counter of the changes to the data in the paralympics database, used by api.py to answer
+conditional requests without querying the database.
+
+Each commit of the SQLAlchemy session that adds, changes or deletes rows increases the version, and records the new
+version and the time for each table that was changed. The version for a set of tables is the highest version of any
+of them, so a response that only uses the event table keeps its version when a medal result is added.
+
+Changes made outside the app's session, e.g. by `flask init-db` or ingest.py in another process, are found by
+checking the modified time of the SQLite database file and its WAL file. If they have changed without a commit by the
+app, every table is given a new version.
+
+Usage, once the db object and models have been created (activity 7.3):
+    data_version = DataVersion()
+    data_version.init_app(app, db)
+    version, last_modified = data_version.get(['event', 'host'])
+"""
+import os
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+
+class DataVersion:
+    """Version numbers and last modified times for the tables in the database, see the module docstring."""
+
+    def __init__(self, app=None, db=None):
+        self._lock = threading.Lock()
+        self.version = 0
+        # The version and time of the last change to every table. The data could have changed before the app
+        # started, so the start time is the first last modified time.
+        self.all_tables = (0, datetime.now(timezone.utc))
+        # Table name to the version and time of the last change to only some tables
+        self.tables = {}
+        self._database_path = None
+        self._file_signature = None
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        """Listens for the commits of the db session and saves the DataVersion in app.extensions['data_version']."""
+        app.extensions['data_version'] = self
+        with app.app_context():
+            url = db.engine.url
+        if url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:'):
+            self._database_path = url.database
+            self._file_signature = self._signature()
+
+        event.listen(db.session, 'do_orm_execute', self._on_execute)
+        event.listen(db.session, 'after_flush', self._on_flush)
+        event.listen(db.session, 'after_commit', self._on_commit)
+        event.listen(db.session, 'after_rollback', self._on_rollback)
+
+    def bump(self, tables=None):
+        """Gives the tables a new version, or every table if tables is None. Returns the new version."""
+        with self._lock:
+            self.version += 1
+            change = (self.version, datetime.now(timezone.utc))
+            if tables is None:
+                self.all_tables = change
+            else:
+                for table in tables:
+                    self.tables[table] = change
+            return self.version
+
+    def get(self, tables=None):
+        """Returns (version, last_modified) for the tables, or for all the data if tables is None."""
+        self._check_file()
+        with self._lock:
+            if tables is None:
+                return self.version, max([self.all_tables, *self.tables.values()])[1]
+            return max([self.all_tables, *(self.tables[table] for table in tables if table in self.tables)])
+
+    def _signature(self):
+        signature = []
+        for path in [self._database_path, f'{self._database_path}-wal']:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return signature
+
+    def _check_file(self):
+        if self._database_path is None:
+            return
+        signature = self._signature()
+        if signature != self._file_signature:
+            self._file_signature = signature
+            self.bump()
+
+    @staticmethod
+    def _changed_tables(session):
+        return session.info.setdefault('data_version_tables', set())
+
+    def _on_execute(self, orm_execute_state):
+        # Bulk insert(), update() and delete() statements do not go through the flush
+        statement = orm_execute_state.statement
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            self._changed_tables(orm_execute_state.session).add(statement.table.name)
+
+    def _on_flush(self, session, flush_context):
+        tables = self._changed_tables(session)
+        for instance in [*session.new, *session.dirty, *session.deleted]:
+            tables.add(instance.__table__.name)
+
+    def _on_commit(self, session):
+        tables = session.info.pop('data_version_tables', None)
+        if tables:
+            self.bump(tables)
+            if self._database_path is not None:
+                self._file_signature = self._signature()
+
+    def _on_rollback(self, session):
+        session.info.pop('data_version_tables', None)
@@ -1,30 +1,43 @@
 """Copied from https://flask.palletsprojects.com/en/stable/tutorial/database/#define-and-access-the-database
 To create the database you need to run the following command in a Terminal:
 flask --app tutor.flask_para_sqlite init-db
+
+To create the database from paralympics.xlsx with the loaders in add_data_sql3.py, and save a JSON report of the rows
+and time for each table (- prints the report):
+flask --app tutor.flask_para_sqlite init-db --report load_report.json
+
+The SQL queries are profiled if the app config has QUERY_PROFILER = True, see query_profiler.py. The other settings are
+QUERY_PROFILER_SLOW_MS (default 100) and QUERY_PROFILER_SAMPLE_RATE (default 1, every query). To see the stats:
+flask --app tutor.flask_para_sqlite query-stats
 """
+import atexit
 import importlib.resources
+import json
 import sqlite3
 from datetime import datetime
+from pathlib import Path
 
 import click
 from flask import current_app, g
 
+from student.placeholder.query_profiler import QueryProfiler, STATS_FILE_PREFIX, aggregate, format_stats, read_stats
+
 
 # Copied from https://flask.palletsprojects.com/en/stable/tutorial/database/
 def get_db():
     if 'db' not in g:
+        # Profile the queries if the profiler is enabled, otherwise use a plain connection
+        profiler = current_app.extensions.get('query_profiler')
         g.db = sqlite3.connect(
             current_app.config['DATABASE'],
-            detect_types=sqlite3.PARSE_DECLTYPES
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            factory=profiler.connection_factory if profiler else sqlite3.Connection
         )
         g.db.row_factory = sqlite3.Row
 
         # Enable foreign key support
         g.db.execute('PRAGMA foreign_keys = ON;')
 
-        # Print SQL to the terminal for debugging purposes
-        g.db.set_trace_callback(trace_callback)
-
     return g.db
 
 
@@ -35,6 +48,11 @@ def close_db(e=None):
     if db is not None:
         db.close()
 
+        # Save the query stats for the query-stats command now and then
+        profiler = current_app.extensions.get('query_profiler')
+        if profiler:
+            profiler.flush_if_due()
+
 
 # Modified copy from https://flask.palletsprojects.com/en/stable/tutorial/database/#create-the-tables
 # The SQL file has the data as well as the schema
@@ -46,11 +64,29 @@ def init_db():
             db.executescript(f.read().decode('utf8'))
 
 
+def init_db_from_workbook():
+    """Creates the tables and adds the data from paralympics.xlsx. Returns the LoadReport, see load_report.py."""
+    # Imported here as the loaders need pandas, which the app does not otherwise need
+    from student.placeholder.create_db import create_db
+    db = get_db()
+    return create_db(db.cursor(), db)
+
+
 @click.command('init-db')
-def init_db_command():
+@click.option('--report', 'report_path', type=click.Path(dir_okay=False, allow_dash=True),
+              help='Add the data from paralympics.xlsx and write the load report as JSON to this file, - for stdout.')
+def init_db_command(report_path):
     """Create new tables and add the data."""
-    init_db()
-    click.echo('Initialized the database.')
+    if report_path is None:
+        init_db()
+    else:
+        report = init_db_from_workbook()
+        if report is None:
+            raise click.ClickException('The database could not be created.')
+        with click.open_file(report_path, 'w') as f:
+            f.write(report.to_json() + '\n')
+    # Keep stdout for the report if it is written there
+    click.echo('Initialized the database.', err=report_path == '-')
 
 
 sqlite3.register_converter(
@@ -58,12 +94,48 @@ sqlite3.register_converter(
 )
 
 
+@click.command('query-stats')
+@click.option('--limit', default=20, show_default=True, help='Number of statements to show, the slowest total first.')
+@click.option('--slow', is_flag=True, help='Show the slow query log instead of the stats.')
+@click.option('--as-json', is_flag=True, help='Print the stats as JSON.')
+@click.option('--reset', is_flag=True, help='Delete the saved stats.')
+def query_stats_command(limit, slow, as_json, reset):
+    """Show the SQL query stats saved by the app's processes."""
+    directory = Path(current_app.instance_path)
+    if reset:
+        for path in directory.glob(f'{STATS_FILE_PREFIX}*.json'):
+            path.unlink(missing_ok=True)
+        click.echo('Deleted the query stats.')
+        return
+    stats = read_stats(directory)
+    if not stats:
+        click.echo('There are no query stats, set QUERY_PROFILER = True in the app config to save them.')
+        return
+    if slow:
+        queries = sorted((query for data in stats for query in data['slow']), key=lambda query: query['at'])
+        results = queries[-limit:]
+        if not as_json:
+            for query in results:
+                click.echo(f"{query['at']} {query['ms']:10.1f} ms {query['rows']:8} rows  {query['sql']}")
+            return
+    else:
+        results = aggregate(stats)[:limit]
+        if not as_json:
+            click.echo(format_stats(results, limit))
+            return
+    click.echo(json.dumps(results, indent=2))
+
+
 # Copied from https://flask.palletsprojects.com/en/stable/tutorial/database/#register-with-the-application
 def init_app(app):
     app.teardown_appcontext(close_db)
     app.cli.add_command(init_db_command)
-
-
-def trace_callback(query):
-    """Trace function to log queries."""
-    print("Executing query:", query)
+    app.cli.add_command(query_stats_command)
+
+    if app.config.get('QUERY_PROFILER'):
+        profiler = QueryProfiler(slow_ms=app.config.get('QUERY_PROFILER_SLOW_MS', 100),
+                                 sample_rate=app.config.get('QUERY_PROFILER_SAMPLE_RATE', 1.0),
+                                 stats_dir=app.instance_path)
+        app.extensions['query_profiler'] = profiler
+        # Save the stats that have not been saved when the process exits
+        atexit.register(profiler.flush)
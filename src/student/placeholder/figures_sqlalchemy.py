@@ -1,14 +1,15 @@
 import plotly.express as px
-import pandas as pd
 
-from student.flask_paralympics.models import Event, Participants
+from student.placeholder.chart_data import chart_frame
 
 
-def line_chart(feature, db):
+def line_chart(feature, db, include_plotlyjs=True):
     """ Creates a line chart with data from paralympics_events.csv
 
      Parameters
      feature: events, sports, countries or participants
+     include_plotlyjs: True to put plotly.js in the html, False for only the figure JSON when the page loads plotly.js
+                       from the versioned URL in student/flask_paralympics/assets.py
 
      Returns
      fig_html: Plotly Express line figure html/Javascript
@@ -22,9 +23,8 @@ def line_chart(feature, db):
         # Make sure it is lowercase to match the dataframe column names
         feature = feature.lower()
 
-    # Get the data from the database using pandas.read_sql_query and FlaskSQLAlchemy.
-    stmt = db.select(Event, Participants).join(Participants)
-    line_chart_df = pd.read_sql_query(stmt, db.get_engine())
+    # Get only the year, type and feature columns, read from the database once for each version of the data
+    line_chart_df = chart_frame(db, ["year", "type", feature])
 
     # Set the title for the chart using the value of 'feature'
     title_text = f"How has the number of {feature} changed over time?"
@@ -48,6 +48,6 @@ def line_chart(feature, db):
                   template="simple_white"
                   )
 
-    # Convert to HTML
-    fig_html = {"fig": fig.to_html(full_html=False, include_plotlyjs=True, div_id="line-chart")}
+    # Convert to HTML, without plotly.js the html is the figure JSON and a call to Plotly.newPlot()
+    fig_html = {"fig": fig.to_html(full_html=False, include_plotlyjs=include_plotlyjs, div_id="line-chart")}
     return fig_html
\ No newline at end of file
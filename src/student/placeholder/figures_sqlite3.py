@@ -2,12 +2,14 @@ import plotly.express as px
 import pandas as pd
 
 
-def line_chart(feature, db):
+def line_chart(feature, db, include_plotlyjs=True):
     """ Creates a line chart with data from paralympics.xlsx
 
      Parameters
      feature: events, sports, countries or participants
      db: SQLAlchemy database connection object (from get_db())
+     include_plotlyjs: True to put plotly.js in the html, False for only the figure JSON when the page loads plotly.js
+                       from the versioned URL in student/flask_paralympics/assets.py
 
      Returns
      fig_html: Plotly Express line figure html
@@ -22,7 +24,11 @@ def line_chart(feature, db):
         feature = feature.lower()
 
     # Get the data from the database using pandas.read_sql_query and the sqlite3 database connection
-    query = 'SELECT * FROM event JOIN participants on event.event_id = participants.event_id;'
+    # Uses the summary table created by add_all_data() if there is one, rather than joining the tables
+    if db.execute("SELECT 1 FROM sqlite_master WHERE name = 'summary_event_series'").fetchone():
+        query = 'SELECT * FROM summary_event_series;'
+    else:
+        query = 'SELECT * FROM event JOIN participants on event.event_id = participants.event_id;'
     df = pd.read_sql_query(query, db)
 
     # Set the title for the chart using the value of 'feature'
@@ -47,6 +53,6 @@ def line_chart(feature, db):
                   template="simple_white"
                   )
 
-    # Convert to HTML
-    fig_html = {"fig": fig.to_html(full_html=False, include_plotlyjs=True, div_id="line-chart")}
+    # Convert to HTML, without plotly.js the html is the figure JSON and a call to Plotly.newPlot()
+    fig_html = {"fig": fig.to_html(full_html=False, include_plotlyjs=include_plotlyjs, div_id="line-chart")}
     return fig_html
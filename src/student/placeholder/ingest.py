@@ -0,0 +1,265 @@
+"""
+Contains functions to add new and changed data from the spreadsheet to an existing paralympics database.
+Uses sqlite3
+
+create_db() drops all the tables and adds all the data again. ingest_all_data() instead compares each sheet with the
+rows in the database, matching the rows on their natural key, and only adds the rows that are new and updates the
+rows that have changed. The natural keys are:
+- country: code
+- event: year and type
+- participants: the event
+- host: host name
+- disability: category
+- medal_result: the event and the NPC code
+
+Rows that are no longer in the spreadsheet are not deleted, except the host_event and disability_event rows of an
+event whose hosts or disabilities have changed.
+
+The hash of the workbook file and of each sheet is saved in the ingest_state table. If the workbook file has not
+changed since the last ingest nothing is read. Otherwise a sheet with the same hash as the last ingest is skipped
+without reading the database, unless a sheet it depends on has changed.
+
+Usage, for a database created with create_db():
+    connection = sqlite3.connect(db_path)
+    counts = ingest_all_data(connection.cursor(), connection)
+"""
+import hashlib
+import sqlite3
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from importlib import resources
+
+import pandas as pd
+
+from student.placeholder.add_data_sql3 import get_ids
+from student.placeholder.prepare import host_country_pairs, medal_event_ids, to_rows
+from student.placeholder.snapshot import file_hash, read_sheets
+from student.placeholder.summary_tables import refresh_summary_tables
+
+ingest_state_sql = '''CREATE TABLE IF NOT EXISTS ingest_state (
+                      sheet TEXT PRIMARY KEY,
+                      content_hash TEXT NOT NULL,
+                      ingested TEXT NOT NULL)'''
+
+# The sheets in the order they are ingested, and the sheets that each one depends on. A sheet is ingested again if a
+# sheet it depends on has changed e.g. the host country codes are found from the country names in npc_codes.
+SHEETS = {
+    'npc_codes': [],
+    'events': ['npc_codes'],
+    'medal_standings': ['events'],
+}
+# The name used in ingest_state for the hash of the whole workbook file
+WORKBOOK = 'workbook'
+
+
+def workbook_path(data_path=None):
+    """Returns the path to the Excel workbook, the default is paralympics.xlsx in tutor.data"""
+    if data_path is None:
+        data_path = resources.files("tutor.data").joinpath("paralympics.xlsx")
+    return data_path
+
+
+def content_hash(df):
+    """Returns a SHA-256 hex digest of the column names and values of a dataframe."""
+    digest = hashlib.sha256()
+    digest.update('\x1f'.join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def get_ingest_state(cursor):
+    """Returns a dict of sheet name to the content hash saved by the last ingest."""
+    cursor.execute(ingest_state_sql)
+    return dict(cursor.execute('SELECT sheet, content_hash FROM ingest_state').fetchall())
+
+
+def ingest_countries(df, cursor, counts):
+    """Adds the new countries and updates the changed countries, matched on the code."""
+    columns = ['code', 'name', 'region', 'sub_region', 'member_type', 'notes']
+    existing = {row[0]: row[1:] for row in cursor.execute(f'SELECT {", ".join(columns)} FROM country')}
+    rows = [row for row in to_rows(df, columns) if existing.get(row[0]) != row[1:]]
+    cursor.executemany('''INSERT INTO country (code, name, region, sub_region, member_type, notes)
+                          VALUES (?, ?, ?, ?, ?, ?)
+                          ON CONFLICT (code) DO UPDATE SET name = excluded.name, region = excluded.region,
+                          sub_region = excluded.sub_region, member_type = excluded.member_type,
+                          notes = excluded.notes''', rows)
+    counts['country']['inserted'] += sum(row[0] not in existing for row in rows)
+    counts['country']['updated'] += sum(row[0] in existing for row in rows)
+
+
+def ingest_events(df, cursor, counts):
+    """Adds and updates the event, participants, host, host_event, disability and disability_event rows."""
+    df = df.copy()
+    df['start'] = df['start'].dt.strftime('%d/%m/%Y').astype(str)
+    df['end'] = df['end'].dt.strftime('%d/%m/%Y').astype(str)
+
+    # Events, matched on the year and type. New events are given the next event_id.
+    columns = ['start', 'end', 'countries', 'events', 'sports', 'highlights', 'url']
+    existing = {(year, event_type): (event_id, tuple(values)) for event_id, year, event_type, *values in
+                cursor.execute(f'SELECT event_id, year, type, {", ".join(columns)} FROM event ORDER BY event_id')}
+    next_id = cursor.execute('SELECT COALESCE(MAX(event_id), 0) + 1 FROM event').fetchone()[0]
+    event_ids = []
+    for year, event_type, *values in to_rows(df, ['year', 'type'] + columns):
+        event_id, current = existing.get((year, event_type), (None, None))
+        if event_id is None:
+            event_id = next_id
+            next_id += 1
+            cursor.execute(f'INSERT INTO event (event_id, year, type, {", ".join(columns)}) '
+                           f'VALUES (?, ?, ?, {", ".join("?" * len(columns))})', (event_id, year, event_type, *values))
+            counts['event']['inserted'] += 1
+        elif current != tuple(values):
+            cursor.execute(f'UPDATE event SET {", ".join(f"{c} = ?" for c in columns)} WHERE event_id = ?',
+                           (*values, event_id))
+            counts['event']['updated'] += 1
+        event_ids.append(event_id)
+    df['event_id'] = event_ids
+
+    # Participants, one row per event
+    columns = ['participants_m', 'participants_f', 'participants']
+    existing = {row[0]: row[1:] for row in cursor.execute(f'SELECT event_id, {", ".join(columns)} FROM participants')}
+    for event_id, *values in to_rows(df, ['event_id'] + columns):
+        if event_id not in existing:
+            cursor.execute('INSERT INTO participants (event_id, participants_m, participants_f, participants) '
+                           'VALUES (?, ?, ?, ?)', (event_id, *values))
+            counts['participants']['inserted'] += 1
+        elif existing[event_id] != tuple(values):
+            cursor.execute('UPDATE participants SET participants_m = ?, participants_f = ?, participants = ? '
+                           'WHERE event_id = ?', (*values, event_id))
+            counts['participants']['updated'] += 1
+
+    # Hosts, matched on the host name
+    country_codes = get_ids(cursor, 'SELECT name, code FROM country ORDER BY rowid')
+    # In descending order so the first host with the name is kept, as get_ids() does
+    existing = {host: (host_id, code) for host_id, host, code in
+                cursor.execute('SELECT host_id, host, country_code FROM host ORDER BY host_id DESC')}
+    for host, country in to_rows(host_country_pairs(df), ['host', 'country']):
+        host_id, code = existing.get(host, (None, None))
+        if host_id is None:
+            cursor.execute('INSERT INTO host (country_code, host) VALUES (?, ?)', (country_codes[country], host))
+            counts['host']['inserted'] += 1
+        elif code != country_codes[country]:
+            cursor.execute('UPDATE host SET country_code = ? WHERE host_id = ?', (country_codes[country], host_id))
+            counts['host']['updated'] += 1
+
+    # Disabilities, matched on the category
+    existing = get_ids(cursor, 'SELECT category, disability_id FROM disability ORDER BY disability_id')
+    categories = sorted({d for disabilities in df['disabilities'] for d in disabilities.split(', ')} - set(existing))
+    cursor.executemany('INSERT INTO disability (category) VALUES (?)', [(d,) for d in categories])
+    counts['disability']['inserted'] += len(categories)
+
+    # The hosts and disabilities of each event
+    host_ids = get_ids(cursor, 'SELECT host, host_id FROM host ORDER BY host_id')
+    disability_ids = get_ids(cursor, 'SELECT category, disability_id FROM disability ORDER BY disability_id')
+    host_events = {(host_ids[host.strip()], event_id)
+                   for event_id, hosts in zip(df['event_id'], df['host']) for host in hosts.split(',')}
+    disability_events = {(event_id, disability_ids[d])
+                         for event_id, disabilities in zip(df['event_id'], df['disabilities'])
+                         for d in disabilities.split(', ')}
+    sync_links(cursor, 'host_event', 'host_id', host_events, set(df['event_id']), counts)
+    sync_links(cursor, 'disability_event', 'disability_id', {(d, e) for e, d in disability_events},
+               set(df['event_id']), counts)
+
+
+def sync_links(cursor, table, column, links, event_ids, counts):
+    """Makes the (column, event_id) rows of a link table for the given events the same as links.
+
+    Parameters
+    ----------
+    cursor: sqlite cursor object
+    table: the link table, host_event or disability_event
+    column: the other key column in the table, host_id or disability_id
+    links: set of (column value, event_id) that should be in the table
+    event_ids: the events in the sheet, rows for other events are not changed
+    counts: the counts of the rows changed in each table
+    """
+    # host_event.host_id is a TEXT column in create_db(), so the ids are cast to compare them with the integer ids
+    existing = {(value, event_id) for value, event_id in
+                cursor.execute(f'SELECT CAST({column} AS INTEGER), event_id FROM {table}') if event_id in event_ids}
+    cursor.executemany(f'INSERT INTO {table} ({column}, event_id) VALUES (?, ?)', sorted(links - existing))
+    cursor.executemany(f'DELETE FROM {table} WHERE {column} = ? AND event_id = ?', sorted(existing - links))
+    counts[table]['inserted'] += len(links - existing)
+    counts[table]['deleted'] += len(existing - links)
+
+
+def ingest_medal_results(df, cursor, counts):
+    """Adds the new medal results and updates the changed results, matched on the event and NPC code."""
+    event_hosts = cursor.execute('SELECT event.year, host.host, event.event_id FROM event '
+                                 'JOIN host_event ON event.event_id = host_event.event_id '
+                                 'JOIN host ON host_event.host_id = host.host_id').fetchall()
+    df = df.assign(event_id=pd.Series(medal_event_ids(df, event_hosts), index=df.index, dtype='Int64'))
+    df = df[df['event_id'].notna()]
+
+    columns = ['rank', 'gold', 'silver', 'bronze', 'total']
+    existing = {(event_id, code): (result_id, tuple(values)) for result_id, event_id, code, *values in
+                cursor.execute(f'SELECT result_id, event_id, country_code, {", ".join(columns)} FROM medal_result')}
+    inserts = []
+    updates = []
+    for event_id, code, *values in to_rows(df, ['event_id', 'NPC', 'Rank', 'Gold', 'Silver', 'Bronze', 'Total']):
+        result_id, current = existing.get((event_id, code), (None, None))
+        if result_id is None:
+            inserts.append((event_id, code, *values))
+        elif current != tuple(values):
+            updates.append((*values, result_id))
+    cursor.executemany('INSERT INTO medal_result (event_id, country_code, rank, gold, silver, bronze, total) '
+                       'VALUES (?, ?, ?, ?, ?, ?, ?)', inserts)
+    cursor.executemany('UPDATE medal_result SET rank = ?, gold = ?, silver = ?, bronze = ?, total = ? '
+                       'WHERE result_id = ?', updates)
+    counts['medal_result']['inserted'] += len(inserts)
+    counts['medal_result']['updated'] += len(updates)
+
+
+def ingest_all_data(cursor, connection, data_path=None, force=False):
+    """Adds the new and changed data from the spreadsheet to the database, then refreshes the summary tables.
+
+    Parameters
+    ----------
+    connection: sqlite connection object
+    cursor: sqlite cursor object
+    data_path: path to the Excel workbook, the default is paralympics.xlsx in tutor.data
+    force: if True, every sheet is compared with the database even if its hash has not changed
+
+    Returns
+    -------
+    dict of table name to a Counter of the rows 'inserted', 'updated' and 'deleted', empty if no sheet had changed.
+    None if there was an error, in which case no changes are saved.
+    """
+    try:
+        data_path = workbook_path(data_path)
+        state = get_ingest_state(cursor)
+        # If the workbook file is the same as last time, none of the sheets have changed so they are not read
+        hashes = {WORKBOOK: file_hash(data_path)}
+        if not force and hashes[WORKBOOK] == state.get(WORKBOOK):
+            return {}
+        sheets = read_sheets(data_path, list(SHEETS))
+        hashes.update({name: content_hash(df) for name, df in sheets.items()})
+
+        changed = []
+        for name, depends_on in SHEETS.items():
+            if force or hashes[name] != state.get(name) or any(d in changed for d in depends_on):
+                changed.append(name)
+
+        counts = defaultdict(Counter)
+        if 'npc_codes' in changed:
+            ingest_countries(sheets['npc_codes'], cursor, counts)
+        if 'events' in changed:
+            ingest_events(sheets['events'], cursor, counts)
+        if 'medal_standings' in changed:
+            ingest_medal_results(sheets['medal_standings'], cursor, counts)
+
+        ingested = datetime.now(timezone.utc).isoformat()
+        cursor.executemany('''INSERT INTO ingest_state (sheet, content_hash, ingested) VALUES (?, ?, ?)
+                              ON CONFLICT (sheet) DO UPDATE SET content_hash = excluded.content_hash,
+                              ingested = excluded.ingested''',
+                           [(name, hashes[name], ingested) for name in changed + [WORKBOOK]])
+        connection.commit()
+
+    except sqlite3.Error as e:
+        print(f'An error occurred adding the new data to the paralympics database. Error: {e}')
+        if connection:
+            connection.rollback()
+        return None
+
+    if any(+c for c in counts.values()):
+        refresh_summary_tables(cursor, connection)
+    # +Counter drops the zero counts
+    return {table: +c for table, c in counts.items() if +c}
@@ -0,0 +1,121 @@
+"""
+Contains LoadReport, which records where the time goes when the data is added to the paralympics database.
+
+For each table it records the rows read, inserted and skipped, and the time spent in each phase:
+- read: reading the sheets from the workbook or snapshot
+- transform: the prepare_* function that turns a sheet into rows
+- key_resolution: looking up the ids of the rows the table refers to e.g. the event_id for each host
+- insert: the INSERT statements
+- commit: committing the transaction
+- summary: recreating the summary tables, see summary_tables.py
+
+The loaders in add_data.py and add_data_sql3.py take an optional report and add to it, add_all_data() returns its
+report. The report can be written as JSON to track the load performance over time.
+
+Usage:
+    report = add_all_data(cursor, connection, bulk=True)
+    print(report.to_json())
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+PHASES = ['read', 'transform', 'key_resolution', 'insert', 'commit', 'summary']
+
+
+class LoadReport:
+    """Row counts and phase timings for a load, see the module docstring.
+
+    The methods can be called from more than one thread, as the scheduler can prepare the tables in an executor.
+    Timings that are not for one table, e.g. reading the workbook, are recorded with the table None and are only
+    included in the totals.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._end = None
+        self.tables = {}
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.errors = []
+
+    def _table(self, table):
+        return self.tables.setdefault(table, {'read': 0, 'inserted': 0, 'skipped': 0,
+                                              'phases': dict.fromkeys(PHASES, 0.0)})
+
+    def add_time(self, table, phase, seconds):
+        """Adds seconds to the phase of the table, and to the total for the phase."""
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+            if table is not None:
+                phases = self._table(table)['phases']
+                phases[phase] = phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, table, phase):
+        """Times the with block and adds it to the phase of the table, also if the block raises an exception."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(table, phase, time.perf_counter() - start)
+
+    def count(self, table, read=0, inserted=0, skipped=0):
+        """Adds to the numbers of rows read, inserted and skipped for the table."""
+        with self._lock:
+            counts = self._table(table)
+            counts['read'] += read
+            counts['inserted'] += inserted
+            counts['skipped'] += skipped
+
+    def error(self, table, message):
+        """Records an error that stopped the rows for the table being added."""
+        with self._lock:
+            self.errors.append({'table': table, 'error': str(message)})
+
+    def finish(self):
+        """Stops the wall clock for the report. Called by add_all_data() when the load is complete."""
+        self._end = time.perf_counter()
+        return self
+
+    @property
+    def seconds(self):
+        """Wall time from the start of the report until finish(), or until now if it has not finished."""
+        return (self._end or time.perf_counter()) - self._start
+
+    def to_dict(self):
+        """Returns the report as a dict of Python values that can be written as JSON."""
+        with self._lock:
+            tables = {}
+            for name, counts in self.tables.items():
+                seconds = sum(counts['phases'].values())
+                tables[name] = {**counts, 'phases': dict(counts['phases']), 'seconds': seconds,
+                                'rows_per_s': counts['inserted'] / seconds if seconds else None}
+            inserted = sum(counts['inserted'] for counts in self.tables.values())
+            return {
+                'seconds': self.seconds,
+                'rows': {key: sum(counts[key] for counts in self.tables.values())
+                         for key in ['read', 'inserted', 'skipped']},
+                'rows_per_s': inserted / self.seconds if self.seconds else None,
+                'phases': dict(self.phases),
+                'tables': tables,
+                'errors': list(self.errors),
+            }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+
+def _transform(report, table, prepare, df):
+    with report.phase(table, 'transform'):
+        return prepare(df)
+
+
+def report_plan(plan, report):
+    """Returns a copy of a scheduler plan, see scheduler.py, that adds to the report. Each prepare function is timed
+    as the transform phase of its table, and the report is passed to each insert function."""
+    return {name: step._replace(prepare=partial(_transform, report, name, step.prepare),
+                                insert=partial(step.insert, report=report))
+            for name, step in plan.items()}
@@ -6,7 +6,7 @@ The 'db' parameter is defined during activity 7.2.
 Complete the code for the quiz tables at the end of the models.py file."""
 from typing import List
 
-from sqlalchemy import ForeignKey, Integer, String, Text
+from sqlalchemy import ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from tutor.student import db
@@ -15,6 +15,8 @@ from tutor.student import db
 # Note: db.Model is the declarative base class for SQLAlchemy that was defined in the __init__.py file
 class Event(db.Model):
     __tablename__ = 'event'
+    # Secondary index, the same as in create_db.py, used to find an event from its year and type
+    __table_args__ = (Index('idx_event_year_type', 'year', 'type'),)
     event_id = mapped_column(Integer, primary_key=True)
     type = mapped_column(Text, nullable=False)
     year = mapped_column(Integer, nullable=False)
@@ -49,6 +51,7 @@ class Country(db.Model):
         notes (str): Additional notes about the country.
     """
     __tablename__ = 'country'
+    __table_args__ = (Index('idx_country_name', 'name'),)
 
     code = mapped_column(Text, primary_key=True)
     name = mapped_column(Text, nullable=False)
@@ -63,6 +66,7 @@ class Country(db.Model):
 
 class Disability(db.Model):
     __tablename__ = 'disability'
+    __table_args__ = (Index('idx_disability_category', 'category'),)
 
     disability_id = mapped_column(Integer, primary_key=True)
     category = mapped_column(Text, nullable=False)
@@ -84,6 +88,7 @@ class DisabilityEvent(db.Model):
 
 class Host(db.Model):
     __tablename__ = 'host'
+    __table_args__ = (Index('idx_host_host', 'host'), Index('idx_host_country_code', 'country_code'))
 
     host_id = mapped_column(Integer, primary_key=True)
     country_code = mapped_column(ForeignKey('country.code'))
@@ -96,6 +101,7 @@ class Host(db.Model):
 
 class HostEvent(db.Model):
     __tablename__ = 'host_event'
+    __table_args__ = (Index('idx_host_event_event_id', 'event_id'),)
 
     host_id = mapped_column(Integer,
                             ForeignKey('host.host_id', onupdate="CASCADE", ondelete="NO ACTION"),
@@ -112,6 +118,7 @@ class HostEvent(db.Model):
 
 class Participants(db.Model):
     __tablename__ = 'participants'
+    __table_args__ = (Index('idx_participants_event_id', 'event_id'),)
 
     participant_id = mapped_column(Integer, primary_key=True)
     event_id = mapped_column(Integer, ForeignKey('event.event_id'))
@@ -125,6 +132,9 @@ class Participants(db.Model):
 
 class MedalResult(db.Model):
     __tablename__ = 'medal_result'
+    # The second index is the order of the pages of medal results in the API, see pagination.py
+    __table_args__ = (Index('idx_medal_result_event_country', 'event_id', 'country_code'),
+                      Index('idx_medal_result_event_result', 'event_id', 'result_id'))
 
     result_id = mapped_column(Integer, primary_key=True)
     event_id = mapped_column(Integer, ForeignKey('event.event_id'))
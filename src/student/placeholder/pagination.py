@@ -0,0 +1,87 @@
+"""
+Contains keyset (cursor) pagination for SQLAlchemy queries, used by the list endpoints in api.py.
+
+A page with OFFSET n has to read and skip n rows, so the deeper the page the slower it is. Keyset pagination orders
+the rows by a unique key, e.g. (event_id, result_id) for the medal results, and starts each page after the key of the
+last row of the previous page:
+    WHERE (event_id, result_id) > (:last_event_id, :last_result_id) ORDER BY event_id, result_id LIMIT :size
+With an index on the key columns the database seeks to the start of the page, so every page takes about the same
+time. Rows that are added or deleted between requests do not cause rows to be repeated or missed.
+
+The key of the last row is given to the client as an opaque cursor, a URL safe base64 string, which is passed back
+to get the next page.
+
+Usage:
+    query = db.select(MedalResult)
+    page = keyset_page(db.session, query, [MedalResult.event_id, MedalResult.result_id], cursor, limit)
+    page.items, page.next_cursor
+"""
+import base64
+import binascii
+import json
+from collections import namedtuple
+
+from sqlalchemy import tuple_
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# items: the rows of the page. next_cursor: the cursor for the next page, None if this is the last page.
+Page = namedtuple('Page', ['items', 'next_cursor'])
+
+
+def encode_cursor(key):
+    """Returns the opaque cursor for the key values of a row, e.g. (event_id, result_id)."""
+    return base64.urlsafe_b64encode(json.dumps(list(key), separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    """Returns the tuple of key values in the cursor.
+
+    Raises ValueError if the cursor is not one made by encode_cursor() for a key with length values.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f'Invalid cursor {cursor!r}') from e
+    if not isinstance(key, list) or len(key) != length or not all(isinstance(v, (int, str)) for v in key):
+        raise ValueError(f'Invalid cursor {cursor!r}')
+    return tuple(key)
+
+
+def page_size(limit, default=PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Returns the limit from the request, or the default if it is None, kept between 1 and the maximum."""
+    return default if limit is None else max(1, min(int(limit), maximum))
+
+
+def keyset_page(session, query, key_columns, cursor=None, limit=PAGE_SIZE):
+    """Returns a Page of the rows of the query that come after the cursor, ordered by the key columns.
+
+    Parameters
+    ----------
+    session: SQLAlchemy session or connection to execute the query with
+    query: select() of the rows, without an ORDER BY or LIMIT. Each row of the result must have the key columns,
+           as columns of the row or as attributes of the first entity e.g. db.select(MedalResult). The key columns
+           should not be NULL, as a NULL key is never after the cursor.
+    key_columns: columns that are unique together, there should be an index on them in this order
+    cursor: next_cursor from the previous page, None for the first page
+    limit: the number of rows in the page
+
+    Raises ValueError if the cursor is not valid.
+    """
+    if cursor is not None:
+        after = decode_cursor(cursor, len(key_columns))
+        if len(key_columns) == 1:
+            query = query.where(key_columns[0] > after[0])
+        else:
+            query = query.where(tuple_(*key_columns) > tuple_(*after))
+    # One more row than the page is read to find out if there is a next page
+    rows = session.execute(query.order_by(*key_columns).limit(limit + 1)).all()
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        # The key is in the columns of the row, or in the first entity e.g. the MedalResult
+        item = last if all(hasattr(last, column.key) for column in key_columns) else last[0]
+        next_cursor = encode_cursor([getattr(item, column.key) for column in key_columns])
+    return Page(items, next_cursor)
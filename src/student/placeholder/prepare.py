@@ -0,0 +1,149 @@
+"""
+Contains functions that prepare the data from the spreadsheet before it is added to the paralympics database.
+
+Used by both add_data.py (SQLAlchemy) and add_data_sql3.py (sqlite3).
+
+The prepare_* functions only use the dataframes, not the database, so they could be run in an executor while other
+tables are added, see scheduler.py. Each returns a list of tuples of Python values.
+"""
+import pandas as pd
+
+
+def to_rows(df, columns):
+    """Returns the columns of a dataframe as a list of tuples of Python values for executemany.
+
+    Missing values (NaN, NaT) are replaced by None so they are added as NULL.
+    """
+    values = df[columns].astype(object)
+    values = values.where(df[columns].notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+def prepare_countries(df_npc):
+    """Returns (code, name, region, sub_region, member_type, notes) for each row of the npc_codes sheet."""
+    return to_rows(df_npc, ['code', 'name', 'region', 'sub_region', 'member_type', 'notes'])
+
+
+def prepare_events(df_events):
+    """Returns (type, year, start, end, countries, events, sports, highlights, url, participants_m, participants_f,
+    participants) for each event, with the dates as dd/mm/yyyy strings."""
+    df = df_events.copy()
+    df['start'] = df['start'].dt.strftime('%d/%m/%Y').astype(str)
+    df['end'] = df['end'].dt.strftime('%d/%m/%Y').astype(str)
+    return to_rows(df, ['type', 'year', 'start', 'end', 'countries', 'events', 'sports', 'highlights', 'url',
+                        'participants_m', 'participants_f', 'participants'])
+
+
+def prepare_hosts(df_events):
+    """Returns the unique (host, country) pairs, see host_country_pairs()."""
+    return to_rows(host_country_pairs(df_events), ['host', 'country'])
+
+
+def prepare_host_events(df_events):
+    """Returns (year, type, host) for each host of each event."""
+    return [(year, event_type, host.strip())
+            for year, event_type, hosts in to_rows(df_events, ['year', 'type', 'host'])
+            for host in hosts.split(',')]
+
+
+def prepare_disabilities(df_events):
+    """Returns the (year, type, category) for each disability category of each event."""
+    return [(year, event_type, category)
+            for year, event_type, categories in to_rows(df_events, ['year', 'type', 'disabilities'])
+            for category in categories.split(', ')]
+
+
+def prepare_medal_results(df_medals):
+    """Returns (Year, Location, NPC, Rank, Gold, Silver, Bronze, Total) for each row of the medal standings."""
+    return to_rows(df_medals, ['Year', 'Location', 'NPC', 'Rank', 'Gold', 'Silver', 'Bronze', 'Total'])
+
+
+def host_country_pairs(df_events):
+    """Returns a dataframe with the unique host and country pairs from the events.
+
+    The host and country columns of an event with more than one host are comma separated lists e.g. host
+    'Stoke Mandeville, New York' and country 'Great Britain, United States of America'. The nth host is paired with
+    the nth country, where one list is longer than the other the extra values are ignored.
+
+    Parameters
+    ----------
+    df_events: dataframe with the host and country columns from the events sheet
+
+    Returns
+    -------
+    dataframe with the columns host and country, in the order they are first found in the events
+    """
+    events = df_events[['host', 'country']].reset_index(drop=True)
+    # Split each column into one row per value, the index is the row of the event and position is the place in the list
+    split = {}
+    for column in ['host', 'country']:
+        values = events[column].str.split(',').explode()
+        split[column] = pd.DataFrame({
+            'event': values.index,
+            'position': values.groupby(level=0).cumcount().to_numpy(),
+            column: values.str.strip().to_numpy(),
+        })
+    # Pair the values from the same event and position, an inner merge drops the values that have no pair
+    pairs = split['host'].merge(split['country'], on=['event', 'position'], how='inner', sort=False)
+    pairs = pairs.sort_values(['event', 'position'], kind='stable')
+    return pairs[['host', 'country']].drop_duplicates().reset_index(drop=True)
+
+
+def location_key(name):
+    """Returns the name in lower case with only the letters and digits, used to match the location of the medal
+    standings to the host names e.g. 'Tignes Albertville' and 'Tignes-Albertville' both give 'tignesalbertville'."""
+    return ''.join(character for character in str(name).lower() if character.isalnum())
+
+
+class MedalEventLookup:
+    """Finds the event_id for the year and location of a row of the medal standings.
+
+    The medal standings have the year and location but not the type of event, and in some years there was a summer
+    and a winter event. The location is matched to the host names of the events in that year. If it does not match,
+    and there was only one event that year, that event is used. Otherwise the event_id is None.
+
+    Each (year, location) is only looked up once, so the lookup can be reused for each chunk of a large file.
+
+    Parameters
+    ----------
+    event_hosts: list of (year, host, event_id) for each host of each event
+    """
+
+    def __init__(self, event_hosts):
+        self._by_location = {}
+        self._by_year = {}
+        for year, host, event_id in event_hosts:
+            self._by_location.setdefault((int(year), location_key(host)), event_id)
+            self._by_year.setdefault(int(year), set()).add(event_id)
+        self._cache = {}
+
+    def event_id(self, year, location):
+        """Returns the event_id for the year and location, or None if the event is not found."""
+        key = (year, location)
+        if key not in self._cache:
+            event_id = self._by_location.get((int(year), location_key(location)))
+            if event_id is None and len(self._by_year.get(int(year), ())) == 1:
+                event_id = next(iter(self._by_year[int(year)]))
+            self._cache[key] = event_id
+        return self._cache[key]
+
+    def event_ids(self, df_medals):
+        """Returns a list of the event_id, or None, for each row of a dataframe with the Year and Location columns."""
+        years = df_medals['Year'].tolist()
+        locations = df_medals['Location'].tolist()
+        return [self.event_id(year, location) for year, location in zip(years, locations)]
+
+
+def medal_event_ids(df_medals, event_hosts):
+    """Returns the event_id for each row of the medal standings, see MedalEventLookup.
+
+    Parameters
+    ----------
+    df_medals: dataframe with the Year and Location columns from the medal_standings sheet
+    event_hosts: list of (year, host, event_id) for each host of each event
+
+    Returns
+    -------
+    list of event_id, or None, in the same order as the rows of df_medals
+    """
+    return MedalEventLookup(event_hosts).event_ids(df_medals)
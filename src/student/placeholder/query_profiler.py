@@ -0,0 +1,314 @@
+"""
+Contains a profiler that aggregates the SQL queries run on sqlite3 connections, used by db.py in place of printing
+every query with a trace callback.
+
+The values in each statement are replaced by ? so that the same query with different values is counted together e.g.
+"SELECT * FROM event WHERE year = 2012" and "... year = 2016" are both "SELECT * FROM event WHERE year = ?". For each
+normalized statement it records the number of calls, the total, mean, p95 and max time in ms, and the rows returned.
+The time for a query includes fetching its rows, as sqlite3 runs most of a SELECT while the rows are fetched.
+
+Queries that take longer than slow_ms are kept in a slow query log, with the SQL as it was run, and logged as a
+warning. With sample_rate below 1, only that fraction of the queries are timed, the counts are not scaled up.
+
+When the profiler is not enabled db.py opens plain sqlite3 connections, so there is no cost. When it is enabled the
+stats are saved to a JSON file per process in the Flask instance folder, so the `flask query-stats` command can read
+them from another process.
+
+Usage:
+    profiler = QueryProfiler(slow_ms=50, sample_rate=0.1)
+    connection = sqlite3.connect('paralympics.sqlite', factory=profiler.connection_factory)
+    ...
+    print(format_stats(profiler.stats()))
+"""
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the files the stats are saved to, followed by the process id
+STATS_FILE_PREFIX = 'query_stats-'
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Returns the statement with each string and number replaced by ?, a list of values in IN (...) replaced by a
+    single ?, and the whitespace collapsed."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (?)', sql)
+    return _SPACE.sub(' ', sql).strip().rstrip(';')
+
+
+def percentile(values, fraction):
+    """Returns the value at the fraction (0 to 1) of the sorted values, using the nearest rank."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))]
+
+
+class QueryProfiler:
+    """Aggregates the time and rows of the queries run on the connections made with connection_factory.
+
+    Parameters
+    ----------
+    slow_ms: a query that takes longer than this is added to the slow query log
+    sample_rate: fraction of the queries to time, between 0 and 1
+    max_samples: the number of times kept for each statement to find the p95, the oldest are replaced
+    slow_log_size: the number of slow queries kept, the oldest are removed
+    stats_dir: directory to save the stats to with flush(), in a file named with the process id. None to not save
+               them.
+    flush_seconds: the shortest time between saves with flush_if_due()
+    """
+
+    def __init__(self, slow_ms=100, sample_rate=1.0, max_samples=1000, slow_log_size=100, stats_dir=None,
+                 flush_seconds=10):
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.max_samples = max_samples
+        self.stats_dir = Path(stats_dir) if stats_dir else None
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._slow = deque(maxlen=slow_log_size)
+        self._changed = False
+        self._last_flush = time.monotonic()
+        self.connection_factory = self._connection_class()
+
+    def _connection_class(self):
+        """Returns a sqlite3.Connection subclass whose cursors record their queries with this profiler. It is the
+        connection_factory attribute, to pass as the factory to sqlite3.connect()."""
+        profiler = self
+
+        class ProfiledConnection(sqlite3.Connection):
+            def cursor(self, factory=None):
+                cursor = super().cursor(factory or ProfiledCursor)
+                if isinstance(cursor, ProfiledCursor):
+                    cursor.profiler = profiler
+                return cursor
+
+            def execute(self, sql, parameters=()):
+                return self.cursor().execute(sql, parameters)
+
+            def executemany(self, sql, parameters):
+                return self.cursor().executemany(sql, parameters)
+
+        return ProfiledConnection
+
+    def sampled(self):
+        """Returns True if the next query should be timed."""
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def record(self, sql, seconds, rows):
+        """Adds a query that took seconds and returned rows to the stats."""
+        ms = seconds * 1000
+        key = normalize_sql(sql)
+        with self._lock:
+            stat = self._stats.get(key)
+            if stat is None:
+                stat = self._stats[key] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0,
+                                           'samples': deque(maxlen=self.max_samples)}
+            stat['count'] += 1
+            stat['total_ms'] += ms
+            stat['max_ms'] = max(stat['max_ms'], ms)
+            stat['rows'] += rows
+            stat['samples'].append(ms)
+            if ms > self.slow_ms:
+                self._slow.append({'sql': sql, 'statement': key, 'ms': ms, 'rows': rows,
+                                   'at': datetime.now(timezone.utc).isoformat(timespec='seconds')})
+            self._changed = True
+        if ms > self.slow_ms:
+            logger.warning('Slow query (%.1f ms, %d rows): %s', ms, rows, key)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self._changed = True
+
+    def to_dict(self):
+        """Returns the stats and slow query log as a dict that can be written as JSON."""
+        with self._lock:
+            return {
+                'sample_rate': self.sample_rate,
+                'statements': {key: {**stat, 'samples': list(stat['samples'])} for key, stat in self._stats.items()},
+                'slow': list(self._slow),
+            }
+
+    def flush(self):
+        """Saves the stats to a file for this process in stats_dir if they have changed since they were last saved.
+
+        The file is replaced so a reader never sees a partly written file. The process id is found when the file is
+        saved, as a server may fork the workers after the profiler is created.
+        """
+        if self.stats_dir is None or not self._changed:
+            return
+        data = self.to_dict()
+        self.stats_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.stats_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.stats_dir / f'{STATS_FILE_PREFIX}{os.getpid()}.json')
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        with self._lock:
+            self._changed = False
+            self._last_flush = time.monotonic()
+
+    def flush_if_due(self):
+        """Saves the stats if they have changed and flush_seconds have passed since they were last saved."""
+        if time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def stats(self):
+        """Returns the aggregated stats for each statement, see aggregate()."""
+        return aggregate([self.to_dict()])
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """A cursor that times each query until its rows have all been fetched, then records it with the profiler.
+
+    A query that is not fully fetched is recorded when the cursor runs another query, is closed or is deleted.
+    """
+    profiler = None
+    _query = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        if not self.profiler.sampled():
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        self._query = [sql, time.perf_counter() - start, 0]
+        if self.description is None:
+            # Not a query that returns rows
+            self._finish()
+        return self
+
+    def executemany(self, sql, parameters):
+        self._finish()
+        if not self.profiler.sampled():
+            return super().executemany(sql, parameters)
+        start = time.perf_counter()
+        super().executemany(sql, parameters)
+        self.profiler.record(sql, time.perf_counter() - start, 0)
+        return self
+
+    def _fetch(self, fetch, *args):
+        if self._query is None:
+            return fetch(*args)
+        start = time.perf_counter()
+        result = fetch(*args)
+        self._query[1] += time.perf_counter() - start
+        return result
+
+    def fetchone(self):
+        row = self._fetch(super().fetchone)
+        if self._query is not None:
+            if row is None:
+                self._finish()
+            else:
+                self._query[2] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._fetch(super().fetchmany, self.arraysize if size is None else size)
+        if self._query is not None:
+            self._query[2] += len(rows)
+            if len(rows) < (self.arraysize if size is None else size):
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(super().fetchall)
+        if self._query is not None:
+            self._query[2] += len(rows)
+            self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._fetch(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._query is not None:
+            self._query[2] += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+    def _finish(self):
+        if self._query is not None:
+            sql, seconds, rows = self._query
+            self._query = None
+            self.profiler.record(sql, seconds, rows)
+
+
+def aggregate(stats):
+    """Combines the stats from QueryProfiler.to_dict() for one or more processes.
+
+    Returns
+    -------
+    list of dicts with the statement, count, total_ms, mean_ms, p95_ms, max_ms and rows, the slowest total first
+    """
+    combined = {}
+    for data in stats:
+        for key, stat in data['statements'].items():
+            total = combined.setdefault(key, {'statement': key, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                              'rows': 0, 'samples': []})
+            total['count'] += stat['count']
+            total['total_ms'] += stat['total_ms']
+            total['max_ms'] = max(total['max_ms'], stat['max_ms'])
+            total['rows'] += stat['rows']
+            total['samples'].extend(stat['samples'])
+    results = []
+    for total in combined.values():
+        samples = total.pop('samples')
+        results.append({**total, 'mean_ms': total['total_ms'] / total['count'], 'p95_ms': percentile(samples, 0.95)})
+    return sorted(results, key=lambda result: result['total_ms'], reverse=True)
+
+
+def read_stats(directory):
+    """Returns the stats saved by each process in the directory, see QueryProfiler.flush()."""
+    stats = []
+    for path in sorted(Path(directory).glob(f'{STATS_FILE_PREFIX}*.json')):
+        try:
+            with open(path) as f:
+                stats.append(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning('The query stats in %s could not be read. Error: %s', path, e)
+    return stats
+
+
+def format_stats(results, limit=20, width=80):
+    """Returns the stats from aggregate() as a text table."""
+    lines = [f"{'calls':>8}{'total ms':>12}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}{'rows':>10}  statement"]
+    for result in results[:limit]:
+        statement = result['statement'] if len(result['statement']) <= width else result['statement'][:width - 3] + '...'
+        lines.append(f"{result['count']:8}{result['total_ms']:12.1f}{result['mean_ms']:10.2f}{result['p95_ms']:10.2f}"
+                     f"{result['max_ms']:10.2f}{result['rows']:10}  {statement}")
+    return '\n'.join(lines)
@@ -0,0 +1,75 @@
+"""
+Contains a scheduler that adds the data for each table in the order needed for the foreign keys.
+
+Each table has a step with:
+- prepare: function that takes a dataframe and returns the rows to add. It must not use the database, so the steps
+  could be prepared in an executor.
+- insert: function that takes the prepared rows and adds them to the database. The inserts are all run by the caller,
+  one at a time, so only one thread writes to the database.
+- depends_on: the tables that must be added first e.g. host_event depends on host and event.
+
+By default each table is prepared then added in turn, in the calling thread. The prepare functions are mostly pandas
+string work that holds the GIL, so a pool of threads gave no gain in the loader benchmark (plan_threads against
+plan_serial in tests/benchmarks/bench_loaders.py). If an executor is given, the prepare functions are all started in
+it at once and as soon as a table's dependencies have been added and its rows have been prepared, it is added.
+add_all_data() in add_data.py and add_data_sql3.py, and create_db(), take an executor to pass on, e.g. for a
+multi-core server where the benchmark shows a gain.
+"""
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, wait
+from graphlib import TopologicalSorter
+
+LoadStep = namedtuple('LoadStep', ['sheet', 'prepare', 'insert', 'depends_on'])
+
+
+def run_load_plan(plan, sheets, writer, executor=None):
+    """Prepares the rows for every table in the plan in the executor and adds them in dependency order.
+
+    Parameters
+    ----------
+    plan: dict of table name to LoadStep
+    sheets: dict of sheet name to dataframe, the step's prepare function is given sheets[step.sheet]
+    writer: passed to each insert function with the prepared rows e.g. the sqlite cursor
+    executor: optional concurrent.futures executor to prepare the tables in while others are added, the default is
+              to prepare each table in the calling thread just before it is added. Only use an executor if a
+              benchmark on the target machine shows a gain. A ProcessPoolExecutor needs prepare functions that can be
+              pickled, and the transform times from report_plan() are not recorded in the other processes.
+
+    Returns
+    -------
+    list of the table names in the order they were added
+
+    Raises graphlib.CycleError if the dependencies have a cycle. An exception from a prepare or insert function is
+    raised, the caller should rollback. With an executor, the prepare functions that have not started are cancelled
+    and the executor is not shut down.
+    """
+    if executor is None:
+        order = []
+        for name in TopologicalSorter({n: s.depends_on for n, s in plan.items()}).static_order():
+            plan[name].insert(plan[name].prepare(sheets[plan[name].sheet]), writer)
+            order.append(name)
+        return order
+
+    sorter = TopologicalSorter({name: step.depends_on for name, step in plan.items()})
+    sorter.prepare()
+    order = []
+    futures = {}
+    try:
+        # Start every prepare function, in dependency order so the tables needed first are prepared first
+        for name in TopologicalSorter({n: s.depends_on for n, s in plan.items()}).static_order():
+            futures[name] = executor.submit(plan[name].prepare, sheets[plan[name].sheet])
+        ready = []
+        while sorter.is_active():
+            ready.extend(sorter.get_ready())
+            # Add whichever table that can be added has finished being prepared
+            done, _ = wait([futures[name] for name in ready], return_when=FIRST_COMPLETED)
+            name = next(name for name in ready if futures[name] in done)
+            plan[name].insert(futures[name].result(), writer)
+            ready.remove(name)
+            sorter.done(name)
+            order.append(name)
+    finally:
+        # Do not start the prepare functions that are no longer needed after an error
+        for future in futures.values():
+            future.cancel()
+    return order
@@ -0,0 +1,124 @@
+"""
+Contains functions to read the sheets of paralympics.xlsx from a snapshot instead of parsing the workbook each time.
+
+Parsing the workbook with openpyxl is the slowest part of loading the data. The first time a sheet is read it is
+saved in a Feather file, a binary columnar format read with pyarrow. Feather files only hold data, so reading a
+snapshot from a shared directory cannot run code as loading a pickle could. The snapshot file name includes the
+SHA-256 hash of the workbook, so when the workbook changes the sheets are parsed again and the old snapshots are
+removed.
+
+The snapshots are saved in a .snapshots directory next to the workbook, or in the directory in the
+PARALYMPICS_SNAPSHOT_DIR environment variable. If a snapshot cannot be saved, e.g. the directory is read only or a
+column has values that pyarrow cannot convert, the sheets are still returned.
+
+Usage:
+    sheets = read_sheets(data_path, ['events', 'medal_standings'])
+    events_df = sheets['events']
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import pyarrow
+import pyarrow.ipc
+
+
+def file_hash(path):
+    """Returns a SHA-256 hex digest of the bytes of a file."""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def snapshot_dir(data_path):
+    """Returns the directory for the snapshots of the workbook."""
+    return Path(os.environ.get('PARALYMPICS_SNAPSHOT_DIR', Path(data_path).parent / '.snapshots'))
+
+
+def snapshot_path(data_path, workbook_hash, sheet):
+    """Returns the path of the snapshot of a sheet e.g. .snapshots/paralympics-<hash>-events.feather"""
+    return snapshot_dir(data_path) / f'{Path(data_path).stem}-{workbook_hash[:16]}-{sheet}.feather'
+
+
+def read_snapshot(path):
+    """Returns the dataframe saved in a snapshot."""
+    return pd.read_feather(path)
+
+
+def write_snapshot(df, path):
+    """Saves the dataframe to a temporary file then renames it, so a reader never sees a partly written snapshot."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=path.suffix)
+    os.close(fd)
+    try:
+        df.to_feather(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def remove_old_snapshots(data_path, workbook_hash):
+    """Removes the snapshots of earlier versions of the workbook."""
+    directory = snapshot_dir(data_path)
+    current = f'{Path(data_path).stem}-{workbook_hash[:16]}-'
+    for path in directory.glob(f'{Path(data_path).stem}-*'):
+        if not path.name.startswith(current):
+            path.unlink(missing_ok=True)
+
+
+def read_sheets(data_path, sheets):
+    """Returns a dict of sheet name to dataframe, from the snapshots if they are for the current workbook.
+
+    Parameters
+    ----------
+    data_path: path to the Excel workbook
+    sheets: list of sheet names
+    """
+    workbook_hash = file_hash(data_path)
+    paths = {sheet: snapshot_path(data_path, workbook_hash, sheet) for sheet in sheets}
+    missing = [sheet for sheet, path in paths.items() if not path.exists()]
+    if not missing:
+        return {sheet: read_snapshot(path) for sheet, path in paths.items()}
+
+    # Parse the workbook once for all the sheets that do not have a snapshot
+    parsed = pd.read_excel(data_path, sheet_name=missing)
+    try:
+        remove_old_snapshots(data_path, workbook_hash)
+    except OSError as e:
+        print(f'The old snapshots of {data_path} could not be removed. Error: {e}')
+    # The snapshot is only a cache, so a sheet that cannot be saved, e.g. a column of mixed types that pyarrow cannot
+    # convert, is still returned
+    for sheet, df in parsed.items():
+        try:
+            write_snapshot(df, paths[sheet])
+        except (OSError, pyarrow.ArrowException) as e:
+            print(f'The snapshot of sheet {sheet} of {data_path} could not be saved. Error: {e}')
+    return {sheet: parsed[sheet] if sheet in parsed else read_snapshot(paths[sheet]) for sheet in sheets}
+
+
+def iter_chunks(path, chunksize=10000):
+    """Yields a file of rows as dataframes of up to chunksize rows, so a large file is not read into memory at once.
+
+    Parameters
+    ----------
+    path: path to a CSV file, or to a Feather snapshot saved by read_sheets()
+    chunksize: the maximum number of rows in each dataframe
+
+    A Feather file is memory mapped and read one record batch at a time, and each slice of a batch is only converted
+    to a dataframe when it is needed. Raises ValueError for any other type of file.
+    """
+    path = Path(path)
+    if path.suffix == '.csv':
+        with pd.read_csv(path, chunksize=chunksize) as reader:
+            yield from reader
+    elif path.suffix == '.feather':
+        with pyarrow.memory_map(str(path)) as source:
+            reader = pyarrow.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                for start in range(0, batch.num_rows, chunksize):
+                    yield batch.slice(start, chunksize).to_pandas()
+    else:
+        raise ValueError(f'{path} is not a CSV or Feather file')
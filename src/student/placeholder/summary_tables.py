@@ -0,0 +1,104 @@
+"""
+Contains functions to create the summary tables in the paralympics database.
+
+The summary tables hold the results of the joins and aggregates used by the charts, so the apps can read a small
+table rather than run the join for every chart. They are created from the other tables and must be refreshed each
+time the data is (re)loaded, add_all_data() does this at the end of loading the data.
+
+Works with the database created by create_db() and with the database in student/data used by the Dash app, which
+has the participants and the host latitude and longitude in different tables.
+"""
+import sqlite3
+
+summary_host_count_sql = '''CREATE TABLE IF NOT EXISTS summary_host_count (
+                            country TEXT PRIMARY KEY,
+                            count INTEGER NOT NULL)'''
+
+summary_event_location_sql = '''CREATE TABLE IF NOT EXISTS summary_event_location (
+                                event_id INTEGER NOT NULL,
+                                host_id INTEGER NOT NULL,
+                                type TEXT,
+                                year INTEGER,
+                                host TEXT,
+                                latitude REAL,
+                                longitude REAL,
+                                PRIMARY KEY (event_id, host_id))'''
+
+summary_event_series_sql = '''CREATE TABLE IF NOT EXISTS summary_event_series (
+                              event_id INTEGER PRIMARY KEY,
+                              type TEXT,
+                              year INTEGER,
+                              host TEXT,
+                              countries INTEGER,
+                              events INTEGER,
+                              sports INTEGER,
+                              participants_m INTEGER,
+                              participants_f INTEGER,
+                              participants INTEGER)'''
+
+SUMMARY_TABLES = ['summary_host_count', 'summary_event_location', 'summary_event_series']
+
+
+def get_columns(cursor, table):
+    """Returns the set of column names in a table, empty if the table does not exist."""
+    return {row[1] for row in cursor.execute(f'PRAGMA table_info({table})').fetchall()}
+
+
+def refresh_summary_tables(cursor, connection):
+    """Create the summary tables if needed and replace their rows with the current data.
+
+    Parameters
+    ----------
+    connection: sqlite connection object
+    cursor: sqlite cursor object
+    """
+    try:
+        cursor.execute(summary_host_count_sql)
+        cursor.execute(summary_event_location_sql)
+        cursor.execute(summary_event_series_sql)
+        for table in SUMMARY_TABLES:
+            cursor.execute(f'DELETE FROM {table}')
+
+        # Number of times each country has hosted, used by the histogram
+        cursor.execute('''INSERT INTO summary_host_count (country, count)
+                          SELECT country.name, COUNT(country.name) FROM country
+                          JOIN host ON host.country_code = country.code
+                          JOIN host_event ON host.host_id = host_event.host_id
+                          GROUP BY country.name''')
+
+        # Each host of each event with its location, used by the map. Only the Dash app database has the location.
+        if {'latitude', 'longitude'} <= get_columns(cursor, 'host'):
+            location = 'CAST(host.latitude AS REAL), CAST(host.longitude AS REAL)'
+        else:
+            location = 'NULL, NULL'
+        cursor.execute(f'''INSERT INTO summary_event_location
+                           (event_id, host_id, type, year, host, latitude, longitude)
+                           SELECT event.event_id, host.host_id, event.type, event.year, host.host, {location}
+                           FROM event
+                           JOIN host_event ON event.event_id = host_event.event_id
+                           JOIN host ON host_event.host_id = host.host_id''')
+
+        # One row per event with the values plotted over time in the line chart. The participants are in their own
+        # table in the database created by create_db(), and in the event table in the Dash app database.
+        if get_columns(cursor, 'participants'):
+            participants = 'participants.participants_m, participants.participants_f, participants.participants'
+            join = 'LEFT JOIN participants ON participants.event_id = event.event_id'
+        else:
+            participants = 'event.participants_m, event.participants_f, event.participants'
+            join = ''
+        cursor.execute(f'''INSERT INTO summary_event_series
+                           (event_id, type, year, host, countries, events, sports,
+                            participants_m, participants_f, participants)
+                           SELECT event.event_id, event.type, event.year,
+                                  (SELECT GROUP_CONCAT(host.host, ', ') FROM host_event
+                                   JOIN host ON host_event.host_id = host.host_id
+                                   WHERE host_event.event_id = event.event_id),
+                                  event.countries, event.events, event.sports, {participants}
+                           FROM event {join}''')
+
+        connection.commit()
+
+    except sqlite3.Error as e:
+        print(f'An error occurred creating the summary tables. Error: {e}')
+        if connection:
+            connection.rollback()
@@ -0,0 +1,89 @@
+"""Benchmark for the JSON API in student.placeholder.api, comparing full responses with conditional requests.
+
+Creates the database in a temporary file with the SQLAlchemy models and add_data.add_all_data(), then for each API
+path measures the requests/s for:
+- cold: a request without If-None-Match to an app without the response cache, so the database is queried and the
+  JSON created
+- cached: the same request to an app with the memory response cache, answered from the cached JSON
+- conditional: a request with the ETag from the previous response, answered with 304 Not Modified from the version
+  counter without querying the database
+
+The requests are made with the Flask test client, so the times do not include the network or a WSGI server.
+
+Run from the repository root after `pip install -e .`, once the models have been moved to the app (activity 7.3):
+    python tests/benchmarks/bench_api.py --requests 500 --output api.json
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from flask import Flask
+
+from student.flask_paralympics.response_cache import cache
+from student.placeholder.add_data import add_all_data
+from student.placeholder.api import api
+from student.placeholder.data_version import DataVersion
+from tutor.flask_para_t import db
+
+PATHS = ['/api/events', '/api/events/1', '/api/hosts', '/api/countries', '/api/medals', '/api/medals?country_code=GBR']
+
+
+def create_app(database_path, cache_backend=None):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database_path}'
+    app.config['RESPONSE_CACHE_BACKEND'] = cache_backend
+    db.init_app(app)
+    with app.app_context():
+        if not Path(database_path).exists():
+            db.create_all()
+            add_all_data()
+    DataVersion(app, db)
+    cache.init_app(app)
+    app.register_blueprint(api)
+    return app
+
+
+def requests_per_s(client, path, requests, headers=None):
+    """Returns the requests/s for the path, and the status code of the last response."""
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path, headers=headers)
+    return requests / (time.perf_counter() - start), response.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="requests for each path and type")
+    parser.add_argument("--output", help="file to write the results to as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        client = create_app(Path(tmp) / "paralympics.sqlite").test_client()
+        cached_client = create_app(Path(tmp) / "paralympics.sqlite", "memory").test_client()
+        print(f"{'path':28}{'bytes':>10}{'cold req/s':>14}{'cached req/s':>14}{'304 req/s':>14}")
+        for path in PATHS:
+            response = client.get(path)
+            etag = response.headers["ETag"]
+            cold, cold_status = requests_per_s(client, path, args.requests)
+            cached, cached_status = requests_per_s(cached_client, path, args.requests)
+            conditional, status = requests_per_s(client, path, args.requests, {"If-None-Match": etag})
+            if cold_status != 200 or cached_status != 200 or status != 304:
+                print(f"Unexpected status for {path}: {cold_status} without the ETag, {cached_status} from the "
+                      f"cache, {status} with the ETag")
+                return 1
+            results[path] = {"bytes": len(response.data), "cold_rps": cold, "cached_rps": cached,
+                             "conditional_rps": conditional}
+            print(f"{path:28}{len(response.data):10}{cold:14,.0f}{cached:14,.0f}{conditional:14,.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
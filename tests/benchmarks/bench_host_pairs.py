@@ -0,0 +1,85 @@
+"""Benchmark for finding the unique host and country pairs in the events, see student.placeholder.prepare.
+
+Compares host_country_pairs() with the loop that add_host_data() used before, which added each pair to the
+dataframe with pd.concat so copied the dataframe once per host. The events sheet is repeated to make each size, with
+a number added to each host and country so that the pairs are not all duplicates.
+
+Run from the repository root after `pip install -e .`:
+    python tests/benchmarks/bench_host_pairs.py --events 100 1000 10000 --loop-max 10000
+"""
+import argparse
+import json
+import sys
+import time
+from importlib import resources
+
+import pandas as pd
+
+from student.placeholder.prepare import host_country_pairs
+
+
+def concat_loop(df_events):
+    """The previous version of the pair extraction from add_host_data()."""
+    host_country_df = pd.DataFrame(columns=['host', 'country'])
+    for index, row in df_events.iterrows():
+        hosts = row['host'].split(',')
+        countries = row['country'].split(',')
+        for host, country in zip(hosts, countries):
+            new_row = pd.DataFrame({'host': [host.strip()], 'country': [country.strip()]})
+            host_country_df = pd.concat([host_country_df, new_row], ignore_index=True)
+    return host_country_df.drop_duplicates(subset=['host', 'country'])
+
+
+def make_events(events_df, size):
+    """Repeats the events to make size rows, every copy of the sheet has different host and country names."""
+    copies = -(-size // len(events_df))
+    df = pd.concat([events_df[['host', 'country']]] * copies, ignore_index=True).head(size)
+    copy = (df.index // len(events_df)).astype(str)
+    for column in ['host', 'country']:
+        df[column] = [','.join(f'{value} {n}' for value in values.split(',')) for values, n in zip(df[column], copy)]
+    return df
+
+
+def best_time(function, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, nargs="+", default=[100, 1000, 10000], help="numbers of events")
+    parser.add_argument("--loop-max", type=int, default=10000, help="largest size to run the pd.concat loop for")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each size, the best time is reported")
+    parser.add_argument("--output", help="file to write the results to as JSON")
+    args = parser.parse_args()
+
+    events_df = pd.read_excel(resources.files("student.data").joinpath("paralympics.xlsx"), sheet_name='events')
+    results = []
+    print(f"{'events':>8}{'pairs':>8}{'concat loop s':>16}{'vectorized s':>16}{'speed up':>10}")
+    for size in args.events:
+        df = make_events(events_df, size)
+        vectorized, pairs = best_time(host_country_pairs, df, args.repeat)
+        result = {"events": size, "pairs": len(pairs), "vectorized_s": vectorized, "concat_loop_s": None}
+        if size <= args.loop_max:
+            loop, expected = best_time(concat_loop, df, 1)
+            if pairs.values.tolist() != expected.values.tolist():
+                print(f"Pairs differ from the concat loop for {size} events")
+                return 1
+            result["concat_loop_s"] = loop
+        results.append(result)
+        loop_text = f"{result['concat_loop_s']:16.4f}" if result["concat_loop_s"] is not None else f"{'-':>16}"
+        speed_up = f"{result['concat_loop_s'] / vectorized:9.0f}x" if result["concat_loop_s"] else f"{'-':>10}"
+        print(f"{size:8}{len(pairs):8}{loop_text}{vectorized:16.4f}{speed_up}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
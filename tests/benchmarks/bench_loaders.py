@@ -0,0 +1,196 @@
+"""Loader benchmark for the paralympics database, with synthetic data at several times the size of the workbook.
+
+For each scale the sheets are made by synthetic.make_sheets() and loaded into a new database file. It times:
+- generate: making the synthetic sheets
+- prepare_<table>: the prepare function of the table's LoadStep in add_data_sql3.LOAD_PLAN
+- insert_<table>: the insert function of the table's LoadStep, the tables are added in dependency order in one
+  transaction with the settings from load_pragmas()
+- summary: refresh_summary_tables()
+- plan_serial: scheduler.run_load_plan() with the default of preparing each table just before it is added
+- plan_threads: run_load_plan() with a ThreadPoolExecutor, preparing the tables in threads while others are added.
+  Compare it with plan_serial on a multi-core machine before passing an executor to the loaders.
+- bulk_load: create_db() with bulk=True, the tables added by the scheduler in one transaction
+- per_table_load: create_db() with bulk=False, each table committed when it has been added
+- sqlalchemy_load: add_data.add_all_data(), the SQLAlchemy loader, in a Flask-SQLAlchemy app with a new database
+  file. It needs the models in the app (activity 7.3), until then the stage is skipped with a message.
+
+Each stage reports the rows it handled and rows/s. With --save-baseline the results are written to
+baselines/loaders.json next to this script; with --compare a stage whose rows/s is more than --threshold below the
+baseline is listed and the script exits with status 1. Stages that took less than --min-seconds in the baseline are
+not compared, their time is mostly noise. The baseline is only comparable on the machine that made it, so save a new
+one before comparing on a different machine.
+
+Run from the repository root after `pip install -e .`:
+    python tests/benchmarks/bench_loaders.py --scale 1 10 100 --compare
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+from graphlib import TopologicalSorter
+
+from student.placeholder.add_data_sql3 import LOAD_PLAN, load_pragmas
+from student.placeholder.create_db import create_db
+from student.placeholder.scheduler import run_load_plan
+from student.placeholder.summary_tables import refresh_summary_tables
+from synthetic import SCALES, make_sheets, read_bundled_sheets
+
+BASELINE = Path(__file__).parent / "baselines" / "loaders.json"
+TABLES = ['country', 'event', 'host', 'host_event', 'disability', 'disability_event', 'medal_result']
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def stage(seconds, rows):
+    return {"rows": rows, "seconds": seconds, "rows_per_s": rows / seconds if seconds else None}
+
+
+def count_rows(connection):
+    return sum(connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES)
+
+
+def new_database(path, sheets=None, bulk=True):
+    """Creates the database file, with the data from the sheets unless sheets is None. Returns the connection."""
+    path.unlink(missing_ok=True)
+    connection = sqlite3.connect(path)
+    create_db(connection.cursor(), connection, bulk=bulk, sheets=sheets, with_data=sheets is not None)
+    return connection
+
+
+def sqlalchemy_load(path, sheets):
+    """Adds the data to a new database file with add_data.add_all_data(). Returns (seconds, rows), or None if the
+    SQLAlchemy models cannot be imported."""
+    try:
+        from flask import Flask
+        from student.placeholder import add_data
+        from tutor.flask_para_t import db
+    except ImportError:
+        return None
+    path.unlink(missing_ok=True)
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        seconds, _ = timed(add_data.add_all_data, sheets)
+        db.engine.dispose()
+    connection = sqlite3.connect(path)
+    rows = count_rows(connection)
+    connection.close()
+    return seconds, rows
+
+
+def run_scale(directory, bundled, scale):
+    """Returns a dict of stage name to rows, seconds and rows/s for one scale."""
+    results = {}
+    seconds, sheets = timed(make_sheets, scale, bundled)
+    results["generate"] = stage(seconds, sum(len(df) for df in sheets.values()))
+
+    # Each step on its own, in the order the scheduler would add them when every table is prepared at once
+    path = Path(directory) / f"paralympics_{scale}.db"
+    connection = new_database(path)
+    cursor = connection.cursor()
+    order = TopologicalSorter({name: step.depends_on for name, step in LOAD_PLAN.items()}).static_order()
+    with load_pragmas(connection):
+        for name in order:
+            step = LOAD_PLAN[name]
+            seconds, rows = timed(step.prepare, sheets[step.sheet])
+            results[f"prepare_{name}"] = stage(seconds, len(rows))
+            seconds, _ = timed(step.insert, rows, cursor)
+            results[f"insert_{name}"] = stage(seconds, len(rows))
+    seconds, _ = timed(refresh_summary_tables, cursor, connection)
+    results["summary"] = stage(seconds, count_rows(connection))
+    connection.close()
+
+    for name, threads in [("plan_serial", False), ("plan_threads", True)]:
+        connection = new_database(path)
+        with load_pragmas(connection), ThreadPoolExecutor() if threads else nullcontext() as executor:
+            seconds, _ = timed(run_load_plan, LOAD_PLAN, sheets, connection.cursor(), executor)
+        results[name] = stage(seconds, count_rows(connection))
+        connection.close()
+
+    for name, bulk in [("bulk_load", True), ("per_table_load", False)]:
+        seconds, connection = timed(new_database, path, sheets, bulk)
+        results[name] = stage(seconds, count_rows(connection))
+        connection.close()
+
+    loaded = sqlalchemy_load(Path(directory) / f"paralympics_{scale}_sqlalchemy.db", sheets)
+    if loaded is not None:
+        results["sqlalchemy_load"] = stage(*loaded)
+    return results
+
+
+def regressions(results, baseline, threshold, min_seconds):
+    """Returns (scale, stage, baseline rows/s, rows/s) for each stage that is more than threshold slower."""
+    slower = []
+    for scale, stages in results.items():
+        for name, result in stages.items():
+            saved = baseline.get(scale, {}).get(name, {})
+            expected = saved.get("rows_per_s")
+            if saved.get("seconds", 0) < min_seconds:
+                continue
+            if expected and result["rows_per_s"] and result["rows_per_s"] < expected * (1 - threshold):
+                slower.append((scale, name, expected, result["rows_per_s"]))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 100],
+                        help=f"data scale factors to run e.g. {SCALES}, 10000 needs several GB of memory")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each scale, the best time is reported")
+    parser.add_argument("--output", help="file to write the results to as JSON")
+    parser.add_argument("--save-baseline", action="store_true", help=f"write the results to {BASELINE.name}")
+    parser.add_argument("--compare", action="store_true", help="compare the rows/s with the saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="fraction of the baseline rows/s a stage may lose before it is a regression")
+    parser.add_argument("--min-seconds", type=float, default=0.05,
+                        help="shortest baseline time of a stage that is compared")
+    args = parser.parse_args()
+
+    bundled = read_bundled_sheets()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scale:
+            runs = [run_scale(tmp, bundled, scale) for _ in range(args.repeat)]
+            results[str(scale)] = {name: min((run[name] for run in runs), key=lambda result: result["seconds"])
+                                   for name in runs[0]}
+
+    if "sqlalchemy_load" not in results[str(args.scale[0])]:
+        print("sqlalchemy_load skipped, the models are added to the app in activity 7.3\n")
+    print(f"{'stage':24}" + "".join(f"{f'{scale}x rows/s':>18}" for scale in results))
+    for name in results[str(args.scale[0])]:
+        print(f"{name:24}" + "".join(f"{stages[name]['rows_per_s'] or 0:18,.0f}" for stages in results.values()))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        BASELINE.parent.mkdir(exist_ok=True)
+        with open(BASELINE, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        if not BASELINE.exists():
+            print(f"\nNo baseline to compare with, run with --save-baseline to create {BASELINE}")
+            return 1
+        with open(BASELINE) as f:
+            slower = regressions(results, json.load(f), args.threshold, args.min_seconds)
+        for scale, name, expected, actual in slower:
+            print(f"Regression at {scale}x in {name}: {actual:,.0f} rows/s, baseline {expected:,.0f} rows/s")
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Benchmark for reading pages of the medal results with a cursor, see student.placeholder.pagination.
+
+Adds the medal results to a new database created by create_db() in a temporary file, spread over the events with the
+result_id not in event_id order, so the pages use both key columns. For each size it times the first page, a page
+99% of the way through read with a cursor (keyset_page()), and the same page read with OFFSET. A page read with a
+cursor uses the (event_id, result_id) index so takes about the same time however deep it is, OFFSET reads and skips
+every row before the page.
+
+Run from the repository root after `pip install -e .`:
+    python tests/benchmarks/bench_pagination.py --rows 10000 100000 1000000 --output pagination.json
+"""
+import argparse
+import json
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import column, create_engine, select, table
+
+from student.placeholder.add_data_sql3 import load_pragmas
+from student.placeholder.create_db import create_db
+from student.placeholder.pagination import encode_cursor, keyset_page
+
+medal_result = table("medal_result", column("result_id"), column("event_id"), column("country_code"), column("total"))
+KEY = [medal_result.c.event_id, medal_result.c.result_id]
+
+
+def add_medal_results(path, rows, events):
+    """Creates the paralympics tables and adds rows medal results spread over the events."""
+    connection = sqlite3.connect(path)
+    create_db(connection.cursor(), connection, with_data=False)
+    with load_pragmas(connection, cache_size=-512000):
+        connection.execute("""WITH RECURSIVE k(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM k WHERE n < ?)
+                              INSERT INTO medal_result (result_id, event_id, country_code, total)
+                              SELECT n, (n * 7919) % ? + 1, 'C' || (n % 200), n % 50 FROM k""", (rows, events))
+    connection.close()
+
+
+def median_time(read, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def time_pages(engine, rows, page, repeat):
+    """Returns the median seconds to read the first page, and the page 99% of the way through with a cursor and with
+    OFFSET."""
+    query = select(medal_result)
+    deep = rows * 99 // 100
+    with engine.connect() as connection:
+        deep_cursor = encode_cursor(connection.execute(select(*KEY).order_by(*KEY).offset(deep).limit(1)).one())
+        return {
+            "first_s": median_time(lambda: keyset_page(connection, query, KEY, None, page), repeat),
+            "deep_cursor_s": median_time(lambda: keyset_page(connection, query, KEY, deep_cursor, page), repeat),
+            "deep_offset_s": median_time(
+                lambda: connection.execute(query.order_by(*KEY).offset(deep).limit(page)).all(), max(repeat // 5, 1)),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000], help="numbers of rows")
+    parser.add_argument("--events", type=int, default=5000, help="number of events the rows are spread over")
+    parser.add_argument("--page", type=int, default=100, help="rows in each page")
+    parser.add_argument("--repeat", type=int, default=15, help="runs of each read, the median time is reported")
+    parser.add_argument("--output", help="file to write the results to as JSON")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'rows':>10}{'first ms':>12}{'cursor ms':>12}{'offset ms':>12}{'offset/cursor':>15}")
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in args.rows:
+            path = Path(directory) / f"paralympics_{rows}.db"
+            add_medal_results(path, rows, args.events)
+            engine = create_engine(f"sqlite:///{path}")
+            result = {"rows": rows, **time_pages(engine, rows, args.page, args.repeat)}
+            engine.dispose()
+            results.append(result)
+            print(f"{rows:10}{result['first_s'] * 1000:12.3f}{result['deep_cursor_s'] * 1000:12.3f}"
+                  f"{result['deep_offset_s'] * 1000:12.3f}{result['deep_offset_s'] / result['deep_cursor_s']:14.0f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
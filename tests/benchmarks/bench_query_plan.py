@@ -0,0 +1,153 @@
+"""Query plan benchmark for the paralympics database created by student.placeholder.create_db.
+
+Builds the database in a temporary file, then for each query that the loaders and apps run it records the
+EXPLAIN QUERY PLAN output and the best time of several runs. This is repeated with the data scaled up (every
+event, host, country and medal result copied with new keys) to show which queries slow down as the data grows.
+
+A plan step that reads a whole table ("SCAN <table>" without an index) is reported as a full scan. Queries that
+aggregate every row are expected to scan, any other query that scans is listed at the end and makes the script
+exit with status 1, so it can be used as a check.
+
+Run from the repository root after `pip install -e .`:
+    python tests/benchmarks/bench_query_plan.py --scale 1 1000 --output query_plan.json
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from student.placeholder.create_db import create_db
+
+# (name, sql, parameters, expect_scan). The parameters are looked up in the scaled data by sample_parameters().
+QUERIES = [
+    ("event_by_year_type", "SELECT event_id FROM event WHERE year = ? AND type = ?", ("year", "type"), False),
+    ("event_by_year", "SELECT event_id FROM event WHERE year = ?", ("year",), False),
+    ("host_by_name", "SELECT host_id FROM host WHERE host = ?", ("host",), False),
+    ("country_by_name", "SELECT code FROM country WHERE name = ?", ("country",), False),
+    ("disability_by_category", "SELECT disability_id FROM disability WHERE category = ?", ("category",), False),
+    ("card_for_event", """SELECT * FROM event
+                          JOIN host_event ON event.event_id = host_event.event_id
+                          JOIN host ON host_event.host_id = host.host_id
+                          WHERE event.year = ? AND host.host = ?""", ("year", "host"), False),
+    ("medal_results_for_event", "SELECT * FROM medal_result WHERE event_id = ?", ("event_id",), False),
+    ("medal_result_by_event_country", "SELECT result_id FROM medal_result WHERE event_id = ? AND country_code = ?",
+     ("event_id", "country_code"), False),
+    ("line_chart", "SELECT * FROM event JOIN participants ON event.event_id = participants.event_id", (), True),
+    ("country_hist", """SELECT country.name AS host, COUNT(country.name) AS count FROM country
+                        JOIN host ON host.country_code = country.code
+                        JOIN host_event ON host.host_id = host_event.host_id
+                        GROUP BY country.name""", (), True),
+    ("summary_host_count", "SELECT country, count FROM summary_host_count", (), True),
+    ("summary_event_series", "SELECT * FROM summary_event_series", (), True),
+]
+
+
+def scale_up(connection, scale):
+    """Adds scale - 1 copies of the events, hosts, countries and medal results with new keys."""
+    if scale <= 1:
+        return
+    cursor = connection.cursor()
+    cursor.execute("CREATE TEMP TABLE copy (k INTEGER PRIMARY KEY)")
+    cursor.execute("WITH RECURSIVE k(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM k WHERE n < ?) "
+                   "INSERT INTO copy SELECT n FROM k", (scale - 1,))
+    offset = {table: cursor.execute(f"SELECT MAX({key}) FROM {table}").fetchone()[0]
+              for table, key in [("event", "event_id"), ("host", "host_id"), ("participants", "participant_id"),
+                                 ("medal_result", "result_id")]}
+    cursor.execute("""INSERT INTO country (code, name, region, sub_region, member_type, notes)
+                      SELECT code || '_' || k, name || ' ' || k, region, sub_region, member_type, notes
+                      FROM country, copy WHERE code NOT LIKE '%\\_%' ESCAPE '\\'""")
+    cursor.execute(f"""INSERT INTO event (event_id, type, year, start, end, countries, events, sports, highlights, url)
+                       SELECT event_id + k * {offset['event']}, type, year + k * 100, start, end, countries, events,
+                              sports, highlights, url
+                       FROM event, copy WHERE event_id <= {offset['event']}""")
+    cursor.execute(f"""INSERT INTO participants (participant_id, participants_m, participants_f, participants, event_id)
+                       SELECT participant_id + k * {offset['participants']}, participants_m, participants_f,
+                              participants, event_id + k * {offset['event']}
+                       FROM participants, copy WHERE participant_id <= {offset['participants']}""")
+    cursor.execute(f"""INSERT INTO host (host_id, country_code, host)
+                       SELECT host_id + k * {offset['host']}, country_code || '_' || k, host || ' ' || k
+                       FROM host, copy WHERE host_id <= {offset['host']}""")
+    cursor.execute(f"""INSERT INTO host_event (host_id, event_id)
+                       SELECT host_id + k * {offset['host']}, event_id + k * {offset['event']}
+                       FROM host_event, copy WHERE event_id <= {offset['event']}""")
+    cursor.execute(f"""INSERT INTO medal_result (result_id, event_id, country_code, rank, gold, silver, bronze, total)
+                       SELECT result_id + k * {offset['medal_result']}, event_id + k * {offset['event']},
+                              country_code || '_' || k, rank, gold, silver, bronze, total
+                       FROM medal_result, copy WHERE result_id <= {offset['medal_result']}""")
+    connection.commit()
+    cursor.execute("ANALYZE")
+
+
+def sample_parameters(connection):
+    """Values from the last rows added, so a lookup cannot stop early at the start of a table."""
+    year, event_type, event_id = connection.execute(
+        "SELECT year, type, event_id FROM event ORDER BY event_id DESC LIMIT 1").fetchone()
+    host = connection.execute("SELECT host FROM host ORDER BY host_id DESC LIMIT 1").fetchone()[0]
+    country, code = connection.execute("SELECT name, code FROM country ORDER BY rowid DESC LIMIT 1").fetchone()
+    category = connection.execute("SELECT category FROM disability ORDER BY disability_id DESC").fetchone()[0]
+    country_code = connection.execute("SELECT country_code FROM medal_result WHERE event_id = ?",
+                                      (event_id,)).fetchone()
+    return {"year": year, "type": event_type, "event_id": event_id, "host": host, "country": country,
+            "category": category, "country_code": country_code[0] if country_code else code}
+
+
+def full_scans(plan):
+    """Returns the plan steps that read a whole table without using an index."""
+    return [detail for detail in plan
+            if detail.startswith("SCAN") and "INDEX" not in detail and "CONSTANT ROW" not in detail]
+
+
+def run_queries(connection, repeat):
+    values = sample_parameters(connection)
+    results = {}
+    for name, sql, parameter_names, expect_scan in QUERIES:
+        parameters = [values[p] for p in parameter_names]
+        plan = [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)]
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = connection.execute(sql, parameters).fetchall()
+            timings.append(time.perf_counter() - start)
+        results[name] = {"ms": min(timings) * 1000, "rows": len(rows), "plan": plan,
+                         "full_scans": full_scans(plan), "expect_scan": expect_scan}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 1000], help="data scale factors to run")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each query, the best time is reported")
+    parser.add_argument("--output", help="file to write the results to as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scale:
+            connection = sqlite3.connect(Path(tmp) / f"paralympics_{scale}.db")
+            create_db(connection.cursor(), connection)
+            scale_up(connection, scale)
+            results[scale] = run_queries(connection, args.repeat)
+            connection.close()
+
+    names = [query[0] for query in QUERIES]
+    print(f"{'query':32}" + "".join(f"{f'{scale}x ms':>14}" for scale in args.scale) + "  plan")
+    for name in names:
+        times = "".join(f"{results[scale][name]['ms']:14.3f}" for scale in args.scale)
+        print(f"{name:32}{times}  {' | '.join(results[args.scale[-1]][name]['plan'])}")
+
+    unexpected = sorted({name for scale in args.scale for name in names
+                         if results[scale][name]["full_scans"] and not results[scale][name]["expect_scan"]})
+    if unexpected:
+        print("\nUnexpected full table scans: " + ", ".join(unexpected))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if unexpected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
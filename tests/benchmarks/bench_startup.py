@@ -0,0 +1,56 @@
+"""Startup benchmark for the Dash app in student.dash_single.paralympics_dash.
+
+Each run starts a new Python process so the import is cold. It records:
+- import: time to import the module (what a worker or `import_app` pays before it can serve)
+- first_layout: time from the start of the import until the first /_dash-layout response (ready to serve a page)
+- second_layout: time for the next /_dash-layout response, which uses the cached figures
+
+Run from the repository root after `pip install -e .`:
+    python tests/benchmarks/bench_startup.py --repeat 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+from student.dash_single import paralympics_dash
+imported = time.perf_counter()
+client = paralympics_dash.app.server.test_client()
+assert client.get('/_dash-layout').status_code == 200
+first = time.perf_counter()
+assert client.get('/_dash-layout').status_code == 200
+second = time.perf_counter()
+print(json.dumps({'import': imported - start, 'first_layout': first - start, 'second_layout': second - first}))
+"""
+
+
+def run_once(warm_up):
+    env = dict(os.environ, PARALYMPICS_WARM_UP="1" if warm_up else "0")
+    result = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="number of cold starts for each mode")
+    parser.add_argument("--output", help="file to write the results to as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for mode, warm_up in [("lazy", False), ("warm_up", True)]:
+        runs = [run_once(warm_up) for _ in range(args.repeat)]
+        results[mode] = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        print(f"{mode:8} " + "  ".join(f"{key}={value * 1000:.0f}ms" for key, value in results[mode].items()))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Synthetic paralympics data at a multiple of the size of the bundled workbook, for the loader benchmarks.
+
+make_sheets(scale) returns the events, medal_standings and npc_codes sheets with `scale` copies of every row. Copy 0
+is the bundled data unchanged. In copy k every name has " k" added (hosts, countries, teams, locations and disability
+categories), the NPC codes have "_k" added and the years have 1000 * k added. The copies therefore keep the keys of
+each table unique and every reference valid: each host's country is in npc_codes, each medal result's NPC code is a
+country and its year and location match an event.
+
+Run from the repository root to write the sheets to files, e.g. to load them with another tool:
+    python tests/benchmarks/synthetic.py --scale 10 --output synthetic_10x
+"""
+import argparse
+from importlib import resources
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SHEETS = ['events', 'medal_standings', 'npc_codes']
+SCALES = [1, 10, 100, 10000]
+
+# Columns that have a list of names and the separator used in the workbook
+LIST_COLUMNS = {'host': ', ', 'country': ', ', 'disabilities': ', '}
+
+
+def read_bundled_sheets():
+    """Returns the sheets of the bundled paralympics.xlsx."""
+    return pd.read_excel(resources.files("student.data").joinpath("paralympics.xlsx"), sheet_name=SHEETS)
+
+
+def repeat(df, scale):
+    """Returns the dataframe repeated scale times, and the copy number of each row."""
+    positions = np.tile(np.arange(len(df)), scale)
+    copy = np.repeat(np.arange(scale), len(df))
+    return df.iloc[positions].reset_index(drop=True), copy
+
+
+def add_suffix(values, copy, separator=None, text=' '):
+    """Adds text and the copy number to each value, except in copy 0. A list column has the suffix added to each
+    name in the list, the names are split on ',' as the loaders do."""
+    suffix = pd.Series(np.where(copy == 0, '', np.char.add(text, copy.astype(str))), index=values.index)
+    if separator is None:
+        return values + suffix
+    names = values.str.split(',').explode().str.strip()
+    names = names + suffix.loc[names.index]
+    return names.groupby(level=0).agg(separator.join).reindex(values.index)
+
+
+def make_sheets(scale, sheets=None):
+    """Returns a dict of sheet name to dataframe with scale copies of the bundled data, see the module docstring.
+
+    Parameters
+    ----------
+    scale: number of copies of each row, 1 returns the bundled data
+    sheets: the sheets to copy, the default is the sheets of the bundled workbook
+    """
+    if sheets is None:
+        sheets = read_bundled_sheets()
+
+    events, copy = repeat(sheets['events'], scale)
+    for column, separator in LIST_COLUMNS.items():
+        events[column] = add_suffix(events[column], copy, separator)
+    events['year'] = events['year'] + 1000 * copy
+    events['url'] = add_suffix(events['url'], copy, text='-')
+
+    medals, copy = repeat(sheets['medal_standings'], scale)
+    for column in ['Location', 'Team']:
+        medals[column] = add_suffix(medals[column], copy)
+    medals['NPC'] = add_suffix(medals['NPC'], copy, text='_')
+    medals['Year'] = medals['Year'] + 1000 * copy
+
+    countries, copy = repeat(sheets['npc_codes'], scale)
+    countries['name'] = add_suffix(countries['name'], copy)
+    countries['code'] = add_suffix(countries['code'], copy, text='_')
+
+    return {'events': events, 'medal_standings': medals, 'npc_codes': countries}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=10, help=f"number of copies of the data e.g. {SCALES}")
+    parser.add_argument("--output", required=True, help="directory to write one CSV file per sheet to")
+    args = parser.parse_args()
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    for name, df in make_sheets(args.scale).items():
+        df.to_csv(output / f"{name}.csv", index=False)
+        print(f"{name}: {len(df)} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import sqlite3
+
+import pandas as pd
+import plotly.express as px
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from student.placeholder.chart_data import CHART_DTYPES, chart_frame
+from student.placeholder.create_db import create_db
+from student.placeholder.data_version import DataVersion
+
+
+def create_app(path, with_version=True):
+    """Creates an app with a Flask-SQLAlchemy db of the database at path, and a DataVersion if with_version."""
+    db = SQLAlchemy()
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    db.init_app(app)
+    if with_version:
+        DataVersion(app, db)
+    return app, db
+
+
+@pytest.fixture
+def chart_db(tmp_path):
+    """Path of a paralympics database created with create_db."""
+    path = tmp_path / "paralympics.db"
+    connection = sqlite3.connect(path)
+    create_db(connection.cursor(), connection)
+    connection.close()
+    return path
+
+
+def test_chart_frame_matches_query(chart_db):
+    """
+    GIVEN the paralympics database
+    WHEN the chart data is read, and each feature is plotted from it and from the query of every event and participants
+         column
+    THEN the columns should have the chart types, the values should be those of the query, and the traces of the line
+         charts should be the same
+    """
+    app, db = create_app(chart_db)
+    with app.app_context():
+        df = chart_frame(db)
+    connection = sqlite3.connect(chart_db)
+    query_df = pd.read_sql_query("SELECT event.*, participants.participants, participants.participants_m, "
+                                 "participants.participants_f FROM event JOIN participants USING (event_id)",
+                                 connection)
+    connection.close()
+
+    assert df.dtypes.astype(str).to_dict() == CHART_DTYPES
+    assert list(df["type"].cat.categories) == ["summer", "winter"]
+    query_df = query_df.sort_values(["year", "type"], ignore_index=True)
+    assert len(df) == len(query_df)
+    for name in CHART_DTYPES:
+        assert df[name].astype(object).where(df[name].notna(), None).tolist() == \
+               query_df[name].astype(object).where(query_df[name].notna(), None).tolist()
+
+    for feature in ["sports", "participants", "events", "countries"]:
+        traces = px.line(df, x="year", y=feature, color="type").data
+        query_traces = px.line(query_df, x="year", y=feature, color="type").data
+        assert [trace.name for trace in traces] == [trace.name for trace in query_traces]
+        for trace, query_trace in zip(traces, query_traces):
+            assert list(trace.x) == list(query_trace.x)
+            assert pd.Series(trace.y, dtype="float").equals(pd.Series(query_trace.y, dtype="float"))
+
+
+def test_chart_frame_read_once_for_each_version(chart_db):
+    """
+    GIVEN an app with a DataVersion
+    WHEN the chart data is requested twice, after a change to another table, and after a change to the participants
+         table
+    THEN it should be read once and kept for the other table, read again for the participants table, and each call
+         should get a copy with the columns asked for
+    """
+    app, db = create_app(chart_db)
+    data_version = app.extensions["data_version"]
+    with app.app_context():
+        first = chart_frame(db, ["year", "type", "sports"])
+        cached = app.extensions["chart_data"]
+        assert list(first.columns) == ["year", "type", "sports"]
+        first["sports"] = 0
+        assert chart_frame(db)["sports"].max() > 0
+        assert app.extensions["chart_data"] is cached
+
+        data_version.bump(["medal_result"])
+        chart_frame(db)
+        assert app.extensions["chart_data"] is cached
+
+        data_version.bump(["participants"])
+        chart_frame(db)
+        assert app.extensions["chart_data"] is not cached
+        assert app.extensions["chart_data"][1].equals(cached[1])
+
+
+def test_chart_frame_without_data_version(chart_db):
+    """
+    GIVEN an app without a DataVersion
+    WHEN the chart data is requested
+    THEN it should be read on each call and not kept
+    """
+    app, db = create_app(chart_db, with_version=False)
+    with app.app_context():
+        assert chart_frame(db).equals(chart_frame(db))
+    assert "chart_data" not in app.extensions
+
+
+def test_chart_frame_empty_and_other_types(tmp_path):
+    """
+    GIVEN a paralympics database with no data, then with one event of a type that is not summer or winter
+    WHEN the chart data is read
+    THEN the empty DataFrame should have every column with its chart type, and the other type should be kept as a
+         category rather than made NaN
+    """
+    path = tmp_path / "paralympics.db"
+    connection = sqlite3.connect(path)
+    create_db(connection.cursor(), connection, with_data=False)
+    app, db = create_app(path, with_version=False)
+    with app.app_context():
+        empty = chart_frame(db)
+    assert empty.empty
+    assert empty.dtypes.astype(str).to_dict() == CHART_DTYPES
+
+    connection.execute("INSERT INTO event (event_id, type, year) VALUES (1, 'youth', 2026)")
+    connection.execute("INSERT INTO participants (event_id) VALUES (1)")
+    connection.commit()
+    connection.close()
+    with app.app_context():
+        df = chart_frame(db)
+    assert df["type"].tolist() == ["youth"]
+    assert df["events"].isna().all()
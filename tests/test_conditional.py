@@ -0,0 +1,132 @@
+import threading
+
+from flask import Blueprint, Flask, jsonify
+
+import student.flask_paralympics.conditional as conditional_module
+from student.flask_paralympics.conditional import conditional
+from student.placeholder.data_version import DataVersion
+
+
+def create_app():
+    """Creates an app with a DataVersion and a blueprint of two conditional routes that count the times they run."""
+    app = Flask(__name__)
+    app.extensions['data_version'] = DataVersion()
+    app.calls = 0
+    app.events = ['Rome']
+    views = Blueprint('views', __name__)
+
+    @views.get('/events')
+    @conditional('event')
+    def events():
+        app.calls += 1
+        return jsonify(events=app.events)
+
+    @views.get('/missing')
+    @conditional('event')
+    def missing():
+        app.calls += 1
+        return jsonify(error='not found'), 404
+
+    app.register_blueprint(views)
+    return app
+
+
+def test_if_none_match_returns_not_modified():
+    """
+    GIVEN an app with a route that reads the event table
+    WHEN the route is requested, then requested again with its ETag, with a different ETag, and after a change to
+         another table
+    THEN the response should have an ETag, Last-Modified and Cache-Control: no-cache, a request with its ETag should get
+         a 304 without the view being run, and a different ETag should get the full response
+    """
+    app = create_app()
+    client = app.test_client()
+    first = client.get('/events')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'no-cache'
+    assert 'Last-Modified' in first.headers
+
+    second = client.get('/events', headers={'If-None-Match': etag})
+    assert second.status_code == 304 and second.data == b''
+    assert second.headers['ETag'] == etag
+    assert app.calls == 1
+
+    assert client.get('/events', headers={'If-None-Match': '"other"'}).status_code == 200
+    assert app.calls == 2
+    app.extensions['data_version'].bump(['medal_result'])
+    assert client.get('/events', headers={'If-None-Match': etag}).status_code == 304
+    assert app.calls == 2
+
+
+def test_if_modified_since():
+    """
+    GIVEN an app with a route that reads the event table, which has been requested once
+    WHEN it is requested with its Last-Modified time as If-Modified-Since, with an earlier time, and with both
+         If-None-Match and If-Modified-Since
+    THEN the Last-Modified time should get a 304, the earlier time the full response, and If-Modified-Since should not
+         be used when there is an If-None-Match
+    """
+    app = create_app()
+    client = app.test_client()
+    first = client.get('/events')
+    last_modified = first.headers['Last-Modified']
+    assert client.get('/events', headers={'If-Modified-Since': last_modified}).status_code == 304
+    assert client.get('/events', headers={'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'}).status_code == 200
+    assert client.get('/events', headers={'If-None-Match': '"other"',
+                                          'If-Modified-Since': last_modified}).status_code == 200
+
+
+def test_table_change_makes_etag_stale():
+    """
+    GIVEN an app with a route that reads the event table, which has been requested once
+    WHEN the event table changes and the route is requested with the saved ETag, for a response that is the same and
+         for one that has changed
+    THEN the view should be run again each time, a 304 should be returned if the new response has the same ETag, and
+         the full response with a new ETag and a later Last-Modified if it does not
+    """
+    app = create_app()
+    client = app.test_client()
+    data_version = app.extensions['data_version']
+    first = client.get('/events')
+    etag = first.headers['ETag']
+
+    data_version.bump(['event'])
+    assert client.get('/events', headers={'If-None-Match': etag}).status_code == 304
+    assert app.calls == 2
+
+    app.events.append('Tokyo')
+    data_version.bump(['event'])
+    changed = client.get('/events', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and app.calls == 3
+    assert changed.json == {'events': ['Rome', 'Tokyo']}
+    assert changed.headers['ETag'] != etag
+    assert changed.last_modified >= first.last_modified
+
+
+def test_error_response_and_saved_etags(monkeypatch):
+    """
+    GIVEN an app with a route that returns a 404, and a limit of 3 saved ETags
+    WHEN the 404 route and 5 different query strings are requested from several threads at once
+    THEN the 404 should not have an ETag, at most 3 ETags should be saved, the most recent, and no request should fail
+    """
+    app = create_app()
+    client = app.test_client()
+    response = client.get('/missing')
+    assert response.status_code == 404 and 'ETag' not in response.headers
+
+    monkeypatch.setattr(conditional_module, 'MAX_ETAGS', 3)
+    statuses = []
+
+    def request_all():
+        for year in range(5):
+            statuses.append(app.test_client().get(f'/events?year={year}').status_code)
+
+    threads = [threading.Thread(target=request_all) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    client.get('/events?year=4')
+    assert statuses == [200] * 40
+    assert list(app.extensions['conditional_etags'])[-1] == '/events?year=4'
+    assert len(app.extensions['conditional_etags']) == 3
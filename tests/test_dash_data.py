@@ -0,0 +1,220 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+from dash import Dash
+
+from student.dash_single.data_store import DataStore
+from student.dash_single.db_pool import ConnectionPool, db_pool
+from student.dash_single.event_index import EventCardIndex
+from student.dash_single.figure_cache import FigureCache
+from student.dash_single.figures import bar_gender, gender_ratios, line_chart, scatter_geo
+
+
+def test_store_reads_file_once():
+    """
+    GIVEN a data store for paralympics.csv
+    WHEN the data is requested several times
+    THEN the file should only be parsed once
+    """
+    store = DataStore("student.data", "paralympics.csv")
+    for _ in range(5):
+        store.get(["year", "type"])
+    assert store.loads == 1
+
+
+def test_store_view_is_read_only():
+    """
+    GIVEN a data store for paralympics.csv
+    WHEN a view is changed by adding a column and sorting it
+    THEN the next view from the store should be unchanged
+    """
+    store = DataStore("student.data", "paralympics.csv")
+    view = store.get()
+    view["new_column"] = 1
+    view.sort_values("year", ascending=False, inplace=True)
+    assert "new_column" not in store.get().columns
+    assert store.get()["year"].iloc[0] == 1960
+
+
+def test_store_reloads_when_file_changes(tmp_path):
+    """
+    GIVEN a data store for a csv file
+    WHEN the file is touched without changing the content, and then the content is changed
+    THEN the data should only be reloaded when the content changes and the version should change
+    """
+    csv = tmp_path / "events.csv"
+    csv.write_text("year,events\n1960,57\n")
+    store = DataStore("student.data", "paralympics.csv")
+    store.path = csv
+    version = store.version
+
+    stat = csv.stat()
+    os.utime(csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert store.version == version
+    assert store.loads == 1
+
+    csv.write_text("year,events\n1960,57\n1964,144\n")
+    os.utime(csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000))
+    assert store.version != version
+    assert len(store.get()) == 2
+    assert store.loads == 2
+
+
+def test_figures_use_store():
+    """
+    GIVEN the figure functions that use paralympics.csv
+    WHEN the line chart and bar chart are created
+    THEN the figures should have data for both the summer and winter events
+    """
+    fig = line_chart("sports")
+    assert {trace["name"] for trace in fig["data"]} == {"summer", "winter"}
+    fig = bar_gender("winter")
+    assert len(fig["data"]) == 2
+
+
+def test_figure_cache_hits_and_version():
+    """
+    GIVEN a figure cache around a figure function
+    WHEN the figure is requested twice, and then again after the data version changes
+    THEN the figure should be built once per version and the hits and misses counted
+    """
+    cache = FigureCache()
+    calls = []
+    version = ["v1"]
+
+    @cache.memoize(version=lambda: version[0])
+    def chart(feature):
+        calls.append(feature)
+        return line_chart.__wrapped__(feature)
+
+    first = chart("events")
+    second = chart("events")
+    assert first == second
+    assert first is not second
+    assert calls == ["events"]
+    version[0] = "v2"
+    chart("events")
+    assert calls == ["events", "events"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+
+
+def test_figure_cache_lru_eviction():
+    """
+    GIVEN a figure cache with space for two entries
+    WHEN three entries are added after the first has been used again
+    THEN the least recently used entry should be evicted
+    """
+    cache = FigureCache(max_entries=2)
+    cache.put("a", "1", 1)
+    cache.put("b", "2", 1)
+    cache.get("a")
+    cache.put("c", "3", 1)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, "1")
+    assert cache.stats()["evictions"] == 1
+
+    cache = FigureCache(max_bytes=10)
+    cache.put("a", "x" * 6, 6)
+    cache.put("b", "y" * 6, 6)
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == 6
+
+
+def test_pool_is_read_only():
+    """
+    GIVEN a connection pool for paralympics.db
+    WHEN a connection is used to change the data
+    THEN the change should be rejected
+    """
+    pool = ConnectionPool(db_pool.path, max_size=1)
+    with pool.connection() as connection:
+        with pytest.raises(sqlite3.OperationalError):
+            connection.execute("DELETE FROM host")
+    pool.close()
+
+
+def test_pool_concurrent_stress():
+    """
+    GIVEN a connection pool with at most 4 connections
+    WHEN 32 threads each run 50 queries, with nested use of the pool in the same thread
+    THEN every query should succeed and no more than 4 connections should be opened
+    """
+    pool = ConnectionPool(db_pool.path, max_size=4)
+    errors = []
+    results = []
+    start = threading.Barrier(32)
+
+    def worker():
+        start.wait()
+        try:
+            for _ in range(50):
+                with pool.connection() as outer:
+                    with pool.connection() as inner:
+                        assert inner is outer
+                    count = outer.execute("SELECT COUNT(*) FROM event").fetchone()[0]
+                results.append(count)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(32)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = pool.stats()
+    pool.close()
+    assert errors == []
+    assert len(results) == 32 * 50
+    assert len(set(results)) == 1
+    assert stats["created"] <= 4
+    assert stats["peak_in_use"] <= 4
+    assert stats["in_use"] == 0
+    assert stats["created"] + stats["reused"] == 32 * 50
+
+
+def test_event_index_card_lookup():
+    """
+    GIVEN an event card index for paralympics.db
+    WHEN cards are requested for every marker key in the map customdata
+    THEN each card should have the event name and the index should only be built once
+    """
+    index = EventCardIndex(ConnectionPool(db_pool.path, max_size=1))
+    app = Dash(__name__)
+    keys = [point[0] for point in scatter_geo()["data"][0]["customdata"]]
+    for key in keys:
+        card = index.card(key, app)
+        assert card.children.children[1].children == index.fields(key)["name"]
+    assert index.card("2020_Tokyo", app) is index.card("2020_Tokyo", app)
+    assert index.fields("2020_Tokyo")["name"] == "Tokyo 2020"
+    assert index.builds == 1
+    with pytest.raises(KeyError):
+        index.fields("1900_Nowhere")
+
+
+def test_gender_ratios_calculated_once():
+    """
+    GIVEN a data store for paralympics.csv
+    WHEN the gender ratios are needed for the summer and the winter bar charts
+    THEN the ratios should be calculated once, for both types, and recalculated only when the data is reloaded
+    """
+    store = DataStore("student.data", "paralympics.csv")
+    calls = []
+
+    def ratios(df):
+        calls.append(len(df))
+        return gender_ratios(df)
+
+    summer = store.derived(ratios)["summer"]
+    winter = store.derived(ratios)["winter"]
+    assert len(calls) == 1
+    assert set(summer["type"]) == {"summer"} and set(winter["type"]) == {"winter"}
+    assert summer["year"].is_monotonic_increasing
+    assert ((summer["Male"] + summer["Female"]).round(6) == 1).all()
+    store._stat = None
+    store._hash = None
+    store.derived(ratios)
+    assert len(calls) == 2
@@ -0,0 +1,92 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import column, create_engine, select, table
+
+from student.placeholder.add_data_sql3 import load_pragmas
+from student.placeholder.create_db import create_db
+from student.placeholder.pagination import decode_cursor, encode_cursor, keyset_page, page_size
+
+medal_result = table("medal_result", column("result_id"), column("event_id"), column("country_code"), column("total"))
+KEY = [medal_result.c.event_id, medal_result.c.result_id]
+
+
+def add_medal_results(path, rows, events):
+    """Creates the paralympics tables and adds rows medal results spread over the events, the result_id is not in
+    event_id order so the pages have to use both key columns."""
+    connection = sqlite3.connect(path)
+    create_db(connection.cursor(), connection, with_data=False)
+    with load_pragmas(connection, cache_size=-512000):
+        connection.execute("""WITH RECURSIVE k(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM k WHERE n < ?)
+                              INSERT INTO medal_result (result_id, event_id, country_code, total)
+                              SELECT n, (n * 7919) % ? + 1, 'C' || (n % 200), n % 50 FROM k""", (rows, events))
+    connection.close()
+
+
+def test_cursor_round_trip():
+    """
+    GIVEN the key of a row
+    WHEN it is encoded as a cursor and decoded
+    THEN the key should be returned, and a cursor that is not valid or is for a different key should raise ValueError
+    """
+    cursor = encode_cursor((12, 34567))
+    assert decode_cursor(cursor, 2) == (12, 34567)
+    assert "=" not in cursor
+    for invalid in ["", "not a cursor", encode_cursor([1]), encode_cursor(["a", None])]:
+        with pytest.raises(ValueError):
+            decode_cursor(invalid, 2)
+    assert page_size(None) == 100
+    assert page_size(0) == 1
+    assert page_size(100000) == 1000
+
+
+def test_pages_have_every_row_once(tmp_path):
+    """
+    GIVEN a medal_result table with 2,000 rows
+    WHEN every page is read with the cursor from the previous page, and rows are added before the current position
+         while the pages are read
+    THEN each row that was there at the start should be read once, in (event_id, result_id) order, and each page
+         apart from the last should be full
+    """
+    add_medal_results(tmp_path / "paralympics.db", 2000, 50)
+    engine = create_engine(f"sqlite:///{tmp_path / 'paralympics.db'}")
+    with engine.connect() as connection:
+        expected = connection.execute(select(*KEY).order_by(*KEY)).all()
+        keys, sizes, cursor = [], [], None
+        while True:
+            page = keyset_page(connection, select(medal_result), KEY, cursor, limit=97)
+            keys.extend((row.event_id, row.result_id) for row in page.items)
+            sizes.append(len(page.items))
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+            # A new row in the first event comes before the cursor, so it should not move the later rows
+            connection.execute(medal_result.insert().values(event_id=1, country_code="NEW", total=0))
+    engine.dispose()
+    assert keys == [tuple(row) for row in expected]
+    assert set(sizes[:-1]) == {97}
+
+
+def test_deep_page_uses_the_index(tmp_path):
+    """
+    GIVEN a medal_result table with 20,000 rows
+    WHEN a page 19,800 rows in is read with a cursor
+    THEN it should have the rows after the cursor in key order, and the query should use the (event_id, result_id) index
+
+    The time of deep pages against OFFSET is measured in tests/benchmarks/bench_pagination.py.
+    """
+    add_medal_results(tmp_path / "paralympics.db", 20_000, 500)
+    engine = create_engine(f"sqlite:///{tmp_path / 'paralympics.db'}")
+    query = select(medal_result)
+    with engine.connect() as connection:
+        deep_key = connection.execute(select(*KEY).order_by(*KEY).offset(19_800).limit(1)).one()
+        plan = connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM medal_result WHERE (event_id, result_id) > (?, ?) "
+            "ORDER BY event_id, result_id LIMIT 101", tuple(deep_key)).all()
+        page = keyset_page(connection, query, KEY, encode_cursor(deep_key), 100)
+        expected = connection.execute(query.order_by(*KEY).offset(19_801).limit(100)).all()
+    engine.dispose()
+
+    assert page.items == expected
+    assert page.next_cursor == encode_cursor((expected[-1].event_id, expected[-1].result_id))
+    assert "USING INDEX idx_medal_result_event_result" in plan[0][3]
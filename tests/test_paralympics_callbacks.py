@@ -0,0 +1,136 @@
+from collections import Counter
+
+import pytest
+
+from student.dash_single import paralympics_dash
+from student.dash_single.figures import line_chart_store
+
+
+def interact(app, values, trigger):
+    """Runs the server callbacks that Dash would run when the input `trigger` changes, e.g. "map.hoverData".
+
+    `values` holds the current value of each input, keyed in the same "id.property" format. Clientside callbacks
+    have no Python function and run in the browser, so they are skipped.
+    """
+    for entry in app.callback_map.values():
+        inputs = [f"{i['id']}.{i['property']}" for i in entry["inputs"]]
+        if trigger in inputs and "callback" in entry:
+            entry["callback"].__wrapped__(*[values[i] for i in inputs])
+
+
+@pytest.fixture
+def builder_calls(monkeypatch):
+    """Replaces the figure functions used by the callbacks with versions that count how often they are called."""
+    calls = Counter()
+    for name in ["line_chart", "line_chart_store", "bar_gender", "scatter_geo", "country_hist", "para_card"]:
+        builder = getattr(paralympics_dash, name)
+
+        def counted(*args, _name=name, _builder=builder, **kwargs):
+            calls[_name] += 1
+            return _builder(*args, **kwargs)
+
+        monkeypatch.setattr(paralympics_dash, name, counted)
+    return calls
+
+
+@pytest.fixture
+def values():
+    return {
+        "dropdown-input.value": "events",
+        "checklist-input.value": ["summer"],
+        "map.hoverData": None,
+    }
+
+
+def test_hover_only_updates_card(builder_calls, values):
+    """
+    GIVEN the app is loaded
+    WHEN the mouse hovers over three different markers on the map
+    THEN only the card should be created, once per hover, and the line chart should not be recreated
+    """
+    for key in ["2020_Tokyo", "2012_London", "2002_Salt Lake City"]:
+        values["map.hoverData"] = {"points": [{"customdata": [key]}]}
+        interact(paralympics_dash.app, values, "map.hoverData")
+    assert builder_calls == Counter({"para_card": 3})
+
+
+def test_hover_without_event_shows_no_card(values):
+    """
+    GIVEN the app is loaded
+    WHEN the mouse hovers over a point with no customdata, or a marker for an event that is not in the index
+    THEN the callback should return no card rather than raise an error
+    """
+    for hover_data in [{"points": [{}]}, {"points": [{"customdata": []}]}, {"points": []},
+                       {"points": [{"customdata": ["1900_Nowhere"]}]}]:
+        assert paralympics_dash.update_card(hover_data) is None
+
+
+def test_dropdown_does_not_call_server(builder_calls, values):
+    """
+    GIVEN the app is loaded with the clientside line chart and the mouse has hovered over a marker on the map
+    WHEN the dropdown value is changed
+    THEN no figure should be created on the server
+    """
+    assert paralympics_dash.CLIENTSIDE_LINE_CHART
+    values["map.hoverData"] = {"points": [{"customdata": ["2020_Tokyo"]}]}
+    values["dropdown-input.value"] = "sports"
+    interact(paralympics_dash.app, values, "dropdown-input.value")
+    assert builder_calls == Counter()
+
+
+def test_line_chart_store_matches_server_chart(builder_calls):
+    """
+    GIVEN the data in the line chart store
+    WHEN the figure for each feature is put together in the same way as assets/line_chart.js
+    THEN it should be the same as the figure created by the server side fallback callback
+    """
+    store = line_chart_store()
+    for feature in ["events", "sports", "countries", "participants"]:
+        layout = dict(store["layout"], title={"text": store["title"][feature]})
+        fig = paralympics_dash.update_line_chart(feature)
+        assert fig == {"data": store["data"][feature], "layout": layout}
+    assert builder_calls == Counter({"line_chart": 4})
+
+
+def test_checklist_only_updates_bar_charts(builder_calls, values):
+    """
+    GIVEN the app is loaded
+    WHEN both summer and winter are selected in the checklist
+    THEN only the bar charts should be created
+    """
+    values["checklist-input.value"] = ["summer", "winter"]
+    interact(paralympics_dash.app, values, "checklist-input.value")
+    assert builder_calls == Counter({"bar_gender": 2})
+
+
+def test_validation_layout_has_no_figures(builder_calls):
+    """
+    GIVEN the layout function for the app
+    WHEN the placeholder layout that Dash checks the callbacks against is created
+    THEN no figures should be created
+    """
+    paralympics_dash.serve_layout(placeholders=True)
+    assert builder_calls == Counter()
+
+
+def test_warm_up_creates_figures(builder_calls):
+    """
+    GIVEN the app has been imported
+    WHEN the background warm up is run
+    THEN the map, histogram, line charts, both bar charts and the cards should be created
+    """
+    paralympics_dash.start_warm_up().join()
+    assert builder_calls == Counter(
+        {"line_chart_store": 1, "bar_gender": 2, "scatter_geo": 1, "country_hist": 1, "para_card": 1})
+
+
+def test_warm_up_without_events(builder_calls, monkeypatch):
+    """
+    GIVEN an event index with no events
+    WHEN the warm up is run
+    THEN the figures should be created without a card, and no error raised
+    """
+    monkeypatch.setattr(paralympics_dash.event_index, "keys", lambda: [])
+    paralympics_dash.warm_up()
+    assert builder_calls["para_card"] == 0
+    assert builder_calls["bar_gender"] == 2
@@ -0,0 +1,425 @@
+import json
+import shutil
+import sqlite3
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from graphlib import CycleError
+from importlib import resources
+
+import pandas as pd
+import pyarrow
+import pytest
+
+from student.placeholder.add_data_sql3 import add_medal_result_chunks
+from student.placeholder.create_db import create_db
+from student.placeholder.ingest import ingest_all_data
+from student.placeholder.prepare import host_country_pairs
+from student.placeholder.query_profiler import QueryProfiler, aggregate, read_stats
+from student.placeholder.scheduler import LoadStep, run_load_plan
+from student.placeholder.snapshot import iter_chunks, read_sheets
+from student.placeholder.summary_tables import SUMMARY_TABLES, refresh_summary_tables
+
+
+@pytest.fixture
+def dash_db(tmp_path):
+    """Copy of the Dash app database without the summary tables."""
+    path = tmp_path / "paralympics.db"
+    shutil.copy(resources.files("student.data").joinpath("paralympics.db"), path)
+    connection = sqlite3.connect(path)
+    for table in SUMMARY_TABLES:
+        connection.execute(f"DROP TABLE IF EXISTS {table}")
+    yield connection
+    connection.close()
+
+
+def test_summary_tables_match_joins(dash_db):
+    """
+    GIVEN the Dash app database without summary tables
+    WHEN the summary tables are refreshed twice
+    THEN the summary tables should have the same rows as the joins that they replace
+    """
+    refresh_summary_tables(dash_db.cursor(), dash_db)
+    refresh_summary_tables(dash_db.cursor(), dash_db)
+
+    host_count = dash_db.execute('''SELECT country.name, COUNT(country.name) FROM country
+                                    JOIN host ON host.country_code = country.code
+                                    JOIN host_event ON host.host_id = host_event.host_id
+                                    GROUP BY country.name''').fetchall()
+    assert dash_db.execute("SELECT country, count FROM summary_host_count ORDER BY country").fetchall() == host_count
+
+    locations = dash_db.execute('''SELECT event.year, host.host, CAST(host.latitude AS REAL) FROM event
+                                   JOIN host_event ON event.event_id = host_event.event_id
+                                   JOIN host on host_event.host_id = host.host_id''').fetchall()
+    summary = dash_db.execute("SELECT year, host, latitude FROM summary_event_location").fetchall()
+    assert sorted(summary) == sorted(locations)
+
+    events = dash_db.execute("SELECT event_id, year, participants FROM event ORDER BY event_id").fetchall()
+    summary = dash_db.execute("SELECT event_id, year, participants FROM summary_event_series").fetchall()
+    assert summary == events
+
+
+def read_tables(connection):
+    """Returns the rows of the data tables, with the disability category in place of the generated disability_id."""
+    tables = {}
+    for table in ["country", "event", "participants", "host", "host_event", "medal_result"] + SUMMARY_TABLES:
+        tables[table] = connection.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall()
+    tables["disability_event"] = connection.execute('''SELECT category, event_id FROM disability_event
+                                                       JOIN disability USING (disability_id)
+                                                       ORDER BY 1, 2''').fetchall()
+    return tables
+
+
+def test_bulk_load_matches_per_table_load(tmp_path):
+    """
+    GIVEN a database created with the data added one table at a time, a database created with the bulk load, and one
+          created with the bulk load and the tables prepared in a thread pool
+    WHEN the rows in each table are compared
+    THEN the tables should be the same, and the bulk load should have restored the journal mode and sync settings
+    """
+    per_table = sqlite3.connect(tmp_path / "per_table.db")
+    create_db(per_table.cursor(), per_table, bulk=False)
+
+    bulk = sqlite3.connect(tmp_path / "bulk.db")
+    settings = [bulk.execute(f"PRAGMA {name}").fetchone()[0] for name in ["journal_mode", "synchronous", "cache_size"]]
+    create_db(bulk.cursor(), bulk, bulk=True)
+
+    assert read_tables(bulk) == read_tables(per_table)
+    assert len(read_tables(bulk)["medal_result"]) == 817
+    assert [bulk.execute(f"PRAGMA {name}").fetchone()[0]
+            for name in ["journal_mode", "synchronous", "cache_size"]] == settings
+
+    threads = sqlite3.connect(tmp_path / "threads.db")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        create_db(threads.cursor(), threads, bulk=True, executor=executor)
+    assert read_tables(threads) == read_tables(per_table)
+    per_table.close()
+    bulk.close()
+    threads.close()
+
+
+def test_host_country_pairs():
+    """
+    GIVEN events with one host, two hosts, a repeated host and more hosts than countries
+    WHEN the host and country pairs are found
+    THEN each host should be paired with the country in the same place in the list, once, in the order found
+    """
+    df_events = pd.DataFrame({
+        "host": ["Rome", "Stoke Mandeville, New York", "Innsbruck", "Innsbruck", "Tignes,Albertville"],
+        "country": ["Italy", "Great Britain, United States of America", "Austria", "Austria", "France"],
+    }, index=[10, 11, 12, 13, 14])
+    pairs = host_country_pairs(df_events)
+    assert pairs.values.tolist() == [["Rome", "Italy"],
+                                     ["Stoke Mandeville", "Great Britain"],
+                                     ["New York", "United States of America"],
+                                     ["Innsbruck", "Austria"],
+                                     ["Tignes", "France"]]
+
+
+def test_ingest_adds_only_new_and_changed_rows(tmp_path):
+    """
+    GIVEN a database created with create_db() and a copy of the workbook with one new event, its medal results and
+          a changed country name
+    WHEN the data is ingested from the original workbook, then the changed workbook, then the changed workbook again
+    THEN the first ingest should change nothing, the second should add or update only the new and changed rows and
+         the third should be skipped
+    """
+    connection = sqlite3.connect(tmp_path / "paralympics.db")
+    create_db(connection.cursor(), connection)
+    assert ingest_all_data(connection.cursor(), connection) == {}
+
+    data_path = resources.files("tutor.data").joinpath("paralympics.xlsx")
+    sheets = pd.read_excel(data_path, sheet_name=None)
+    events, medals, countries = sheets["events"], sheets["medal_standings"], sheets["npc_codes"]
+    new_event = events[(events["year"] == 2020) & (events["type"] == "summer")].assign(year=2032, host="Brisbane",
+                                                                                       country="Australia")
+    sheets["events"] = pd.concat([events, new_event], ignore_index=True)
+    new_medals = medals[medals["Year"] == 2020].head(3).assign(Year=2032, Location="Brisbane")
+    sheets["medal_standings"] = pd.concat([medals, new_medals], ignore_index=True)
+    countries.loc[countries["code"] == "GBR", "notes"] = "Changed"
+    changed_path = tmp_path / "paralympics.xlsx"
+    with pd.ExcelWriter(changed_path) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+    counts = ingest_all_data(connection.cursor(), connection, data_path=changed_path)
+    assert {table: dict(c) for table, c in counts.items()} == {
+        "country": {"updated": 1},
+        "event": {"inserted": 1},
+        "participants": {"inserted": 1},
+        "host": {"inserted": 1},
+        "host_event": {"inserted": 1},
+        "disability_event": {"inserted": len(new_event["disabilities"].iloc[0].split(", "))},
+        "medal_result": {"inserted": 3},
+    }
+    assert connection.execute("SELECT host FROM summary_event_series WHERE year = 2032").fetchone() == ("Brisbane",)
+    assert ingest_all_data(connection.cursor(), connection, data_path=changed_path) == {}
+    connection.close()
+
+
+def test_read_sheets_uses_snapshot(tmp_path, monkeypatch):
+    """
+    GIVEN a copy of the workbook
+    WHEN the sheets are read twice, then the workbook is changed and the sheets are read again
+    THEN the workbook should be parsed the first time only, the sheets should be the same each time and saved as
+         Feather files, and after the change the workbook should be parsed again and the old snapshots removed
+    """
+    data_path = tmp_path / "paralympics.xlsx"
+    shutil.copy(resources.files("tutor.data").joinpath("paralympics.xlsx"), data_path)
+    monkeypatch.setenv("PARALYMPICS_SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    parsed = []
+    read_excel = pd.read_excel
+    monkeypatch.setattr(pd, "read_excel", lambda *args, **kwargs: parsed.append(kwargs["sheet_name"]) or read_excel(
+        *args, **kwargs))
+
+    first = read_sheets(data_path, ["events", "npc_codes"])
+    second = read_sheets(data_path, ["events", "npc_codes"])
+    assert parsed == [["events", "npc_codes"]]
+    assert sorted(path.suffix for path in (tmp_path / "snapshots").iterdir()) == [".feather", ".feather"]
+    for sheet in ["events", "npc_codes"]:
+        pd.testing.assert_frame_equal(first[sheet], second[sheet])
+
+    with pd.ExcelWriter(data_path) as writer:
+        first["npc_codes"].head(5).to_excel(writer, sheet_name="npc_codes", index=False)
+    assert len(read_sheets(data_path, ["npc_codes"])["npc_codes"]) == 5
+    assert parsed == [["events", "npc_codes"], ["npc_codes"]]
+    assert len(list((tmp_path / "snapshots").iterdir())) == 1
+
+
+def test_read_sheets_without_snapshot(tmp_path, monkeypatch):
+    """
+    GIVEN a workbook with a sheet that pyarrow cannot convert, a column of numbers and text
+    WHEN the sheets are read
+    THEN the sheets should be returned, the other sheet should be saved and the sheet that cannot be converted should not
+    """
+    data_path = tmp_path / "paralympics.xlsx"
+    with pd.ExcelWriter(data_path) as writer:
+        pd.DataFrame({"year": [1960, 1964]}).to_excel(writer, sheet_name="events", index=False)
+        pd.DataFrame({"code": ["GBR", "FRA"], "notes": [1, "text"]}).to_excel(writer, sheet_name="npc_codes",
+                                                                              index=False)
+    monkeypatch.setenv("PARALYMPICS_SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    sheets = read_sheets(data_path, ["events", "npc_codes"])
+    assert sheets["npc_codes"]["notes"].tolist() == [1, "text"]
+    assert [path.name.rsplit("-", 1)[-1] for path in (tmp_path / "snapshots").iterdir()] == ["events.feather"]
+
+
+@pytest.mark.parametrize("suffix", ["csv", "feather"])
+def test_medal_chunks_memory_is_flat(tmp_path, suffix):
+    """
+    GIVEN CSV or Feather files with the medal standings repeated 10 times and 200 times
+    WHEN each file is added to a database in chunks of 1000 rows
+    THEN every row should be added, and the peak memory should be much less than the larger file needs as one
+         dataframe and should not grow in proportion to the number of rows. The memory is the Python memory and the
+         memory used by pyarrow, which tracemalloc does not see.
+    """
+
+    def arrow_sampled(chunks):
+        for chunk in chunks:
+            arrow_peak[0] = max(arrow_peak[0], pyarrow.total_allocated_bytes())
+            yield chunk
+
+    medals = pd.read_excel(resources.files("tutor.data").joinpath("paralympics.xlsx"), sheet_name="medal_standings")
+    connection = sqlite3.connect(tmp_path / "paralympics.db")
+    create_db(connection.cursor(), connection)
+    peaks = []
+    for copies in [10, 200]:
+        path = tmp_path / f"medals_{copies}.{suffix}"
+        df = pd.concat([medals] * copies, ignore_index=True)
+        if suffix == "csv":
+            df.to_csv(path, index=False)
+        else:
+            df.to_feather(path)
+        before = connection.execute("SELECT COUNT(*) FROM medal_result").fetchone()[0]
+        arrow_peak = [0]
+        tracemalloc.start()
+        add_medal_result_chunks(arrow_sampled(iter_chunks(path, chunksize=1000)), connection.cursor(), connection)
+        peaks.append(tracemalloc.get_traced_memory()[1] + arrow_peak[0])
+        tracemalloc.stop()
+        after = connection.execute("SELECT COUNT(*) FROM medal_result").fetchone()[0]
+        assert after - before == len(medals) * copies
+    whole_file = df.memory_usage(deep=True).sum()
+    assert peaks[1] < whole_file / 4
+    assert peaks[1] < peaks[0] * 4
+    connection.close()
+
+
+def test_load_plan_order():
+    """
+    GIVEN a load plan where table a is slow to prepare, b does not depend on a, and c depends on a
+    WHEN the plan is run with a thread pool, and without an executor
+    THEN with the pool b should be added while a is being prepared, without one the tables should be prepared and added
+         in dependency order, c should always be added after a, and every insert should run in the calling thread
+    """
+    inserted = []
+    calling_thread = threading.get_ident()
+
+    def slow(rows):
+        time.sleep(0.2)
+        return rows
+
+    def insert(rows, writer):
+        assert threading.get_ident() == calling_thread
+        writer.append(rows)
+
+    plan = {
+        "a": LoadStep("sheet_a", slow, insert, []),
+        "b": LoadStep("sheet_b", list, insert, []),
+        "c": LoadStep("sheet_a", list, insert, ["a"]),
+    }
+    with ThreadPoolExecutor() as executor:
+        order = run_load_plan(plan, {"sheet_a": ["a"], "sheet_b": ["b"]}, inserted, executor)
+    assert order == ["b", "a", "c"]
+    assert inserted == [["b"], ["a"], ["a"]]
+
+    inserted.clear()
+    order = run_load_plan(plan, {"sheet_a": ["a"], "sheet_b": ["b"]}, inserted)
+    assert order.index("a") < order.index("c")
+    assert sorted(map(tuple, inserted)) == [("a",), ("a",), ("b",)]
+
+    with pytest.raises(CycleError):
+        run_load_plan({"a": LoadStep("sheet_a", list, insert, ["b"]), "b": LoadStep("sheet_b", list, insert, ["a"])},
+                      {"sheet_a": [], "sheet_b": []}, inserted)
+
+
+@pytest.mark.parametrize("bulk", [True, False])
+def test_load_report_counts_rows(tmp_path, bulk):
+    """
+    GIVEN an empty database
+    WHEN the data is added with create_db
+    THEN the report should have the number of rows inserted in each table, a time for each phase and no errors, and
+         it should be valid JSON
+    """
+    connection = sqlite3.connect(tmp_path / "paralympics.db")
+    report = create_db(connection.cursor(), connection, bulk=bulk)
+
+    result = json.loads(report.to_json())
+    for table, counts in result["tables"].items():
+        assert counts["inserted"] == connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        assert counts["read"] == counts["inserted"] + counts["skipped"]
+    assert result["tables"]["medal_result"]["inserted"] == 817
+    assert result["rows"]["inserted"] == sum(counts["inserted"] for counts in result["tables"].values())
+    assert all(result["phases"][phase] > 0 for phase in ["transform", "key_resolution", "insert", "commit"])
+    assert result["rows_per_s"] > 0
+    assert result["errors"] == []
+    connection.close()
+
+
+def test_sqlalchemy_loader_matches_sqlite3_loader(tmp_path):
+    """
+    GIVEN an empty database created with the SQLAlchemy models, and an empty database for create_db
+    WHEN the data is added with add_data.add_all_data() and with create_db()
+    THEN each table should have the same number of rows, including the 817 medal results
+    """
+    pytest.importorskip("tutor.flask_para_t.models", reason="the models are added to the app in activity 7.3")
+    from flask import Flask
+    from student.placeholder import add_data
+    from tutor.flask_para_t import db
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'sqlalchemy.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        report = add_data.add_all_data().to_dict()
+        db.engine.dispose()
+
+    connection = sqlite3.connect(tmp_path / "sqlite3.db")
+    create_db(connection.cursor(), connection)
+    sqlalchemy_connection = sqlite3.connect(tmp_path / "sqlalchemy.db")
+    for table in ["country", "event", "participants", "host", "host_event", "disability", "disability_event",
+                  "medal_result"]:
+        count = f"SELECT COUNT(*) FROM {table}"
+        assert sqlalchemy_connection.execute(count).fetchone() == connection.execute(count).fetchone(), table
+    assert report["tables"]["medal_result"]["inserted"] == 817
+    assert report["errors"] == []
+    sqlalchemy_connection.close()
+    connection.close()
+
+
+def test_query_profiler_aggregates_statements(tmp_path):
+    """
+    GIVEN a connection made with the query profiler's connection factory
+    WHEN the same query is run with different values, through a cursor, the connection and pandas
+    THEN the calls should be counted under one normalized statement with the rows returned, a query over the slow
+         threshold should be in the slow log, and the stats saved to the directory should be read back
+    """
+    profiler = QueryProfiler(slow_ms=0, stats_dir=tmp_path)
+    connection = sqlite3.connect(":memory:", factory=profiler.connection_factory)
+    connection.execute("CREATE TABLE event (year INTEGER, host TEXT)")
+    connection.executemany("INSERT INTO event VALUES (?, ?)", [(2012, "London"), (2016, "Rio"), (2016, "Rio")])
+    assert connection.execute("SELECT host FROM event WHERE year = 2012").fetchall() == [("London",)]
+    assert len(list(connection.cursor().execute("SELECT host FROM event WHERE year = 2016"))) == 2
+    assert len(pd.read_sql_query("SELECT host FROM event WHERE year IN (2012, 2016)", connection)) == 3
+
+    stats = {result["statement"]: result for result in profiler.stats()}
+    assert stats["SELECT host FROM event WHERE year = ?"]["count"] == 2
+    assert stats["SELECT host FROM event WHERE year = ?"]["rows"] == 3
+    assert stats["SELECT host FROM event WHERE year IN (?)"]["rows"] == 3
+    assert stats["INSERT INTO event VALUES (?, ?)"]["count"] == 1
+    assert all(result["p95_ms"] <= result["max_ms"] for result in stats.values())
+    assert "SELECT host FROM event WHERE year = 2016" in [query["sql"] for query in profiler.to_dict()["slow"]]
+
+    profiler.flush()
+    assert aggregate(read_stats(tmp_path)) == profiler.stats()
+
+    unsampled = QueryProfiler(sample_rate=0)
+    connection = sqlite3.connect(":memory:", factory=unsampled.connection_factory)
+    connection.execute("SELECT 1").fetchall()
+    assert unsampled.stats() == []
+
+
+def test_data_version_changes_with_commits(tmp_path):
+    """
+    GIVEN a Flask-SQLAlchemy app with a DataVersion
+    WHEN rows are added with the session, with a bulk insert, and with sqlite3 from outside the app
+    THEN only the version of the changed table should change for the app's commits, a rollback should not change
+         any version, and every table should get a new version for the change from outside
+    """
+    from flask import Flask
+    from flask_sqlalchemy import SQLAlchemy
+    from sqlalchemy import Integer, Text, insert
+    from sqlalchemy.orm import mapped_column
+    from student.placeholder.data_version import DataVersion
+
+    db = SQLAlchemy()
+
+    class Event(db.Model):
+        event_id = mapped_column(Integer, primary_key=True)
+        year = mapped_column(Integer)
+
+    class Host(db.Model):
+        host_id = mapped_column(Integer, primary_key=True)
+        host = mapped_column(Text)
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'paralympics.sqlite'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    data_version = DataVersion(app, db)
+
+    with app.app_context():
+        event_version = data_version.get(["event"])
+        db.session.add(Event(year=2012))
+        db.session.commit()
+        assert data_version.get(["event"]) > event_version
+        host_version = data_version.get(["host"])
+        assert host_version == data_version.get(["host"])
+
+        db.session.execute(insert(Host), [{"host": "London"}])
+        db.session.commit()
+        assert data_version.get(["host"]) > host_version
+        event_version = data_version.get(["event"])
+        assert data_version.get(["event", "host"]) == data_version.get(["host"])
+
+        db.session.add(Event(year=2016))
+        db.session.rollback()
+        assert data_version.get(["event"]) == event_version
+
+    time.sleep(0.01)
+    connection = sqlite3.connect(tmp_path / "paralympics.sqlite")
+    connection.execute("INSERT INTO event (year) VALUES (2020)")
+    connection.commit()
+    connection.close()
+    assert data_version.get(["event"]) > event_version
@@ -0,0 +1,56 @@
+import gzip
+import sqlite3
+from importlib import resources
+
+from flask import render_template_string
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+from student.flask_paralympics import create_app
+from student.placeholder.figures_sqlite3 import line_chart
+
+
+def test_plotly_js_served_once_with_long_cache(tmp_path):
+    """
+    GIVEN the paralympics Flask app
+    WHEN plotly.js is requested from the URL made by the plotly_js() macro, with and without gzip, again with its ETag,
+         and with an old version
+    THEN it should be sent with a one year immutable Cache-Control, gzipped if accepted, a 304 for the ETag, and a
+         redirect to the current version
+    """
+    app = create_app({'TESTING': True})
+    client = app.test_client()
+    with app.test_request_context():
+        script = render_template_string("{% from 'plotly.html' import plotly_js %}{{ plotly_js() }}")
+    url = f'/assets/plotly-{get_plotlyjs_version()}.min.js'
+    assert f'<script src="{url}"' in script
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data).decode() == get_plotlyjs()
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']}) \
+               .status_code == 304
+
+    plain = client.get(url)
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['ETag'] != response.headers['ETag']
+    assert len(plain.data) > len(response.data)
+    old = client.get('/assets/plotly-1.0.0.min.js')
+    assert old.status_code == 302 and old.headers['Location'] == url
+
+
+def test_line_chart_without_plotly_js():
+    """
+    GIVEN the paralympics database
+    WHEN the line chart is created with and without plotly.js
+    THEN without plotly.js the html should only have the figure, and be less than a hundredth of the size
+    """
+    connection = sqlite3.connect(resources.files("student.data").joinpath("paralympics.db"))
+    full = line_chart("events", connection)["fig"]
+    figure = line_chart("events", connection, include_plotlyjs=False)["fig"]
+    connection.close()
+    assert 'Plotly.newPlot' in figure and 'id="line-chart"' in figure
+    assert get_plotlyjs_version() not in figure
+    assert len(figure) * 100 < len(full)
@@ -0,0 +1,133 @@
+import base64
+import json
+import time
+
+from flask import Blueprint, Flask, jsonify, request
+
+from student.flask_paralympics.response_cache import cache
+from student.placeholder.data_version import DataVersion
+
+
+def create_app(tmp_path, **config):
+    """Creates an app with a DataVersion and a blueprint of two cached routes that count the times they are run."""
+    app = Flask(__name__, instance_path=str(tmp_path))
+    app.config.update(config)
+    app.extensions['data_version'] = DataVersion()
+    app.calls = 0
+    views = Blueprint('views', __name__)
+
+    @views.get('/events')
+    @cache.cached(tags=['event'])
+    def events():
+        app.calls += 1
+        return jsonify(calls=app.calls, year=request.args.get('year'))
+
+    @views.get('/quiz')
+    @cache.cached(ttl=0.2, tags=['quiz'])
+    def quiz():
+        app.calls += 1
+        return jsonify(calls=app.calls)
+
+    cache.init_app(app)
+    app.register_blueprint(views)
+    return app
+
+
+def test_cached_response_until_tag_changes(tmp_path):
+    """
+    GIVEN an app with the memory response cache and routes tagged event and quiz
+    WHEN the routes are requested again, after the ttl, after a change to another table and after a change to their table
+    THEN the cached response should be returned until the ttl has passed or its table has changed, and the stats should
+         count each hit and miss
+    """
+    app = create_app(tmp_path, RESPONSE_CACHE_STATS_URL='/_cache/stats')
+    client = app.test_client()
+    data_version = app.extensions['data_version']
+
+    first = client.get('/events?year=2012')
+    assert first.headers['X-Cache'] == 'MISS'
+    second = client.get('/events?year=2012')
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.json == first.json == {'calls': 1, 'year': '2012'}
+    assert client.get('/events?year=2016').json['calls'] == 2
+
+    data_version.bump(['medal_result'])
+    assert client.get('/events?year=2012').headers['X-Cache'] == 'HIT'
+    data_version.bump(['event'])
+    assert client.get('/events?year=2012').json['calls'] == 3
+
+    assert client.get('/quiz').json['calls'] == 4
+    assert client.get('/quiz').json['calls'] == 4
+    time.sleep(0.25)
+    assert client.get('/quiz').json['calls'] == 5
+    with app.app_context():
+        cache.invalidate('quiz')
+    assert client.get('/quiz').json['calls'] == 6
+
+    stats = client.get('/_cache/stats').json
+    assert stats['totals'] == {'misses': 6, 'hits': 3, 'stores': 6, 'invalidated': 2, 'expired': 1}
+    assert stats['endpoints']['views.events'] == {'misses': 3, 'hits': 2, 'stores': 3, 'invalidated': 1}
+    assert stats['entries'] == 3
+    assert stats['hit_ratio'] == 3 / 9
+
+
+def test_filesystem_cache_is_shared_and_evicts(tmp_path):
+    """
+    GIVEN two apps with the filesystem response cache in the same directory, with space for two responses
+    WHEN a response is cached by one app and requested from the other, and then three more paths are requested
+    THEN the other app should return the cached response, the least recently used responses should be removed, and an
+         app with RESPONSE_CACHE_BACKEND = None should not cache
+    """
+    config = {'RESPONSE_CACHE_BACKEND': 'filesystem', 'RESPONSE_CACHE_MAX_ENTRIES': 2}
+    first, second = create_app(tmp_path, **config), create_app(tmp_path, **config)
+
+    assert first.test_client().get('/events?year=2012').headers['X-Cache'] == 'MISS'
+    response = second.test_client().get('/events?year=2012')
+    assert response.headers['X-Cache'] == 'HIT'
+    assert response.json['calls'] == 1 and second.calls == 0
+
+    client = second.test_client()
+    for year in [2016, 2020, 2024]:
+        client.get(f'/events?year={year}')
+        time.sleep(0.01)
+    with second.app_context():
+        stats = cache.stats()
+    assert stats['backend'] == 'FileSystemBackend'
+    assert stats['entries'] == 2
+    assert stats['totals']['evictions'] == 2
+    assert client.get('/events?year=2024').headers['X-Cache'] == 'HIT'
+    assert client.get('/events?year=2012').headers['X-Cache'] == 'MISS'
+
+    entries = [json.loads(path.read_text()) for path in (tmp_path / 'response_cache').iterdir()]
+    assert sorted(json.loads(base64.b64decode(entry['body']))['year'] for entry in entries) == ['2012', '2024']
+    assert all(entry['status'] == 200 and entry['tags'] == ['event'] for entry in entries)
+
+    off = create_app(tmp_path, RESPONSE_CACHE_BACKEND=None).test_client()
+    assert off.get('/events').json['calls'] == 1
+    assert off.get('/events').json['calls'] == 2
+    assert 'X-Cache' not in off.get('/events').headers
+
+
+def test_filesystem_cache_removes_oldest_in_batches(tmp_path):
+    """
+    GIVEN a filesystem response cache with space for 16 responses
+    WHEN 18 paths are requested, then one more, and an entry file is changed to text that is not an entry
+    THEN the oldest should only be removed once there are more than 18, down to 16, and the changed file should be a
+         miss
+    """
+    app = create_app(tmp_path, RESPONSE_CACHE_BACKEND='filesystem', RESPONSE_CACHE_MAX_ENTRIES=16)
+    client = app.test_client()
+    directory = tmp_path / 'response_cache'
+    for year in range(18):
+        client.get(f'/events?year={year}')
+    assert len(list(directory.iterdir())) == 18
+    client.get('/events?year=18')
+    assert len(list(directory.iterdir())) == 16
+    with app.app_context():
+        assert cache.stats()['entries'] == 16
+    assert client.get('/events?year=18').headers['X-Cache'] == 'HIT'
+    assert client.get('/events?year=0').headers['X-Cache'] == 'MISS'
+
+    for path in directory.iterdir():
+        path.write_text('{"body": "not base64!"}')
+    assert client.get('/events?year=18').headers['X-Cache'] == 'MISS'